@@ -4,113 +4,591 @@ Handles recipe database, search, and intersection logic.
 Run with: python app.py
 """
 
-from flask import Flask, jsonify, request, render_template
+from flask import (Flask, jsonify, request, render_template, Response, stream_with_context,
+                   redirect, send_file)
 from flask_cors import CORS
+import base64
+import io
 import json
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from recipe_display import (
-    display_recipe_simple,
-    display_recipe_ingredients,
-    display_recipe_steps,
-    display_recipe_materials,
-    display_recipe_full,
-    display_recipe_card,
-    display_recipe_json,
-    load_recipe
-)
+from recipe_display import DISPLAY_FORMATS, PARALLEL_MIN_RECIPES, format_rendered, render_batch, render_formats
+from recipe_store import get_store
+from storage import open_backend
+from display_cache import DisplayCache
+from http_cache import cached_json_response, make_etag
+import metrics
+from ingredient_index import IngredientIndex
+from shopping_list import DISPLAY_UNITS, ShoppingListPlanner
+from recipe_attributes import SORTABLE, AttributeIndex
+from ingredient_suggest import IngredientSuggester
+from similarity import TOP_K as MAX_SIMILAR, SimilarityIndex
+from recipe_images import DEFAULT_QUALITY, DEFAULT_SIZE, FORMATS, QUALITIES, SIZES, ImageCache, image_path
+from recipe_model import Recipe
 
 app = Flask(__name__)
 CORS(app)  # Allow Unity to make requests
 
-# Path to recipes directory
-RECIPES_DIR = Path(__file__).parent / "recipes"
+# Per-route latency, response sizes and files parsed, served at /api/metrics.
+# Set RECIPE_PROFILE_SAMPLE_RATE (e.g. 0.01) to cProfile a share of requests;
+# the slowest are listed at /api/metrics/slowest and, if RECIPE_PROFILE_DUMP
+# is set, written to that file.
+slow_request_profiler = metrics.SlowRequestProfiler(
+    sample_rate=float(os.environ.get("RECIPE_PROFILE_SAMPLE_RATE", 0)),
+    dump_path=os.environ.get("RECIPE_PROFILE_DUMP"))
+metrics.init_app(app, slow_request_profiler)
+
+# Recipes are passed around as recipe_model.Recipe objects and only turned
+# into dicts here, as a response is serialized
+_flask_json_default = app.json.default
+
+def json_default(value):
+    """json.dumps default= hook: Recipes as their JSON dict, else Flask's default."""
+    if isinstance(value, Recipe):
+        return value.to_dict()
+    return _flask_json_default(value)
+
+app.json.default = json_default
+
+# Path to recipes directory (override with the RECIPES_DIR environment variable)
+RECIPES_DIR = Path(os.environ.get("RECIPES_DIR", Path(__file__).parent / "recipes"))
 DATA_DIR = Path(__file__).parent / "data"
 
+# Where recipes are kept: "json" (one file per recipe in RECIPES_DIR) or
+# "sqlite" (RECIPE_DB, see `python storage.py import`)
+STORAGE = os.environ.get("RECIPE_STORAGE", "json")
+DB_PATH = Path(os.environ.get("RECIPE_DB", DATA_DIR / "recipes.db"))
+storage = open_backend(STORAGE, RECIPES_DIR, DB_PATH)
+
+# Packed catalog built by `python catalog_pack.py compile`; used at startup
+# for recipes whose JSON file hasn't changed since (override with RECIPE_PACK).
+# RECIPE_PACK_CACHE caps how many decoded packed recipes are kept.
+PACK_PATH = Path(os.environ.get("RECIPE_PACK", DATA_DIR / "catalog.pack"))
+PACK_CACHE_SIZE = (int(os.environ["RECIPE_PACK_CACHE"])
+                   if os.environ.get("RECIPE_PACK_CACHE") else None)
+
+# Parsed once, then refreshed only for recipes that change in storage.
+# Shared with recipe_display.load_recipe().
+recipe_store = get_store(RECIPES_DIR, backend=storage,
+                         pack_path=PACK_PATH if STORAGE == "json" else None,
+                         pack_cache_size=PACK_CACHE_SIZE)
+
+# Ingredient -> recipes postings, kept in sync with the store
+ingredient_index = IngredientIndex()
+recipe_store.subscribe(ingredient_index.on_change, ingredient_index.on_changes)
+
+# Parsed times, servings and type per recipe, for filtering and sorting
+attribute_index = AttributeIndex()
+recipe_store.subscribe(attribute_index.on_change, attribute_index.on_changes)
+
+# Ingredient names and recipe counts, for autocomplete
+ingredient_suggester = IngredientSuggester()
+recipe_store.subscribe(ingredient_suggester.on_change, ingredient_suggester.on_changes)
+
+# "Goes well with" neighbours by shared ingredients and materials. A table
+# built by `python similarity.py build` (override with RECIPE_SIMILARITY) is
+# reused for recipes whose ingredients and materials haven't changed since.
+SIMILARITY_PATH = Path(os.environ.get("RECIPE_SIMILARITY", DATA_DIR / "similarity.npz"))
+similarity_index = SimilarityIndex()
+if SIMILARITY_PATH.exists():
+    similarity_index.load(SIMILARITY_PATH)
+recipe_store.subscribe(similarity_index.on_change, similarity_index.on_changes)
+
+# Ingredient amounts as NumPy columns, for shopping lists
+shopping_planner = ShoppingListPlanner()
+recipe_store.subscribe(shopping_planner.on_change, shopping_planner.on_changes)
+
+def build_indexes():
+    """
+    Load the catalog and bring every index up to date now, so no request
+    pays for the first build (the similarity table takes seconds at scale).
+    """
+    recipe_store.refresh(force=True)
+    for index in (attribute_index, ingredient_suggester, similarity_index, shopping_planner):
+        index.flush()
+
+# Rendered display text, keyed by (recipe id, content hash, format)
+DISPLAY_CACHE_SIZE = int(os.environ.get("RECIPE_DISPLAY_CACHE_SIZE", 1024))
+display_cache = DisplayCache(maxsize=DISPLAY_CACHE_SIZE)
+recipe_store.subscribe(display_cache.on_change)
+
+# Worker processes for large POST /api/recipes/display/batch jobs (default:
+# one per CPU), started on first use
+DISPLAY_WORKERS = (int(os.environ["RECIPE_DISPLAY_WORKERS"])
+                   if os.environ.get("RECIPE_DISPLAY_WORKERS") else None)
+_display_pool = None
+_display_pool_lock = threading.Lock()
+
+# Derivative URLs never change content, so clients may keep them for a year
+IMAGE_MAX_AGE = 365 * 24 * 3600
+# How long clients may reuse the redirect from a recipe to its derivative
+IMAGE_REDIRECT_MAX_AGE = 300
+
+# Recipe images: originals named by each recipe's "image" field in
+# RECIPE_IMAGES_DIR, resized copies cached in RECIPE_IMAGE_CACHE (at most
+# RECIPE_IMAGE_CACHE_MB) and rendered by RECIPE_IMAGE_WORKERS processes.
+# Derivatives used within one redirect lifetime are never evicted, so a
+# redirect a client still holds always leads to a file.
+IMAGES_DIR = Path(os.environ.get("RECIPE_IMAGES_DIR", Path(__file__).parent / "images"))
+IMAGE_CACHE_DIR = Path(os.environ.get("RECIPE_IMAGE_CACHE", DATA_DIR / "image_cache"))
+image_cache = ImageCache(
+    IMAGES_DIR, IMAGE_CACHE_DIR,
+    max_bytes=int(os.environ.get("RECIPE_IMAGE_CACHE_MB", 512)) * 1024 * 1024,
+    workers=int(os.environ["RECIPE_IMAGE_WORKERS"]) if os.environ.get("RECIPE_IMAGE_WORKERS") else None,
+    grace_seconds=IMAGE_REDIRECT_MAX_AGE)
+
+metrics.register_gauge("recipe_catalog_recipes", "Recipes currently loaded",
+                       lambda: len(recipe_store))
+metrics.register_gauge("recipe_display_cache_hits", "Display cache hits",
+                       lambda: display_cache.hits)
+metrics.register_gauge("recipe_display_cache_misses", "Display cache misses",
+                       lambda: display_cache.misses)
+metrics.register_gauge("recipe_display_cache_hit_rate", "Display cache hit rate",
+                       lambda: display_cache.stats()["hit_rate"])
+metrics.register_gauge("recipe_image_cache_bytes", "Bytes of cached image derivatives",
+                       lambda: image_cache.stats()["bytes"])
+metrics.register_gauge("recipe_image_cache_misses", "Image derivatives rendered",
+                       lambda: image_cache.misses)
+
+# Largest page GET /api/recipes will return; also the NDJSON chunk size
+MAX_PAGE_SIZE = 1000
+
+# Recipes written (and indexed) together by POST /api/recipes/bulk
+BULK_BATCH_SIZE = 1000
+# Invalid lines reported individually by POST /api/recipes/bulk
+MAX_BULK_ERRORS = 100
+
+# Most recipes one POST /api/shopping-list meal plan may contain
+MAX_PLAN_SIZE = 100000
+
+# Most suggestions GET /api/ingredients/suggest will return
+MAX_SUGGESTIONS = 50
+
+@metrics.timed("load_recipes")
 def load_recipes():
     """Load all recipes from JSON files in recipes directory."""
-    recipes = []
-    if RECIPES_DIR.exists():
-        for recipe_file in RECIPES_DIR.glob("*.json"):
+    return recipe_store.all()
+
+def encode_cursor(filename):
+    """Turn a store position into an opaque pagination cursor."""
+    if filename is None:
+        return None
+    return base64.urlsafe_b64encode(filename.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for malformed cursors."""
+    if not cursor:
+        return None
+    try:
+        # validate: the default skips characters outside the alphabet, so
+        # garbage would decode to "" and restart from the first page
+        filename = base64.b64decode(cursor.encode('ascii'), altchars=b'-_',
+                                    validate=True).decode('utf-8')
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not filename:
+        raise ValueError("Invalid cursor")
+    return filename
+
+def project_recipe(recipe, fields):
+    """Keep only the requested top-level fields of a recipe."""
+    if not fields:
+        return recipe
+    return {field: recipe.get(field) for field in fields if field in recipe}
+
+def parse_filters(source):
+    """
+    Read attribute filters and sort order from query args or a JSON body:
+    type, min_/max_ prep, total (minutes) and servings, and sort (prep,
+    total or servings, "-" prefixed for descending). Returns (filters, sort);
+    raises ValueError for malformed values.
+    """
+    filters = {}
+    if source.get("type") is not None:
+        filters["type"] = source.get("type")
+    for name in SORTABLE:
+        for bound in ("min", "max"):
+            key = f"{bound}_{name}"
+            value = source.get(key)
+            if value is None:
+                continue
             try:
-                with open(recipe_file, 'r', encoding='utf-8') as f:
-                    recipe = json.load(f)
-                    recipes.append(recipe)
-            except Exception as e:
-                print(f"Error loading {recipe_file}: {e}")
-    return recipes
+                filters[key] = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{key} must be a number")
+    sort = source.get("sort") or None
+    if sort is not None and (not isinstance(sort, str) or sort.lstrip("-") not in SORTABLE):
+        raise ValueError(f"sort must be one of {', '.join(SORTABLE)} (prefix - for descending)")
+    return filters, sort
+
+def positive_int(value, name):
+    """Return value (a JSON number or numeric string) as a positive int;
+    raises ValueError for anything else."""
+    if isinstance(value, str):
+        value = int(value) if value.strip().isdecimal() else None
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise ValueError(f"{name} must be a positive integer")
+    return value
+
+def item_list(value, name):
+    """Return value if it is a list of item names; raises ValueError otherwise."""
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{name} must be a list of strings")
+    return value
 
-def find_recipe_intersections(selected_items):
+def recipe_page(after, limit, filenames=None):
+    """
+    recipe_store.page(), or the same over a filtered selection of filenames
+    (from attribute_index.select) when one is given.
+    """
+    if filenames is None:
+        return recipe_store.page(after, limit)
+    start = 0
+    if after is not None:
+        try:
+            start = filenames.index(after) + 1
+        except ValueError:
+            raise ValueError("Invalid cursor")
+    selected = filenames[start:start + limit]
+    recipes = [recipe for recipe in map(recipe_store.get, selected) if recipe is not None]
+    more = start + limit < len(filenames)
+    return recipes, (selected[-1] if more and selected else None)
+
+def iter_recipes(after=None, fields=None, filenames=None):
+    """
+    Yield recipes one page at a time so memory stays O(page size).
+    With filenames (a filtered selection), yield those recipes in order.
+    """
+    while True:
+        recipes, after = recipe_page(after, MAX_PAGE_SIZE, filenames)
+        for recipe in recipes:
+            yield project_recipe(recipe, fields)
+        if after is None:
+            return
+
+def find_recipe_intersections(selected_items, excluded_items=()):
     """
     Find recipes that contain ALL selected items.
     Like a search algorithm showing intersection of recipes.
     
     Args:
         selected_items: List of item names (e.g., ["tomato", "cheese"])
+        excluded_items: Optional list of item names the recipe must not use
     
     Returns:
         List of recipes that contain all selected items
     """
-    recipes = load_recipes()
-    matching_recipes = []
-    
-    for recipe in recipes:
-        # Get recipe ingredients (handle both old array and new dict format)
-        ingredients = recipe.get("ingredients", {})
-        
-        if isinstance(ingredients, dict):
-            # New format: dictionary with ingredient names as keys
-            recipe_ingredients = [ing.lower() for ing in ingredients.keys()]
-        elif isinstance(ingredients, list):
-            # Old format: simple list
-            recipe_ingredients = [ing.lower() for ing in ingredients]
-        else:
-            recipe_ingredients = []
-        
-        selected_lower = [item.lower() for item in selected_items]
-        
-        # Check if ALL selected items are in recipe ingredients
-        if all(item in recipe_ingredients for item in selected_lower):
-            matching_recipes.append(recipe)
-    
-    return matching_recipes
+    recipe_store.refresh()
+    with metrics.phase("search"):
+        if hasattr(storage, "match"):
+            # The SQLite backend answers from its own ingredient tables
+            return storage.match(selected_items, none_of=excluded_items)
+        return ingredient_index.match(selected_items, none_of=excluded_items)
 
 @app.route('/api/recipes', methods=['GET'])
 def get_all_recipes():
-    """Get all available recipes."""
-    recipes = load_recipes()
-    return jsonify(recipes)
+    """
+    Get all available recipes.
+    Optional query parameters:
+        fields=id,name,type,time  only return these fields of each recipe
+        limit=100&cursor=...      return one page plus "next_cursor"
+        format=ndjson             stream one JSON recipe per line
+        type=main&max_total=30    filter on type, min_/max_ prep, total
+                                  (minutes) and servings
+        sort=-servings            order by prep, total or servings
+    """
+    fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()]
+    try:
+        after = decode_cursor(request.args.get("cursor"))
+        filters, sort = parse_filters(request.args)
+        limit = positive_int(request.args.get("limit", 100), "limit")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Filenames of the matching recipes, or None to list everything
+    selection = None
+    if filters or sort:
+        recipe_store.refresh()
+        with metrics.phase("filter"):
+            selection = attribute_index.select(filters, sort)
+        if after is not None and after not in selection:
+            return jsonify({"error": "Invalid cursor"}), 400
+    
+    if request.args.get("format") == "ndjson":
+        def generate():
+            for recipe in iter_recipes(after, fields, selection):
+                yield json.dumps(recipe, ensure_ascii=False, default=json_default) + "\n"
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    
+    # Same catalog version + same query = same body
+    etag = make_etag(recipe_store.catalog_tag(), request.query_string)
+    
+    if "limit" in request.args or after is not None:
+        limit = min(limit, MAX_PAGE_SIZE)
+        
+        def build_page():
+            recipes, last = recipe_page(after, limit, selection)
+            return {
+                "recipes": [project_recipe(recipe, fields) for recipe in recipes],
+                "count": len(recipes),
+                "next_cursor": encode_cursor(last)
+            }
+        return cached_json_response(etag, build_page)
+    
+    if selection is not None:
+        return cached_json_response(etag, lambda: [
+            project_recipe(recipe, fields) for recipe in map(recipe_store.get, selection)
+            if recipe is not None])
+    return cached_json_response(
+        etag, lambda: [project_recipe(recipe, fields) for recipe in load_recipes()])
 
 @app.route('/api/recipes/search', methods=['POST'])
 def search_recipes():
     """
     Search for recipes by selected items.
     Expects JSON: {"items": ["tomato", "cheese", ...]}
+    Optional: "exclude": ["nuts", ...] to skip recipes using those items
+    Optional: "mode": "ranked" with "limit": 10 to get the recipes closest
+    to the selected items instead of only those containing all of them
+    Optional: the filters and "sort" of GET /api/recipes (type, max_total,
+    ...) to narrow and order the results
     """
-    data = request.get_json()
-    selected_items = data.get("items", [])
+    payload, status = run_search(request.get_json())
+    return jsonify(payload), status
+
+def run_search(data):
+    """Body and status code for a search request (shared with asgi_app.py)."""
+    if not isinstance(data, dict):
+        return {"error": "Request body must be a JSON object"}, 400
+    mode = data.get("mode", "all")
+    try:
+        selected_items = item_list(data.get("items", []), "items")
+        excluded_items = item_list(data.get("exclude", []), "exclude")
+        filters, sort = parse_filters(data)
+    except ValueError as e:
+        return {"error": str(e)}, 400
     
-    matching_recipes = find_recipe_intersections(selected_items)
+    if mode == "ranked":
+        if filters or sort:
+            return {"error": "Filters and sort are only supported with mode \"all\""}, 400
+        try:
+            limit = positive_int(data.get("limit", 10), "limit")
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        recipe_store.refresh()
+        with metrics.phase("search_ranked"):
+            results = ingredient_index.rank_by_coverage(selected_items, limit)
+        return {
+            "selected_items": selected_items,
+            "mode": mode,
+            "results": results,
+            "count": len(results)
+        }, 200
     
-    return jsonify({
+    if mode != "all":
+        return {
+            "error": "Invalid mode",
+            "available_modes": ["all", "ranked"]
+        }, 400
+    
+    matching_recipes = find_recipe_intersections(selected_items, excluded_items)
+    if filters or sort:
+        with metrics.phase("filter"):
+            positions = attribute_index.select_among(
+                [recipe.get("id") for recipe in matching_recipes], filters, sort)
+        matching_recipes = [matching_recipes[i] for i in positions]
+    
+    return {
         "selected_items": selected_items,
         "recipes": matching_recipes,
         "count": len(matching_recipes)
+    }, 200
+
+# Most queries accepted by one /api/recipes/search/batch request
+MAX_BATCH_QUERIES = 1000
+
+@app.route('/api/recipes/search/batch', methods=['POST'])
+def search_recipes_batch():
+    """
+    Run many basket searches in one request.
+    Expects JSON: {"queries": [{"items": [...], "exclude": [...]}, ...]}
+    Each query may also be a plain list of items.
+    Optional: "include_recipes": true to return full recipes, not just ids
+    """
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    queries = data.get("queries", [])
+    include_recipes = bool(data.get("include_recipes", False))
+    
+    if not isinstance(queries, list):
+        return jsonify({"error": "queries must be a list"}), 400
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({"error": f"At most {MAX_BATCH_QUERIES} queries per batch"}), 400
+    
+    parsed = []
+    for i, query in enumerate(queries):
+        if isinstance(query, list):
+            items, excluded = query, []
+        elif isinstance(query, dict):
+            items, excluded = query.get("items", []), query.get("exclude", [])
+        else:
+            return jsonify({"error": f"queries[{i}] must be a list of items or an object"}), 400
+        try:
+            parsed.append((item_list(items, f"queries[{i}].items"),
+                           item_list(excluded, f"queries[{i}].exclude")))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    
+    recipe_store.refresh()
+    with metrics.phase("search_batch"):
+        matches = ingredient_index.match_many(parsed)
+    
+    results = []
+    for (selected_items, _), recipes in zip(parsed, matches):
+        result = {
+            "selected_items": selected_items,
+            "ids": [recipe.get("id") for recipe in recipes],
+            "count": len(recipes)
+        }
+        if include_recipes:
+            result["recipes"] = recipes
+        results.append(result)
+    
+    return jsonify({"results": results, "count": len(results)})
+
+@app.route('/api/shopping-list', methods=['POST'])
+def build_shopping_list():
+    """
+    Aggregate the ingredients of a meal plan.
+    Expects JSON: {"plan": [{"id": "pasta", "servings": 8}, "cake", ...]}
+    A plain id (or an entry without "servings") uses the recipe's own
+    servings. Optional: "units": "us" (default) or "metric".
+    """
+    data = request.get_json() or {}
+    plan = data.get("plan")
+    units = data.get("units", "us")
+    
+    if not isinstance(plan, list):
+        return jsonify({"error": "plan must be a list of recipes"}), 400
+    if len(plan) > MAX_PLAN_SIZE:
+        return jsonify({"error": f"At most {MAX_PLAN_SIZE} recipes per plan"}), 400
+    if units not in DISPLAY_UNITS:
+        return jsonify({
+            "error": "Invalid units",
+            "available_units": list(DISPLAY_UNITS.keys())
+        }), 400
+    
+    meals = []
+    for entry in plan:
+        if not isinstance(entry, dict):
+            entry = {"id": entry}
+        servings = entry.get("servings")
+        if servings is not None and (isinstance(servings, bool)
+                                     or not isinstance(servings, (int, float))
+                                     or servings <= 0):
+            return jsonify({"error": f"Invalid servings for recipe {entry.get('id')}"}), 400
+        meals.append((entry.get("id"), servings))
+    
+    recipe_store.refresh()
+    with metrics.phase("shopping_list"):
+        items, missing = shopping_planner.plan(meals, units)
+    
+    return jsonify({
+        "items": items,
+        "count": len(items),
+        "recipes": len(meals) - len(missing),
+        "missing": missing
+    })
+
+@app.route('/api/ingredients/suggest', methods=['GET'])
+def suggest_ingredients():
+    """
+    Autocomplete ingredient names, most used first.
+    Query parameters: q (required), limit (default 10), fuzzy=false to
+    turn off typo-tolerant matches.
+    """
+    query = request.args.get("q", "")
+    if not query.strip():
+        return jsonify({"error": "q is required"}), 400
+    try:
+        limit = min(positive_int(request.args.get("limit", 10), "limit"), MAX_SUGGESTIONS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    fuzzy = request.args.get("fuzzy", "true").lower() not in ("false", "0", "no")
+    
+    recipe_store.refresh()
+    with metrics.phase("suggest"):
+        suggestions = ingredient_suggester.suggest(query, limit, fuzzy)
+    
+    return jsonify({
+        "query": query,
+        "suggestions": suggestions,
+        "count": len(suggestions)
     })
 
 @app.route('/api/recipes/<recipe_id>', methods=['GET'])
 def get_recipe(recipe_id):
     """Get a specific recipe by ID."""
-    recipes = load_recipes()
-    for recipe in recipes:
-        if recipe.get("id") == recipe_id:
-            return jsonify(recipe)
-    return jsonify({"error": "Recipe not found"}), 404
+    recipe, content_hash = recipe_store.get_with_hash(recipe_id)
+    if recipe is None:
+        return jsonify({"error": "Recipe not found"}), 404
+    return cached_json_response(make_etag(content_hash), lambda: recipe)
+
+@app.route('/api/recipes/<recipe_id>/similar', methods=['GET'])
+def similar_recipes(recipe_id):
+    """
+    Recipes that go well with this one: those sharing the most ingredients
+    and materials, most similar first. Query parameter: limit (default 10).
+    """
+    try:
+        limit = min(positive_int(request.args.get("limit", MAX_SIMILAR), "limit"), MAX_SIMILAR)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    recipe_store.refresh()
+    with metrics.phase("similar"):
+        neighbours = similarity_index.similar(recipe_id, limit)
+    if neighbours is None:
+        return jsonify({"error": "Recipe not found"}), 404
+    
+    similar = []
+    for filename, score in neighbours:
+        recipe = recipe_store.get(filename)
+        if recipe is not None:
+            similar.append({"id": recipe.get("id"), "name": recipe.get("name"),
+                            "score": score})
+    return jsonify({
+        "recipe_id": recipe_id,
+        "similar": similar,
+        "count": len(similar)
+    })
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({"status": "ok", "message": "Recipe API is running"})
+    return jsonify({
+        "status": "ok",
+        "message": "Recipe API is running",
+        "display_cache": display_cache.stats()
+    })
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Metrics in the Prometheus text format."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/api/metrics/slowest', methods=['GET'])
+def get_slowest_requests():
+    """Slowest profiled requests (needs RECIPE_PROFILE_SAMPLE_RATE > 0)."""
+    return jsonify({
+        "sample_rate": slow_request_profiler.sample_rate,
+        "requests": slow_request_profiler.slowest()
+    })
 
 @app.route('/api/recipes/<recipe_id>/display/<display_format>', methods=['GET'])
 def display_recipe_format(recipe_id, display_format):
@@ -118,58 +596,158 @@ def display_recipe_format(recipe_id, display_format):
     Display recipe in various formats.
     Formats: simple, ingredients, steps, materials, full, card, json
     """
-    recipe = load_recipe(recipe_id)
+    recipe, content_hash = recipe_store.get_with_hash(recipe_id)
     
     if not recipe:
         return jsonify({"error": "Recipe not found"}), 404
     
-    format_functions = {
-        "simple": display_recipe_simple,
-        "ingredients": display_recipe_ingredients,
-        "steps": display_recipe_steps,
-        "materials": display_recipe_materials,
-        "full": display_recipe_full,
-        "card": display_recipe_card,
-        "json": lambda r: display_recipe_json(r)
-    }
-    
-    if display_format not in format_functions:
+    if display_format not in DISPLAY_FORMATS:
         return jsonify({
             "error": "Invalid format",
-            "available_formats": list(format_functions.keys())
+            "available_formats": list(DISPLAY_FORMATS.keys())
         }), 400
     
-    display_func = format_functions[display_format]
-    display_text = display_func(recipe)
+    def build_display():
+        display_text = display_cache.get_or_render(
+            recipe, content_hash, display_format, DISPLAY_FORMATS[display_format])
+        return {
+            "recipe_id": recipe_id,
+            "format": display_format,
+            "display": display_text
+        }
     
-    return jsonify({
-        "recipe_id": recipe_id,
-        "format": display_format,
-        "display": display_text
-    })
+    etag = make_etag(content_hash, recipe_id, display_format)
+    return cached_json_response(etag, build_display)
 
 @app.route('/api/recipes/<recipe_id>/display', methods=['GET'])
 def display_recipe_all_formats(recipe_id):
     """Display recipe in all available formats."""
-    recipe = load_recipe(recipe_id)
+    recipe, content_hash = recipe_store.get_with_hash(recipe_id)
     
     if not recipe:
         return jsonify({"error": "Recipe not found"}), 404
     
-    formats = {
-        "simple": display_recipe_simple(recipe),
-        "ingredients": display_recipe_ingredients(recipe),
-        "steps": display_recipe_steps(recipe),
-        "materials": display_recipe_materials(recipe),
-        "full": display_recipe_full(recipe),
-        "card": display_recipe_card(recipe),
-        "json": display_recipe_json(recipe)
-    }
+    def build_formats():
+        formats = display_cache.get_or_render_formats(
+            recipe, content_hash, list(DISPLAY_FORMATS), render_formats)
+        return {
+            "recipe_id": recipe_id,
+            "formats": formats
+        }
     
-    return jsonify({
-        "recipe_id": recipe_id,
-        "formats": formats
-    })
+    return cached_json_response(make_etag(content_hash, recipe_id, "all"), build_formats)
+
+def display_pool():
+    global _display_pool
+    with _display_pool_lock:
+        if _display_pool is None:
+            _display_pool = ProcessPoolExecutor(max_workers=DISPLAY_WORKERS)
+        return _display_pool
+
+@app.route('/api/recipes/display/batch', methods=['POST'])
+def display_recipes_batch():
+    """
+    Render many recipes in one streamed response.
+    Body: {"ids": [...] (default: every recipe), "formats": [...] (default:
+    all), "output": "ndjson" (default) or "text"}.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    recipe_ids = data.get("ids")
+    formats = data.get("formats") or list(DISPLAY_FORMATS)
+    output = data.get("output", "ndjson")
+    if recipe_ids is not None and not isinstance(recipe_ids, list):
+        return jsonify({"error": "ids must be a list"}), 400
+    if not isinstance(formats, list) or any(
+            not isinstance(name, str) or name not in DISPLAY_FORMATS for name in formats):
+        return jsonify({
+            "error": "Invalid format",
+            "available_formats": list(DISPLAY_FORMATS.keys())
+        }), 400
+    if output not in ("ndjson", "text"):
+        return jsonify({"error": "output must be ndjson or text"}), 400
+    
+    missing = []
+    if recipe_ids is not None:
+        recipes = []
+        for recipe_id in recipe_ids:
+            recipe = recipe_store.get_by_id(recipe_id)
+            if recipe is None:
+                missing.append(recipe_id)
+            else:
+                recipes.append(recipe)
+        count = len(recipes)
+    else:
+        recipes = iter_recipes()
+        count = len(recipe_store)
+    executor = display_pool() if count >= PARALLEL_MIN_RECIPES else None
+    
+    def generate():
+        for recipe, texts in render_batch(recipes, formats, executor):
+            if output == "text":
+                yield format_rendered(recipe, texts)
+            else:
+                yield json.dumps({"recipe_id": recipe.get("id"), "formats": texts},
+                                 ensure_ascii=False) + "\n"
+        if missing and output == "ndjson":
+            yield json.dumps({"missing": missing}) + "\n"
+        elif missing:
+            yield f"\nNot found: {', '.join(map(str, missing))}\n"
+    
+    mimetype = "text/plain" if output == "text" else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+@app.route('/api/recipes/<recipe_id>/image', methods=['GET'])
+def recipe_image(recipe_id):
+    """
+    Redirect to a resized copy of a recipe's image.
+    Query parameters: size (thumb, card, full), format (webp, jpeg; by
+    default webp if the client accepts it) and quality (low, medium, high).
+    """
+    size = request.args.get("size", DEFAULT_SIZE)
+    quality = request.args.get("quality", DEFAULT_QUALITY)
+    image_format = request.args.get("format")
+    if image_format is None:
+        image_format = "webp" if "image/webp" in request.accept_mimetypes else "jpeg"
+    for name, value, choices in [("size", size, SIZES), ("format", image_format, FORMATS),
+                                 ("quality", quality, QUALITIES)]:
+        if value not in choices:
+            return jsonify({
+                "error": f"Invalid {name}",
+                f"available_{name}s": list(choices.keys())
+            }), 400
+    
+    recipe = recipe_store.get_by_id(recipe_id)
+    if recipe is None:
+        return jsonify({"error": "Recipe not found"}), 404
+    path = image_path(IMAGES_DIR, recipe.get("image"))
+    if path is None:
+        return jsonify({"error": "Recipe has no image"}), 404
+    
+    try:
+        with metrics.phase("image"):
+            name = image_cache.get(path, size, image_format, quality)
+    except Exception as e:
+        print(f"Error rendering image for {recipe_id}: {e}")
+        return jsonify({"error": "Could not render image"}), 500
+    
+    response = redirect(f"/api/images/{name}")
+    response.cache_control.max_age = IMAGE_REDIRECT_MAX_AGE
+    response.vary.add("Accept")
+    return response
+
+@app.route('/api/images/<name>', methods=['GET'])
+def image_derivative(name):
+    """Serve a cached image derivative; its name is a digest of its content."""
+    path = image_cache.path_for(name)
+    if path is None:
+        return jsonify({"error": "Image not found"}), 404
+    mimetype = next(content_type for _, ext, content_type in FORMATS.values()
+                    if path.suffix == f".{ext}")
+    response = send_file(path, mimetype=mimetype, max_age=IMAGE_MAX_AGE, etag=path.stem)
+    response.cache_control.immutable = True
+    return response
 
 # Web Interface Routes
 @app.route('/')
@@ -181,65 +759,160 @@ def index():
 def create_recipe():
     """Create a new recipe."""
     try:
-        recipe = request.get_json()
-        recipe_id = recipe.get('id')
-        
-        if not recipe_id:
-            return jsonify({"error": "Recipe ID is required"}), 400
-        
-        recipe_file = RECIPES_DIR / f"{recipe_id}.json"
-        
-        if recipe_file.exists():
-            return jsonify({"error": "Recipe already exists"}), 400
-        
-        with open(recipe_file, 'w', encoding='utf-8') as f:
-            json.dump(recipe, f, indent=2, ensure_ascii=False)
-        
-        return jsonify({"message": "Recipe created successfully", "recipe": recipe}), 201
+        payload, status = save_new_recipe(request.get_json())
+        return jsonify(payload), status
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def save_new_recipe(recipe):
+    """Store a new recipe; returns body and status code."""
+    recipe_id = recipe.get('id')
+    
+    if not recipe_id:
+        return {"error": "Recipe ID is required"}, 400
+    
+    filename = f"{recipe_id}.json"
+    
+    try:
+        storage.create(filename, recipe)
+    except FileExistsError:
+        return {"error": "Recipe already exists"}, 400
+    recipe_store.put(filename, recipe)
+    
+    return {"message": "Recipe created successfully", "recipe": recipe}, 201
+
+def validate_recipe(recipe):
+    """Return why a bulk-imported record can't be stored, or None."""
+    if not isinstance(recipe, dict):
+        return "Record is not a JSON object"
+    recipe_id = recipe.get("id")
+    if isinstance(recipe_id, bool) or not isinstance(recipe_id, (str, int)) or recipe_id == "":
+        return "Recipe ID is required"
+    if any(c in str(recipe_id) for c in "/\\") or str(recipe_id).startswith("."):
+        return "Recipe ID can't contain path separators or start with '.'"
+    if not isinstance(recipe.get("ingredients", {}), (dict, list)):
+        return "ingredients must be an object or a list"
+    return None
+
+@app.route('/api/recipes/bulk', methods=['POST'])
+def bulk_import_recipes():
+    """
+    Create or replace many recipes from an NDJSON body (one recipe per line).
+    The body is read incrementally and written BULK_BATCH_SIZE recipes at a
+    time, each batch with one journal fsync and one index update, so memory
+    stays flat however large the upload is. Invalid lines are skipped and
+    reported by line number.
+    """
+    written = 0
+    batches = 0
+    errors = []
+    error_count = 0
+    batch = []
+    
+    def flush():
+        storage.write_many(batch)
+        recipe_store.put_many(batch)
+        batch.clear()
+    
+    # request.stream is unbuffered; reading lines from it directly costs a
+    # read call per byte
+    body = io.BufferedReader(request.stream, buffer_size=65536)
+    for line_no, line in enumerate(body, 1):
+        if not line.strip():
+            continue
+        try:
+            recipe = json.loads(line)
+            problem = validate_recipe(recipe)
+        except ValueError as e:
+            problem = f"Invalid JSON: {e}"
+        if problem:
+            error_count += 1
+            if len(errors) < MAX_BULK_ERRORS:
+                errors.append({"line": line_no, "error": problem})
+            continue
+        
+        batch.append((f"{recipe['id']}.json", recipe))
+        if len(batch) >= BULK_BATCH_SIZE:
+            written += len(batch)
+            batches += 1
+            flush()
+    
+    if batch:
+        written += len(batch)
+        batches += 1
+        flush()
+    
+    return jsonify({
+        "written": written,
+        "batches": batches,
+        "error_count": error_count,
+        "errors": errors
+    })
+
+@app.route('/api/recipes/export', methods=['GET'])
+def export_recipes():
+    """Stream the whole catalog as NDJSON, in the format /api/recipes/bulk reads."""
+    def generate():
+        for recipe in iter_recipes():
+            yield json.dumps(recipe, ensure_ascii=False, default=json_default) + "\n"
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson",
+                    headers={"Content-Disposition": "attachment; filename=recipes.ndjson"})
+
 @app.route('/api/recipes/<recipe_id>', methods=['PUT'])
 def update_recipe(recipe_id):
     """Update an existing recipe."""
     try:
-        recipe = request.get_json()
-        recipe_file = RECIPES_DIR / f"{recipe_id}.json"
-        
-        if not recipe_file.exists():
-            return jsonify({"error": "Recipe not found"}), 404
-        
-        # Ensure ID matches
-        recipe['id'] = recipe_id
-        
-        with open(recipe_file, 'w', encoding='utf-8') as f:
-            json.dump(recipe, f, indent=2, ensure_ascii=False)
-        
-        return jsonify({"message": "Recipe updated successfully", "recipe": recipe}), 200
+        payload, status = save_recipe_update(recipe_id, request.get_json())
+        return jsonify(payload), status
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def save_recipe_update(recipe_id, recipe):
+    """Overwrite an existing recipe; returns body and status code."""
+    filename = f"{recipe_id}.json"
+    
+    # Ensure ID matches
+    recipe['id'] = recipe_id
+    
+    try:
+        storage.update(filename, recipe)
+    except FileNotFoundError:
+        return {"error": "Recipe not found"}, 404
+    recipe_store.put(filename, recipe)
+    
+    return {"message": "Recipe updated successfully", "recipe": recipe}, 200
+
 @app.route('/api/recipes/<recipe_id>', methods=['DELETE'])
 def delete_recipe(recipe_id):
     """Delete a recipe."""
     try:
-        recipe_file = RECIPES_DIR / f"{recipe_id}.json"
-        
-        if not recipe_file.exists():
-            return jsonify({"error": "Recipe not found"}), 404
-        
-        recipe_file.unlink()
-        
-        return jsonify({"message": "Recipe deleted successfully"}), 200
+        payload, status = delete_recipe_by_id(recipe_id)
+        return jsonify(payload), status
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def delete_recipe_by_id(recipe_id):
+    """Delete a stored recipe; returns body and status code."""
+    filename = f"{recipe_id}.json"
+    
+    try:
+        storage.delete(filename)
+    except FileNotFoundError:
+        return {"error": "Recipe not found"}, 404
+    recipe_store.remove(filename)
+    
+    return {"message": "Recipe deleted successfully"}, 200
+
 if __name__ == '__main__':
     # Ensure directories exist
     RECIPES_DIR.mkdir(parents=True, exist_ok=True)
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     
     print("Starting Recipe Kitchen API server...")
-    print(f"Recipes directory: {RECIPES_DIR}")
+    if STORAGE == "sqlite":
+        print(f"Recipes database: {DB_PATH}")
+    else:
+        print(f"Recipes directory: {RECIPES_DIR}")
+    build_indexes()
     print("Server running on http://localhost:5000")
     app.run(debug=True, port=5000)
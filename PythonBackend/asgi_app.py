@@ -0,0 +1,348 @@
+"""
+ASGI variant of the Recipe Kitchen API, for clients that hold many slow
+connections open (Unity clients, kiosks).
+
+Serves the core routes of app.py from the same recipe store, index and
+caches, with the same bodies and ETags: health, listing (with fields,
+filters, cursors and NDJSON), search, get, create, update, delete and
+display of one recipe. Everything else (batch search and display,
+shopping lists, suggestions, similar recipes, images, bulk import and
+export, metrics) is only served by app.py and returns 404 here.
+
+Requests run on an asyncio event loop: anything that touches storage or
+does real work runs in a bounded thread pool, so thousands of idle or slow
+connections cost a coroutine each instead of a thread each. Concurrent
+identical searches are computed (and serialized) once and shared.
+
+Run with:
+    uvicorn asgi_app:app --port 5000
+Set RECIPE_ASGI_THREADS to size the thread pool (default 8).
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote
+
+import app as flask_app
+from http_cache import MIN_COMPRESS_SIZE, compressed_cache, make_etag
+from recipe_display import DISPLAY_FORMATS, render_formats
+
+recipe_store = flask_app.recipe_store
+display_cache = flask_app.display_cache
+
+IO_THREADS = int(os.environ.get("RECIPE_ASGI_THREADS", 8))
+# Largest request body accepted
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+executor = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="recipe-io")
+
+
+def run_blocking(func, *args):
+    """Run func(*args) on the bounded I/O pool."""
+    return asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+def encode_json(payload):
+    """Serialize exactly like Flask's jsonify, so ETags mean the same bytes."""
+    return (json.dumps(payload, sort_keys=True, separators=(",", ":"),
+                       default=flask_app.json_default) + "\n").encode('utf-8')
+
+
+class SearchCoalescer:
+    """
+    Shares one computation between concurrent identical requests.
+
+    The first caller for a key starts the work; callers arriving while it
+    runs await the same future. Nothing is kept once it finishes, so this
+    never serves a stale result.
+    """
+
+    def __init__(self):
+        self.started = 0
+        self.coalesced = 0
+        self._inflight = {}
+
+    async def run(self, key, func, *args):
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            self.started += 1
+            future = run_blocking(func, *args)
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._inflight.pop(key, None))
+        # shield: one client disconnecting must not cancel the others' result
+        return await asyncio.shield(future)
+
+
+search_coalescer = SearchCoalescer()
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.path = unquote(scope["path"])
+        self.query_string = scope.get("query_string", b"")
+        query = parse_qs(self.query_string.decode('latin-1'), keep_blank_values=True)
+        self.args = {k: v[0] for k, v in query.items()}
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1')
+                        for k, v in scope.get("headers", [])}
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+    def accepts_gzip(self):
+        return "gzip" in self.headers.get("accept-encoding", "")
+
+    def has_etag(self, etag):
+        tags = {tag.strip().removeprefix("W/").strip('"')
+                for tag in self.headers.get("if-none-match", "").split(",")}
+        return etag in tags or "*" in tags
+
+
+def json_response(payload, status=200):
+    return status, [(b"content-type", b"application/json")], encode_json(payload)
+
+
+def cached_response(req, etag, build_body):
+    """ETag/304/gzip handling matching http_cache.cached_json_response."""
+    gzip_etag = etag + "-gz"
+    accepts_gzip = req.accepts_gzip()
+    headers = [(b"cache-control", b"no-cache"), (b"vary", b"Accept-Encoding")]
+
+    if req.has_etag(etag) or req.has_etag(gzip_etag):
+        tag = gzip_etag if accepts_gzip else etag
+        return 304, headers + [(b"etag", f'"{tag}"'.encode())], b""
+
+    headers.append((b"content-type", b"application/json"))
+    if accepts_gzip:
+        body = compressed_cache.get(gzip_etag)
+        if body is None:
+            raw = build_body()
+            if len(raw) < MIN_COMPRESS_SIZE:
+                return 200, headers + [(b"etag", f'"{etag}"'.encode())], raw
+            body = gzip.compress(raw, compresslevel=6, mtime=0)
+            compressed_cache.put(gzip_etag, body)
+        return 200, headers + [(b"etag", f'"{gzip_etag}"'.encode()),
+                               (b"content-encoding", b"gzip")], body
+    return 200, headers + [(b"etag", f'"{etag}"'.encode())], build_body()
+
+
+# Handlers run on the I/O pool and return (status, headers, body)
+
+def list_recipes(req):
+    fields = [f.strip() for f in req.args.get("fields", "").split(",") if f.strip()]
+    try:
+        after = flask_app.decode_cursor(req.args.get("cursor"))
+        filters, sort = flask_app.parse_filters(req.args)
+        limit = flask_app.positive_int(req.args.get("limit", 100), "limit")
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    selection = None
+    if filters or sort:
+        recipe_store.refresh()
+        selection = flask_app.attribute_index.select(filters, sort)
+        if after is not None and after not in selection:
+            return json_response({"error": "Invalid cursor"}, 400)
+
+    if req.args.get("format") == "ndjson":
+        return (200, [(b"content-type", b"application/x-ndjson")],
+                stream_ndjson(after, fields, selection))
+
+    etag = make_etag(recipe_store.catalog_tag(), req.query_string)
+
+    if "limit" in req.args or after is not None:
+        limit = min(limit, flask_app.MAX_PAGE_SIZE)
+
+        def build_page():
+            recipes, last = flask_app.recipe_page(after, limit, selection)
+            return encode_json({
+                "recipes": [flask_app.project_recipe(recipe, fields) for recipe in recipes],
+                "count": len(recipes),
+                "next_cursor": flask_app.encode_cursor(last)
+            })
+        return cached_response(req, etag, build_page)
+
+    if selection is not None:
+        recipes = lambda: map(recipe_store.get, selection)
+    else:
+        recipes = flask_app.load_recipes
+    return cached_response(req, etag, lambda: encode_json(
+        [flask_app.project_recipe(recipe, fields) for recipe in recipes() if recipe is not None]))
+
+
+async def stream_ndjson(after, fields, selection=None):
+    """Yield the catalog one page at a time, reading each page on the pool."""
+    def next_page(after):
+        recipes, after = flask_app.recipe_page(after, flask_app.MAX_PAGE_SIZE, selection)
+        lines = "".join(json.dumps(flask_app.project_recipe(recipe, fields), ensure_ascii=False,
+                                   default=flask_app.json_default)
+                        + "\n" for recipe in recipes)
+        return lines.encode('utf-8'), after
+
+    while True:
+        chunk, after = await run_blocking(next_page, after)
+        yield chunk
+        if after is None:
+            return
+
+
+def get_recipe(req, recipe_id):
+    recipe, content_hash = recipe_store.get_with_hash(recipe_id)
+    if recipe is None:
+        return json_response({"error": "Recipe not found"}, 404)
+    return cached_response(req, make_etag(content_hash), lambda: encode_json(recipe))
+
+
+def display_recipe(req, recipe_id, display_format=None):
+    recipe, content_hash = recipe_store.get_with_hash(recipe_id)
+    if not recipe:
+        return json_response({"error": "Recipe not found"}, 404)
+
+    if display_format is None:
+        def build_formats():
+            return encode_json({
+                "recipe_id": recipe_id,
+                "formats": display_cache.get_or_render_formats(
+                    recipe, content_hash, list(DISPLAY_FORMATS), render_formats)
+            })
+        return cached_response(req, make_etag(content_hash, recipe_id, "all"), build_formats)
+
+    if display_format not in DISPLAY_FORMATS:
+        return json_response({
+            "error": "Invalid format",
+            "available_formats": list(DISPLAY_FORMATS.keys())
+        }, 400)
+
+    def build_display():
+        return encode_json({
+            "recipe_id": recipe_id,
+            "format": display_format,
+            "display": display_cache.get_or_render(
+                recipe, content_hash, display_format, DISPLAY_FORMATS[display_format])
+        })
+    return cached_response(req, make_etag(content_hash, recipe_id, display_format),
+                           build_display)
+
+
+def search(data):
+    payload, status = flask_app.run_search(data)
+    return json_response(payload, status)
+
+
+def guarded(func, *args):
+    """Run a write handler, reporting failures as a 500 like app.py does."""
+    try:
+        payload, status = func(*args)
+    except Exception as e:
+        return json_response({"error": str(e)}, 500)
+    return json_response(payload, status)
+
+
+async def dispatch(req):
+    path, method = req.path.rstrip("/") or "/", req.method
+
+    if path == "/api/health" and method == "GET":
+        return json_response({
+            "status": "ok",
+            "message": "Recipe API is running",
+            "display_cache": display_cache.stats(),
+            "search_coalescing": {"started": search_coalescer.started,
+                                  "coalesced": search_coalescer.coalesced}
+        })
+
+    if path == "/api/recipes":
+        if method == "GET":
+            return await run_blocking(list_recipes, req)
+        if method == "POST":
+            return await run_blocking(guarded, flask_app.save_new_recipe, req.json())
+
+    if path == "/api/recipes/search" and method == "POST":
+        data = req.json() or {}
+        # Same query against the same catalog version -> same response
+        key = (recipe_store.version, json.dumps(data, sort_keys=True))
+        return await search_coalescer.run(key, search, data)
+
+    match = re.fullmatch(r"/api/recipes/([^/]+)(?:/display(?:/([^/]+))?)?", path)
+    if match:
+        recipe_id, display_format = match.groups()
+        is_display = path != f"/api/recipes/{recipe_id}"
+        if is_display and method == "GET":
+            return await run_blocking(display_recipe, req, recipe_id, display_format)
+        if not is_display:
+            if method == "GET":
+                return await run_blocking(get_recipe, req, recipe_id)
+            if method == "PUT":
+                return await run_blocking(guarded, flask_app.save_recipe_update,
+                                          recipe_id, req.json())
+            if method == "DELETE":
+                return await run_blocking(guarded, flask_app.delete_recipe_by_id, recipe_id)
+            return json_response({"error": "Method not allowed"}, 405)
+
+    return json_response({"error": "Not found"}, 404)
+
+
+async def read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_SIZE:
+            raise ValueError("Request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def app(scope, receive, send):
+    """ASGI entry point."""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Load the catalog before accepting traffic
+                await run_blocking(recipe_store.refresh, True)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] != "http":
+        return
+
+    try:
+        body = await read_body(receive)
+        if body is None:
+            return
+        req = Request(scope, body)
+        status, headers, body = await dispatch(req)
+    except ValueError as e:
+        # Malformed JSON or an oversized body
+        status, headers, body = json_response({"error": str(e)}, 400)
+    except Exception as e:
+        # Like Flask, answer with an error rather than dropping the connection
+        print(f"Error handling {scope['method']} {scope['path']}: {e!r}")
+        status, headers, body = json_response({"error": "Internal server error"}, 500)
+
+    if not isinstance(body, bytes):
+        # Streamed body: an async iterator of chunks
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        async for chunk in body:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    headers = headers + [(b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,4 @@
+"""
+Benchmarks for the Recipe Kitchen API.
+See suite.py for the full benchmark run and catalog.py for synthetic data.
+"""
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark: filtering and sorting a synthetic in-memory catalog by type,
+servings and time, attribute index vs. parsing every recipe per request.
+Run with: python benchmarks/bench_attributes.py [num_recipes]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.catalog import generate_catalog
+from recipe_attributes import AttributeIndex, recipe_times
+
+QUERIES = [
+    ({"max_total": 30}, None),
+    ({"type": "dessert", "min_servings": 4}, "total"),
+    ({"min_prep": 10, "max_prep": 20, "max_total": 60}, "-servings"),
+    ({}, "total"),
+]
+
+
+def select_by_scan(recipes, filters, sort):
+    """Reference implementation: parse and test every recipe."""
+    selected = []
+    for filename, recipe in recipes.items():
+        prep, total = recipe_times(recipe)
+        values = {"prep": prep, "total": total, "servings": recipe.get("servings")}
+        if "type" in filters and recipe.get("type", "").lower() != filters["type"]:
+            continue
+        if any(values[name] is None or not low <= values[name] <= high
+               for name, low, high in [(key[4:], filters.get(f"min_{key[4:]}", float("-inf")),
+                                        filters.get(f"max_{key[4:]}", float("inf")))
+                                       for key in filters if key != "type"]):
+            continue
+        selected.append((filename, values))
+    if sort:
+        name = sort.lstrip("-")
+        selected.sort(key=lambda entry: entry[1][name] or 0, reverse=sort.startswith("-"))
+    return [filename for filename, _ in selected]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rounds = 20
+
+    recipes = {f"{recipe['id']}.json": recipe for recipe in generate_catalog(count)}
+    index = AttributeIndex()
+    start = time.perf_counter()
+    index.on_changes([(filename, None, recipe) for filename, recipe in recipes.items()])
+    len(index)  # applies the queued changes
+    print(f"Indexed {count} recipes in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    for filters, sort in QUERIES:
+        index.select(filters, sort)  # builds the sorted orders once
+        for name, run in [("index", lambda: index.select(filters, sort)),
+                          ("scan", lambda: select_by_scan(recipes, filters, sort))]:
+            samples = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                matches = run()
+                samples.append(time.perf_counter() - start)
+            samples.sort()
+            print(f"{name:>6} {filters} sort={sort}: {len(matches)} matches, "
+                  f"p50 {samples[len(samples) // 2] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory and query latency of compact postings (array/bitmap)
+versus plain Python sets of ints on a synthetic in-memory catalog.
+Run with: python benchmarks/bench_postings.py [num_recipes]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from postings import ArrayPosting, BitmapPosting, evaluate, optimize
+
+NUM_INGREDIENTS = 2000
+QUERIES = [
+    (["ingredient_0", "ingredient_1"], []),                 # two very common
+    (["ingredient_0", "ingredient_50"], []),                # common + medium
+    (["ingredient_3", "ingredient_900"], []),               # common + rare
+    (["ingredient_0", "ingredient_2"], ["ingredient_1"]),   # AND NOT
+]
+
+
+def synthetic_recipes(count):
+    """Yield ingredient-name lists with a Zipf-like popularity curve."""
+    rng = random.Random(7)
+    names = [f"ingredient_{i}" for i in range(NUM_INGREDIENTS)]
+    weights = [1.0 / (rank + 1) for rank in range(NUM_INGREDIENTS)]
+    for _ in range(count):
+        yield set(rng.choices(names, weights, k=rng.randint(4, 12)))
+
+
+def build_sets(catalog):
+    postings = {}
+    for doc_id, names in enumerate(catalog):
+        for name in names:
+            postings.setdefault(name, set()).add(doc_id)
+    return postings
+
+
+def build_compact(catalog):
+    postings = {}
+    for doc_id, names in enumerate(catalog):
+        for name in names:
+            postings.setdefault(name, []).append(doc_id)
+    universe = len(catalog)
+    return {name: optimize(ArrayPosting(ids), universe)
+            for name, ids in postings.items()}
+
+
+def measure(build, catalog):
+    tracemalloc.start()
+    start = time.perf_counter()
+    postings = build(catalog)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return postings, size, elapsed
+
+
+def query_sets(postings, all_of, none_of):
+    result = set.intersection(*sorted((postings[n] for n in all_of), key=len))
+    for name in none_of:
+        result -= postings[name]
+    return sorted(result)
+
+
+def query_compact(postings, all_of, none_of):
+    return evaluate([postings[n] for n in all_of],
+                    none_of=[postings[n] for n in none_of])
+
+
+def time_query(func, postings, all_of, none_of, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(postings, all_of, none_of)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print(f"Generating {count} recipes over {NUM_INGREDIENTS} ingredients ...")
+    catalog = list(synthetic_recipes(count))
+
+    set_postings, set_bytes, set_build = measure(build_sets, catalog)
+    compact_postings, compact_bytes, compact_build = measure(build_compact, catalog)
+    bitmaps = sum(isinstance(p, BitmapPosting) for p in compact_postings.values())
+
+    print(f"\n{'':<28}{'sets':>14}{'compact':>14}")
+    print(f"{'Postings memory (MB)':<28}{set_bytes / 1e6:>14.1f}{compact_bytes / 1e6:>14.1f}")
+    print(f"{'Build time (s)':<28}{set_build:>14.2f}{compact_build:>14.2f}")
+    print(f"Compact layout: {bitmaps} bitmaps, "
+          f"{len(compact_postings) - bitmaps} arrays")
+
+    print(f"\n{'Query':<44}{'hits':>8}{'sets ms':>10}{'compact ms':>12}")
+    for all_of, none_of in QUERIES:
+        expected, set_time = time_query(query_sets, set_postings, all_of, none_of)
+        got, compact_time = time_query(query_compact, compact_postings, all_of, none_of)
+        assert got == expected, "compact postings disagree with sets"
+        label = " & ".join(all_of) + "".join(f" - {n}" for n in none_of)
+        print(f"{label:<44}{len(got):>8}{set_time * 1000:>10.2f}{compact_time * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
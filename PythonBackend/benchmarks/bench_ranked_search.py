@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark: latency of ranked ("what can I cook") search on a synthetic
+in-memory catalog.
+Run with: python benchmarks/bench_ranked_search.py [num_recipes] [limit]
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ingredient_index import IngredientIndex
+
+NUM_INGREDIENTS = 2000
+BASKETS = [
+    ["ingredient_0", "ingredient_1", "ingredient_2"],
+    ["ingredient_0", "ingredient_5", "ingredient_40", "ingredient_300"],
+    ["ingredient_10", "ingredient_20", "ingredient_30", "ingredient_40",
+     "ingredient_50", "ingredient_60", "ingredient_70", "ingredient_80"],
+    ["ingredient_1500", "ingredient_1700"],
+]
+
+
+def build_index(count):
+    rng = random.Random(11)
+    names = [f"ingredient_{i}" for i in range(NUM_INGREDIENTS)]
+    weights = [1.0 / (rank + 1) for rank in range(NUM_INGREDIENTS)]
+    index = IngredientIndex()
+    for i in range(count):
+        ingredients = set(rng.choices(names, weights, k=rng.randint(4, 12)))
+        index.add(f"recipe_{i}.json", {"id": f"recipe_{i}", "ingredients": list(ingredients)})
+    return index
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    print(f"Indexing {count} recipes ...")
+    index = build_index(count)
+
+    print(f"\n{'Basket':<60}{'best ms':>10}{'p50 ms':>10}")
+    for basket in BASKETS:
+        timings = []
+        for _ in range(20):
+            start = time.perf_counter()
+            index.rank_by_coverage(basket, limit)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        label = ", ".join(basket)
+        if len(label) > 58:
+            label = label[:55] + "..."
+        print(f"{label:<60}{timings[0]:>10.2f}{timings[len(timings) // 2]:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory held per recipe as a parsed JSON dict vs. a slotted
+recipe_model.Recipe, plus the cost of converting back with to_dict().
+Each representation is loaded in its own process and measured by the
+growth of its peak RSS, so 1M recipes don't need tracemalloc's overhead.
+Run with: python benchmarks/bench_recipe_model.py [num_recipes]
+"""
+
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.catalog import generate_catalog
+from recipe_model import Recipe
+
+
+def peak_rss():
+    """Peak resident set size in bytes (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def load(kind, count):
+    """
+    Hold count recipes as kind ("dict" or "model"), parsed from JSON text
+    one at a time as the store reads them, and print the bytes per recipe.
+    """
+    documents = (json.dumps(recipe) for recipe in generate_catalog(count))
+    # Generate one recipe first so the generator's own setup isn't counted
+    first = json.loads(next(documents))
+    before = peak_rss()
+    if kind == "dict":
+        recipes = [first] + [json.loads(document) for document in documents]
+    else:
+        recipes = [Recipe.from_dict(first)] + [Recipe.from_dict(json.loads(document))
+                                               for document in documents]
+    print((peak_rss() - before) / len(recipes))
+
+    if kind == "model":
+        sample = recipes[:10000]
+        start = time.perf_counter()
+        for recipe in sample:
+            recipe.to_dict()
+        print((time.perf_counter() - start) / len(sample))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    results = {}
+    for kind in ("dict", "model"):
+        output = subprocess.run([sys.executable, __file__, "--measure", kind, str(count)],
+                                check=True, capture_output=True, text=True).stdout.split()
+        results[kind] = [float(value) for value in output]
+
+    dict_bytes, = results["dict"]
+    model_bytes, to_dict_seconds = results["model"]
+    print(f"{count} recipes: dict {dict_bytes:.0f} B/recipe, "
+          f"Recipe {model_bytes:.0f} B/recipe "
+          f"({1 - model_bytes / dict_bytes:.0%} smaller, "
+          f"{(dict_bytes - model_bytes) * count / 2 ** 20:.0f} MiB saved)")
+    print(f"to_dict(): {to_dict_seconds * 1e6:.1f} us per recipe")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3 and sys.argv[1] == "--measure":
+        load(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: GET /api/recipes and POST /api/recipes/search with and without
+the in-memory recipe store.
+Run with: python benchmarks/bench_recipe_store.py [num_recipes] [num_requests]
+"""
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app as recipe_app
+from benchmarks.catalog import write_catalog
+from storage import JsonDirectoryBackend
+
+
+def scan_directory():
+    """The original load_recipes: glob and parse every file."""
+    recipes = []
+    for recipe_file in recipe_app.RECIPES_DIR.glob("*.json"):
+        with open(recipe_file, 'r', encoding='utf-8') as f:
+            recipes.append(json.load(f))
+    return recipes
+
+
+def scan_intersections(selected_items, excluded_items=()):
+    """The original find_recipe_intersections: linear scan over a full load."""
+    selected_lower = [item.lower() for item in selected_items]
+    excluded_lower = [item.lower() for item in excluded_items]
+    matching = []
+    for recipe in scan_directory():
+        recipe_ingredients = [ing.lower() for ing in recipe.get("ingredients", {})]
+        if (all(item in recipe_ingredients for item in selected_lower)
+                and not any(item in recipe_ingredients for item in excluded_lower)):
+            matching.append(recipe)
+    return matching
+
+
+def requests_per_second(client, num_requests):
+    start = time.perf_counter()
+    for i in range(num_requests):
+        if i % 2:
+            client.get('/api/recipes')
+        else:
+            client.post('/api/recipes/search', json={"items": ["egg", "salt"]})
+    return num_requests / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    num_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    with tempfile.TemporaryDirectory() as tmp:
+        recipes_dir = Path(tmp)
+        print(f"Writing {count} recipes to {recipes_dir} ...")
+        write_catalog(recipes_dir, count)
+
+        recipe_app.RECIPES_DIR = recipes_dir
+        client = recipe_app.app.test_client()
+        cached_load = recipe_app.load_recipes
+        indexed_search = recipe_app.find_recipe_intersections
+
+        recipe_app.load_recipes = scan_directory
+        recipe_app.find_recipe_intersections = scan_intersections
+        before = requests_per_second(client, num_requests)
+
+        recipe_app.load_recipes = cached_load
+        recipe_app.find_recipe_intersections = indexed_search
+        recipe_app.recipe_store.backend = JsonDirectoryBackend(recipes_dir)
+        start = time.perf_counter()
+        recipe_app.recipe_store.refresh(force=True)
+        warmup = time.perf_counter() - start
+        after = requests_per_second(client, num_requests)
+
+    print(f"Catalog size:          {count}")
+    print(f"Store warm-up (once):  {warmup:.2f} s")
+    print(f"Before (scan per req): {before:.2f} req/s")
+    print(f"After (recipe store):  {after:.2f} req/s")
+    print(f"Speed-up:              {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
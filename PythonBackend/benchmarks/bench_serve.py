@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory of serve.py as the number of workers grows.
+
+Starts serve.py on a generated catalog with 1, 2 and 4 workers and sends
+requests that use every index (search with filters, suggestions, similar
+recipes, shopping lists), then reads each process's RSS, PSS (its share of
+pages mapped by several processes) and private memory from /proc.
+Linux only.
+Run with: python benchmarks/bench_serve.py [num_recipes]
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.catalog import write_catalog
+
+
+REQUESTS = [
+    ("POST", "/api/recipes/search", {"items": ["egg", "flour"], "max_total": 60}),
+    ("GET", "/api/ingredients/suggest?q=tom", None),
+    ("GET", "/api/recipes/recipe_1/similar", None),
+    ("POST", "/api/shopping-list", {"plan": ["recipe_1", "recipe_2"]}),
+]
+
+
+def memory(pid):
+    """(rss, pss, private) of a process in bytes."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                values[parts[0]] = int(parts[1]) * 1024
+    return values["Rss:"], values["Pss:"], values["Private_Clean:"] + values["Private_Dirty:"]
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure(recipes_dir, snapshot, workers):
+    port = free_port()
+    env = dict(os.environ, RECIPES_DIR=str(recipes_dir), PYTHONUNBUFFERED="1",
+               RECIPE_SIMILARITY=str(snapshot.with_suffix(".npz")))
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--snapshot", str(snapshot)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        for line in server.stdout:
+            if line.startswith("Serving on"):
+                break
+        # Enough rounds that every worker likely serves each request
+        for _ in range(10 * workers):
+            for method, path, body in REQUESTS:
+                request = urllib.request.Request(
+                    f"http://127.0.0.1:{port}{path}", method=method,
+                    data=json.dumps(body).encode() if body is not None else None,
+                    headers={"Content-Type": "application/json"})
+                urllib.request.urlopen(request).read()
+        time.sleep(0.5)
+        return memory(server.pid), [memory(pid) for pid in children(server.pid)]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    with tempfile.TemporaryDirectory() as tmp:
+        recipes_dir = Path(tmp) / "recipes"
+        recipes_dir.mkdir()
+        write_catalog(recipes_dir, count)
+        print(f"{count} recipes")
+        for workers in (1, 2, 4):
+            supervisor, worker_memory = measure(recipes_dir, Path(tmp) / "catalog.pack",
+                                                workers)
+            rss, pss, private = (sum(values) / len(worker_memory) / 2 ** 20
+                                 for values in zip(*worker_memory))
+            total = (supervisor[1] + sum(values[1] for values in worker_memory)) / 2 ** 20
+            print(f"{workers} workers: per worker {rss:.0f} MiB RSS, {pss:.0f} MiB PSS, "
+                  f"{private:.0f} MiB private; supervisor {supervisor[0] / 2 ** 20:.0f} MiB RSS; "
+                  f"total PSS {total:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
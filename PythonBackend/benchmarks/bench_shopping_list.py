@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark: shopping-list aggregation for large meal plans on a synthetic
+in-memory catalog, vectorized planner vs. a per-recipe Python loop.
+Run with: python benchmarks/bench_shopping_list.py [num_recipes] [plan_size]
+"""
+
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.catalog import generate_catalog
+from shopping_list import UNITS, ShoppingListPlanner, normalize_unit, parse_amount, recipe_servings
+
+
+def plan_with_loop(recipes, meals):
+    """Reference implementation: one recipe and one ingredient at a time."""
+    totals = defaultdict(float)
+    for recipe_id, servings in meals:
+        recipe = recipes[recipe_id]
+        scale = servings / recipe_servings(recipe)
+        ingredients = recipe["ingredients"]
+        if isinstance(ingredients, list):
+            for name in ingredients:
+                totals[(name.lower(), None)] += 0
+            continue
+        for name, spec in ingredients.items():
+            unit = normalize_unit(spec.get("unit"))
+            kind, size = UNITS.get(unit, (unit, 1.0))
+            totals[(name.lower(), kind)] += parse_amount(spec.get("amount")) * size * scale
+    return totals
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    plan_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    rounds = 20
+
+    recipes = {recipe["id"]: recipe for recipe in generate_catalog(count)}
+    planner = ShoppingListPlanner()
+    start = time.perf_counter()
+    planner.on_changes([(f"{recipe_id}.json", None, recipe)
+                        for recipe_id, recipe in recipes.items()])
+    len(planner)  # applies the queued changes
+    print(f"Built columns for {count} recipes in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    rng = random.Random(7)
+    ids = list(recipes)
+    plans = [[(rng.choice(ids), rng.randint(1, 200)) for _ in range(plan_size)]
+             for _ in range(rounds)]
+
+    for name, run in [("vectorized", lambda meals: planner.plan(meals)),
+                      ("python loop", lambda meals: plan_with_loop(recipes, meals))]:
+        samples = []
+        for meals in plans:
+            start = time.perf_counter()
+            run(meals)
+            samples.append(time.perf_counter() - start)
+        samples.sort()
+        print(f"{name:>12}: plan of {plan_size} recipes "
+              f"p50 {samples[len(samples) // 2] * 1000:.2f} ms, "
+              f"max {samples[-1] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
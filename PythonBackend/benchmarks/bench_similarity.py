@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: building the "goes well with" neighbour table with MinHash/LSH,
+updating it after a few edits, and how many of the exact top neighbours
+(by Jaccard similarity, compared pairwise) it finds.
+Run with: python benchmarks/bench_similarity.py [num_recipes]
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.catalog import INGREDIENTS, generate_catalog
+from similarity import MIN_SIMILARITY, TOP_K, SimilarityIndex, recipe_features
+
+# Recipes whose neighbours are checked against pairwise Jaccard
+SAMPLE = 200
+# Recipes edited between builds
+EDITS = 20
+
+
+def jaccard(a, b):
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+
+def exact_cutoff(features, filenames, target):
+    """
+    Reference implementation: Jaccard similarity against every recipe.
+    Returns the TOP_K-th best score and how many recipes reach it (ties
+    included), or (None, 0) if none are similar enough.
+    """
+    mine = features[target]
+    scores = sorted((jaccard(mine, features[filename]) for filename in filenames
+                     if filename != target), reverse=True)
+    scores = [score for score in scores[:TOP_K] if score >= MIN_SIMILARITY]
+    return (scores[-1], len(scores)) if scores else (None, 0)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = random.Random(7)
+    recipes = {f"{recipe['id']}.json": recipe for recipe in generate_catalog(count)}
+    filenames = list(recipes)
+
+    index = SimilarityIndex()
+    start = time.perf_counter()
+    index.on_changes([(filename, None, recipe) for filename, recipe in recipes.items()])
+    len(index)  # applies the queued changes
+    print(f"Built neighbours of {count} recipes in {time.perf_counter() - start:.2f} s")
+
+    features = {filename: recipe_features(recipe) for filename, recipe in recipes.items()}
+    sample = rng.sample(filenames, min(SAMPLE, count))
+    found = expected = 0
+    start = time.perf_counter()
+    for filename in sample:
+        cutoff, wanted = exact_cutoff(features, filenames, filename)
+        if not wanted:
+            continue
+        # Any neighbour as similar as the exact TOP_K-th counts; ties are common
+        found += min(wanted, sum(
+            jaccard(features[filename], features[name]) >= cutoff
+            for name, _ in index.similar(recipes[filename]["id"])))
+        expected += wanted
+    scan_ms = (time.perf_counter() - start) * 1000 / len(sample)
+    print(f"Recall of exact top-{TOP_K}: {found / max(expected, 1):.1%} "
+          f"(pairwise scan: {scan_ms:.1f} ms per recipe)")
+
+    lookups = []
+    for filename in sample:
+        start = time.perf_counter()
+        index.similar(recipes[filename]["id"])
+        lookups.append(time.perf_counter() - start)
+    lookups.sort()
+    print(f"Lookup p50 {lookups[len(lookups) // 2] * 1e6:.1f} us")
+
+    edited = []
+    for filename in rng.sample(filenames, min(EDITS, count)):
+        recipe = dict(recipes[filename])
+        ingredients = recipe["ingredients"]
+        name = rng.choice(INGREDIENTS)
+        if isinstance(ingredients, dict):
+            recipe["ingredients"] = {**ingredients, name: {"amount": "1", "unit": "cup"}}
+        else:
+            recipe["ingredients"] = ingredients + [name]
+        edited.append((filename, recipes[filename], recipe))
+    recomputed = index.recomputed
+    start = time.perf_counter()
+    index.on_changes(edited)
+    len(index)
+    print(f"Updated after {len(edited)} edits in {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"({index.recomputed - recomputed} rows recomputed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ingredient autocomplete on a synthetic vocabulary, suggester vs.
+scanning every name with difflib per keystroke.
+Run with: python benchmarks/bench_suggest.py [num_names]
+"""
+
+import difflib
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.catalog import generate_catalog
+from ingredient_suggest import IngredientSuggester
+
+QUERIES = ["to", "tom", "oliv", "tmato", "cinamon", "pepr", "brocolli", "chick"]
+
+
+def random_names(count, seed=3):
+    """Made-up one to three word ingredient names."""
+    rng = random.Random(seed)
+    return [" ".join("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+                     for _ in range(rng.randint(1, 3)))
+            for _ in range(count)]
+
+
+def suggest_by_scan(names, query, limit=10):
+    """Reference implementation: prefix scan, then difflib for the rest."""
+    matches = [name for name in names if name.startswith(query)][:limit]
+    if len(matches) < limit:
+        matches += difflib.get_close_matches(query, names, limit - len(matches), 0.8)
+    return matches
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rounds = 50
+
+    # Catalog ingredients plus random names, so the vocabulary has count names
+    recipes = list(generate_catalog(1000))
+    changes = [(f"{recipe['id']}.json", None, recipe) for recipe in recipes]
+    changes += [(f"extra{i}.json", None, {"id": f"extra{i}", "ingredients": [name]})
+                for i, name in enumerate(random_names(count))]
+    suggester = IngredientSuggester()
+    start = time.perf_counter()
+    suggester.on_changes(changes)
+    suggester.suggest("a")  # builds the key array
+    print(f"Indexed {len(suggester)} names in {(time.perf_counter() - start) * 1000:.0f} ms")
+    names = sorted(suggester._counts)
+
+    for query in QUERIES:
+        for name, run in [("suggester", lambda: suggester.suggest(query)),
+                          ("scan", lambda: suggest_by_scan(names, query))]:
+            samples = []
+            for _ in range(rounds if name == "suggester" else 3):
+                start = time.perf_counter()
+                matches = run()
+                samples.append(time.perf_counter() - start)
+            samples.sort()
+            print(f"{name:>10} {query!r}: {len(matches)} matches, "
+                  f"p50 {samples[len(samples) // 2] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory held per recipe for its ingredients as a set of name
+strings vs. an array of interned ids, and the cost of normalizing search
+inputs with and without the canonical-name cache.
+Run with: python benchmarks/bench_vocabulary.py [num_recipes]
+"""
+
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.catalog import INGREDIENTS, generate_catalog
+from ingredient_index import recipe_ingredient_ids
+from ingredient_vocab import IngredientVocabulary, canonical_ingredient
+
+
+def ingredient_keys(recipe):
+    ingredients = recipe["ingredients"]
+    return list(ingredients) if isinstance(ingredients, dict) else ingredients
+
+
+def measure(build):
+    """Bytes still allocated after build() returns, and its result."""
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    recipes = list(generate_catalog(count))
+    # Fresh strings per recipe, as json.load returns them
+    keys = [[name.encode().decode() for name in ingredient_keys(recipe)] for recipe in recipes]
+
+    name_sets, _ = measure(lambda: [{name.lower() for name in names} for names in keys])
+    vocabulary = IngredientVocabulary()
+    id_arrays, _ = measure(lambda: [recipe_ingredient_ids(recipe, vocabulary)
+                                    for recipe in recipes])
+    print(f"Ingredients of {count} recipes: name sets {name_sets / count:.0f} B/recipe, "
+          f"id arrays {id_arrays / count:.0f} B/recipe ({len(vocabulary)} names interned)")
+
+    queries = [[name.title() + "s" for name in INGREDIENTS[i:i + 4]]
+               for i in range(0, len(INGREDIENTS), 4)] * 2000
+    for name, normalize in [("cached", canonical_ingredient),
+                            ("uncached", canonical_ingredient.__wrapped__)]:
+        start = time.perf_counter()
+        for query in queries:
+            {normalize(item) for item in query}
+        elapsed = time.perf_counter() - start
+        print(f"{name:>9}: {elapsed / len(queries) * 1e6:.2f} us to normalize a 4-item basket")
+
+
+if __name__ == "__main__":
+    main()
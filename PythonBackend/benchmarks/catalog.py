@@ -0,0 +1,85 @@
+"""
+Synthetic Recipe Catalogs
+Generates recipes in the same JSON schema as recipes/*.json for benchmarks.
+"""
+
+import json
+import random
+from pathlib import Path
+
+INGREDIENTS = [
+    "salt", "egg", "flour", "sugar", "butter", "milk", "tomato", "cheese",
+    "garlic", "onion", "olive oil", "pepper", "basil", "lettuce", "bread",
+    "chicken", "beef", "rice", "pasta", "carrot", "potato", "sweet potato",
+    "vanilla", "chocolate", "lemon", "banana", "strawberry", "yogurt",
+    "honey", "soy sauce", "ginger", "broccoli", "mushroom", "spinach",
+    "cucumber", "tortilla", "bacon", "cream", "oats", "cinnamon",
+    "bell pepper", "corn", "beans", "avocado", "lime", "cilantro", "tofu",
+    "shrimp", "salmon", "apple", "parsley", "thyme", "rosemary", "paprika"
+]
+UNITS = ["cup", "tbsp", "tsp", "whole", "lb", "oz", "slice", "pinch", "large"]
+MATERIALS = ["oven", "pan", "pot", "bowl", "whisk", "knife", "cutting board",
+             "blender", "baking sheet", "spatula", "mixing bowl", "grill"]
+TYPES = ["main", "dessert", "side", "breakfast", "drink", "snack"]
+STEPS = ["Preheat the oven", "Chop the vegetables", "Mix the dry ingredients",
+         "Whisk the eggs", "Heat oil in a pan", "Simmer for 10 minutes",
+         "Season to taste", "Bake until golden", "Let it cool", "Serve warm"]
+
+# Share of recipes that use the legacy list format for ingredients
+LEGACY_FRACTION = 0.1
+
+
+def generate_recipe(rng, index):
+    """Return one synthetic recipe dict."""
+    # Popular ingredients (salt, egg, ...) show up far more often
+    weights = [1.0 / (rank + 1) for rank in range(len(INGREDIENTS))]
+    names = list(dict.fromkeys(rng.choices(INGREDIENTS, weights, k=rng.randint(3, 10))))
+
+    if rng.random() < LEGACY_FRACTION:
+        ingredients = names
+    else:
+        ingredients = {
+            name: {"amount": rng.choice([0.25, 0.5, 1, 1.5, 2, 3, 4]),
+                   "unit": rng.choice(UNITS)}
+            for name in names
+        }
+
+    prep = rng.choice([5, 10, 15, 20, 30])
+    total = prep + rng.choice([5, 10, 20, 30, 45, 60, 90])
+    if rng.random() < 0.05:
+        time = f"{total} minutes"
+    else:
+        time = [f"{prep} minutes", f"{total} minutes"]
+
+    recipe_id = f"recipe_{index}"
+    return {
+        "id": recipe_id,
+        "name": f"{rng.choice(names)} {rng.choice(TYPES)} {index}",
+        "type": rng.choice(TYPES),
+        "ingredients": ingredients,
+        "steps": [f"{i}. {step}" for i, step in
+                  enumerate(rng.sample(STEPS, rng.randint(3, 8)), 1)],
+        "time": time,
+        "servings": rng.randint(1, 8),
+        "materials": rng.sample(MATERIALS, rng.randint(1, 4)),
+        "image": f"{recipe_id}.jpg",
+        "combos": [f"recipe_{rng.randrange(index + 1)}.jpg"
+                   for _ in range(rng.choice([0, 0, 1, 2]))]
+    }
+
+
+def generate_catalog(count, seed=42):
+    """Yield count synthetic recipes; the same seed gives the same catalog."""
+    rng = random.Random(seed)
+    for index in range(count):
+        yield generate_recipe(rng, index)
+
+
+def write_catalog(recipes_dir, count, seed=42):
+    """Write count synthetic recipes as <id>.json files into recipes_dir."""
+    recipes_dir = Path(recipes_dir)
+    recipes_dir.mkdir(parents=True, exist_ok=True)
+    for recipe in generate_catalog(count, seed):
+        with open(recipes_dir / f"{recipe['id']}.json", 'w', encoding='utf-8') as f:
+            json.dump(recipe, f, indent=2, ensure_ascii=False)
+    return recipes_dir
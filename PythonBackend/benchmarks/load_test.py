@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Load test: many concurrent keep-alive connections against the Flask server
+(app.py, threaded werkzeug) and the ASGI server (asgi_app.py under uvicorn).
+
+Both servers are started on a generated catalog. Every connection sends
+requests back to back for --duration seconds; most requests are the same
+few searches, as when many clients show the same menu, mixed with recipe
+and display GETs. Reports throughput, latency percentiles and errors.
+
+Run with:
+    python benchmarks/load_test.py --connections 1000 --duration 20 --recipes 10000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.catalog import write_catalog
+from benchmarks.suite import summarize
+
+SEARCHES = [{"items": ["egg", "flour"]}, {"items": ["tomato", "cheese"]},
+            {"items": ["salt"], "mode": "ranked", "limit": 10}]
+SERVERS = {
+    "flask": [sys.executable, "-c",
+              "import sys, app; app.app.run(port=int(sys.argv[1]), threaded=True)"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi_app:app", "--log-level", "warning",
+             "--backlog", "4096", "--port"],
+}
+
+
+def build_request(rng, recipe_count):
+    """One HTTP/1.1 request: 60% identical searches, the rest GETs."""
+    roll = rng.random()
+    if roll < 0.6:
+        body = json.dumps(rng.choice(SEARCHES)).encode()
+        return (b"POST /api/recipes/search HTTP/1.1\r\nHost: localhost\r\n"
+                b"Content-Type: application/json\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+    recipe_id = f"recipe_{rng.randrange(recipe_count)}"
+    path = f"/api/recipes/{recipe_id}" if roll < 0.85 else f"/api/recipes/{recipe_id}/display/card"
+    return f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode()
+
+
+async def read_response(reader):
+    """Read one response; returns (status, keep_alive)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+    length = 0
+    keep_alive = not status_line.startswith(b"HTTP/1.0")
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection":
+            keep_alive = value.strip().lower() == "keep-alive"
+    await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def client(port, deadline, recipe_count, seed, results):
+    rng = random.Random(seed)
+    reader = writer = None
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            start = time.perf_counter()
+            writer.write(build_request(rng, recipe_count))
+            status, keep_alive = await read_response(reader)
+            results["latencies"].append(time.perf_counter() - start)
+            if status != 200:
+                results["errors"] += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            results["errors"] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(port, connections, duration, recipe_count):
+    results = {"latencies": [], "errors": 0}
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, deadline, recipe_count, seed, results)
+                           for seed in range(connections)))
+    elapsed = time.perf_counter() - start
+    report = summarize(results["latencies"], elapsed) if results["latencies"] else {}
+    report["errors"] = results["errors"]
+    return report
+
+
+def wait_until_up(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=5):
+                return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def benchmark_server(name, port, recipes_dir, args):
+    env = dict(os.environ, RECIPES_DIR=str(recipes_dir), RECIPE_PACK=str(recipes_dir / "none.pack"))
+    process = subprocess.Popen(SERVERS[name] + [str(port)], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_up(port, args.start_timeout):
+            return {"error": "server did not start"}
+        # Warm up: load the catalog and caches before measuring
+        asyncio.run(run_load(port, 10, 2, args.recipes))
+        return asyncio.run(run_load(port, args.connections, args.duration, args.recipes))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-connection load test")
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--recipes", type=int, default=10000)
+    parser.add_argument("--servers", default="flask,asgi")
+    parser.add_argument("--port", type=int, default=5100)
+    parser.add_argument("--start-timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        recipes_dir = write_catalog(Path(tmp) / "recipes", args.recipes)
+        report = {"connections": args.connections, "duration_s": args.duration,
+                  "recipes": args.recipes, "results": {}}
+        for offset, name in enumerate(args.servers.split(",")):
+            print(f"Load testing {name}...", file=sys.stderr)
+            report["results"][name] = benchmark_server(name, args.port + offset, recipes_dir, args)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the recipe API.
+
+For each catalog size a synthetic catalog is written to a temporary
+directory and a fresh Python process benchmarks the Flask endpoints
+(through the test client) and the underlying functions directly.
+Results are latency percentiles and throughput, reported as JSON.
+
+Run with:
+    python benchmarks/suite.py --sizes 1000,10000 --output results.json
+    python benchmarks/suite.py --sizes 1000,10000 --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.catalog import write_catalog
+
+BASKETS = [["salt"], ["egg", "flour"], ["tomato", "cheese", "basil"],
+           ["salt", "egg", "butter", "sugar"], ["saffron"]]
+DISPLAY_FUNCTIONS = ["display_recipe_simple", "display_recipe_ingredients",
+                     "display_recipe_steps", "display_recipe_materials",
+                     "display_recipe_full", "display_recipe_card",
+                     "display_recipe_json"]
+
+
+def summarize(samples, elapsed):
+    """Latency percentiles (ms) and throughput for a list of durations (s)."""
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 4),
+        "p50_ms": round(pct(50), 4),
+        "p90_ms": round(pct(90), 4),
+        "p99_ms": round(pct(99), 4),
+        "max_ms": round(ordered[-1] * 1000, 4),
+        "ops_per_sec": round(len(ordered) / elapsed, 2) if elapsed else None
+    }
+
+
+def measure(func, args_list):
+    """Call func(*args) for every args tuple and summarize the timings."""
+    samples = []
+    start = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - start)
+
+
+def run_benchmarks(size, iterations):
+    """Benchmark the app against the catalog in $RECIPES_DIR (child process)."""
+    import app as recipe_app
+    import recipe_display
+
+    results = {}
+    ids = [f"recipe_{i * 7919 % size}" for i in range(iterations)]
+
+    # Cold start: first full load of the directory
+    start = time.perf_counter()
+    recipe_app.recipe_store.refresh(force=True)
+    results["store.cold_load"] = summarize([time.perf_counter() - start], None)
+
+    # Functions called directly
+    results["direct.load_recipes"] = measure(recipe_app.load_recipes, [()] * iterations)
+    results["direct.load_recipe"] = measure(recipe_display.load_recipe, [(i,) for i in ids])
+    results["direct.find_recipe_intersections"] = measure(
+        recipe_app.find_recipe_intersections,
+        [(BASKETS[i % len(BASKETS)],) for i in range(iterations)])
+    recipes = [recipe_display.load_recipe(i) for i in ids]
+    for name in DISPLAY_FUNCTIONS:
+        results[f"direct.{name}"] = measure(
+            getattr(recipe_display, name), [(recipe,) for recipe in recipes])
+
+    # Endpoints through the Flask test client
+    client = recipe_app.app.test_client()
+
+    def get(url):
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+
+    def post(url, body):
+        response = client.post(url, json=body)
+        assert response.status_code in (200, 201), (url, response.status_code)
+
+    def put(url, body):
+        assert client.put(url, json=body).status_code == 200, url
+
+    def delete(url):
+        assert client.delete(url).status_code == 200, url
+
+    # The full list is O(catalog); keep it affordable on big catalogs
+    full_list_runs = max(1, min(iterations, 200000 // size))
+    results["api.list_full"] = measure(get, [("/api/recipes",)] * full_list_runs)
+    results["api.list_page"] = measure(
+        get, [("/api/recipes?limit=100&fields=id,name,type,time",)] * iterations)
+    results["api.get"] = measure(get, [(f"/api/recipes/{i}",) for i in ids])
+    results["api.search"] = measure(
+        post, [("/api/recipes/search", {"items": BASKETS[i % len(BASKETS)]})
+               for i in range(iterations)])
+    results["api.search_ranked"] = measure(
+        post, [("/api/recipes/search", {"items": BASKETS[i % len(BASKETS)],
+                                        "mode": "ranked", "limit": 10})
+               for i in range(iterations)])
+    results["api.display"] = measure(
+        get, [(f"/api/recipes/{i}/display/full",) for i in ids])
+    results["api.display_all"] = measure(get, [(f"/api/recipes/{i}/display",) for i in ids])
+
+    new_ids = [f"bench_{i}" for i in range(iterations)]
+    template = recipes[0].to_dict()
+    results["api.create"] = measure(
+        post, [("/api/recipes", dict(template, id=i)) for i in new_ids])
+    results["api.update"] = measure(
+        put, [(f"/api/recipes/{i}", dict(template, servings=2)) for i in new_ids])
+    results["api.delete"] = measure(delete, [(f"/api/recipes/{i}",) for i in new_ids])
+
+    return results
+
+
+def run_size(size, iterations):
+    """Write a catalog of `size` recipes and benchmark it in a fresh process."""
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        write_catalog(tmp, size)
+        print(f"  wrote {size} recipes in {time.perf_counter() - start:.1f}s",
+              file=sys.stderr)
+
+        env = dict(os.environ, RECIPES_DIR=tmp)
+        child = subprocess.run(
+            [sys.executable, __file__, "--child", "--sizes", str(size),
+             "--iterations", str(iterations)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+        if child.returncode != 0:
+            sys.stderr.write(child.stderr)
+            raise SystemExit(f"Benchmark for size {size} failed")
+        return json.loads(child.stdout)
+
+
+def compare(report, baseline, threshold):
+    """Print p50 changes against a baseline report; return regression count."""
+    regressions = 0
+    old_runs = {run["size"]: run["results"] for run in baseline["runs"]}
+    for run in report["runs"]:
+        old_results = old_runs.get(run["size"])
+        if old_results is None:
+            continue
+        print(f"\nsize={run['size']}  (p50, regression if >{threshold:.0%} slower)")
+        for name, result in run["results"].items():
+            old = old_results.get(name)
+            if not old or not old["p50_ms"]:
+                continue
+            change = result["p50_ms"] / old["p50_ms"] - 1
+            flag = "REGRESSION" if change > threshold else ""
+            regressions += bool(flag)
+            print(f"  {name:<40}{old['p50_ms']:>10.3f} -> {result['p50_ms']:>10.3f} ms"
+                  f"  {change:+7.1%} {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recipe API benchmark suite")
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="comma-separated catalog sizes (1000 to 1000000)")
+    parser.add_argument("--iterations", type=int, default=200,
+                        help="calls per benchmark")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="p50 slowdown that counts as a regression (0.2 = 20%%)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    if args.child:
+        print(json.dumps(run_benchmarks(sizes[0], args.iterations)))
+        return
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations
+        },
+        "runs": []
+    }
+    for size in sizes:
+        print(f"Benchmarking catalog of {size} recipes ...", file=sys.stderr)
+        report["runs"].append({"size": size, "results": run_size(size, args.iterations)})
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding='utf-8')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
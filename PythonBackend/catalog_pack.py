@@ -0,0 +1,314 @@
+"""
+Packed Catalog
+Compiles the recipes/*.json directory into one file that the server opens
+with mmap. Recipes are only JSON-decoded when they are accessed.
+
+The JSON files stay the source of truth: each packed record remembers the
+mtime and size of the file it came from, and the recipe store only uses a
+record while that file is unchanged.
+
+Layout (little-endian):
+    header        magic, version, counts and section offsets
+    records       one fixed-size entry per recipe, sorted by filename
+    ingredients   interned ingredient dictionary, sorted by name
+    ing_lists     per-record ingredient numbers (uint32)
+    strings       UTF-8 filenames, ids and ingredient names
+    data          compact JSON of every recipe
+
+Usage:
+    python catalog_pack.py compile [recipes_dir] [output]
+    python catalog_pack.py info [pack_file]
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from ingredient_index import recipe_ingredient_names
+from recipe_model import compact_recipe
+
+MAGIC = b"RKPACK01"
+# 2: ingredient names are canonical (ingredient_vocab); bump again whenever
+# NORMALIZATION_VERSION changes
+# 3: ids that aren't strings are stored JSON-encoded (was: only ints, as str())
+# 4: no id table or postings; the store and the indexes never read them
+# 5: NORMALIZATION_VERSION 2
+VERSION = 5
+DEFAULT_PACK_PATH = Path(__file__).parent / "data" / "catalog.pack"
+
+HEADER = struct.Struct("<8sIII5Q")
+RECORD_DTYPE = np.dtype([
+    ("data_off", "<u8"), ("data_len", "<u4"),
+    ("mtime_ns", "<i8"), ("file_size", "<u8"),
+    ("filename_off", "<u8"), ("filename_len", "<u4"),
+    ("id_off", "<u8"), ("id_len", "<u4"), ("id_is_json", "u1"),
+    ("ings_off", "<u8"), ("ings_count", "<u4"),
+])
+INGREDIENT_DTYPE = np.dtype([("name_off", "<u8"), ("name_len", "<u4")])
+
+
+class _Strings:
+    """Accumulates interned UTF-8 strings for the strings section."""
+
+    def __init__(self):
+        self.blob = bytearray()
+        self._offsets = {}
+
+    def add(self, text):
+        ref = self._offsets.get(text)
+        if ref is None:
+            encoded = text.encode('utf-8')
+            ref = self._offsets[text] = (len(self.blob), len(encoded))
+            self.blob += encoded
+        return ref
+
+
+def compile_catalog(recipes_dir, output_path=DEFAULT_PACK_PATH):
+    """Pack every recipe JSON file in recipes_dir into output_path."""
+    recipes_dir = Path(recipes_dir)
+    output_path = Path(output_path)
+    strings = _Strings()
+    data = bytearray()
+    records = []
+    ing_lists = []
+    names_by_record = []
+
+    for recipe_file in sorted(recipes_dir.glob("*.json")):
+        try:
+            st = recipe_file.stat()
+            with open(recipe_file, 'r', encoding='utf-8') as f:
+                recipe = json.load(f)
+            recipe_id = recipe.get("id")
+        except Exception as e:
+            # Unreadable, not JSON, or JSON that isn't a recipe object
+            print(f"Skipping {recipe_file}: {e}")
+            continue
+
+        blob = json.dumps(recipe, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+        filename_ref = strings.add(recipe_file.name)
+        # Ids that aren't strings (7, true, null) keep their JSON type
+        id_is_json = not isinstance(recipe_id, str)
+        id_ref = strings.add(json.dumps(recipe_id) if id_is_json else recipe_id)
+        names_by_record.append(sorted(recipe_ingredient_names(recipe)))
+        records.append((len(data), len(blob), st.st_mtime_ns, st.st_size,
+                        filename_ref[0], filename_ref[1], id_ref[0], id_ref[1],
+                        int(id_is_json), 0, 0))
+        data += blob
+
+    # Interned ingredient dictionary
+    vocabulary = sorted({name for names in names_by_record for name in names})
+    numbers = {name: i for i, name in enumerate(vocabulary)}
+    for record_no, names in enumerate(names_by_record):
+        fields = records[record_no]
+        records[record_no] = fields[:9] + (len(ing_lists), len(names))
+        ing_lists.extend(numbers[name] for name in names)
+    ingredient_entries = [strings.add(name) for name in vocabulary]
+
+    sections = [
+        np.array(records, dtype=RECORD_DTYPE).tobytes(),
+        np.array(ingredient_entries, dtype=INGREDIENT_DTYPE).tobytes(),
+        np.array(ing_lists, dtype="<u4").tobytes(),
+        bytes(strings.blob),
+        bytes(data),
+    ]
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records), len(vocabulary), *offsets))
+        for section in sections:
+            f.write(section)
+    # Readers that already mapped the old file keep a valid view of it
+    os.replace(tmp_path, output_path)
+    return len(records)
+
+
+class PackedRecord:
+    """Handle to one packed recipe; decodes the JSON on first use."""
+
+    __slots__ = ("catalog", "index")
+
+    def __init__(self, catalog, index):
+        self.catalog = catalog
+        self.index = index
+
+    def recipe(self):
+        return self.catalog.recipe(self.index)
+
+    def get(self, key, default=None):
+        # The id is in the record table, so listeners can index without decoding
+        if key == "id":
+            return self.catalog.recipe_id(self.index)
+        return self.recipe().get(key, default)
+
+    def ingredient_names(self):
+        return self.catalog.ingredient_names(self.index)
+
+
+def resolve(recipe):
+    """Return the Recipe for a PackedRecord, a Recipe or a plain recipe dict."""
+    if isinstance(recipe, PackedRecord):
+        return recipe.recipe()
+    return compact_recipe(recipe)
+
+
+class PackedCatalog:
+    """
+    Read-only, memory-mapped view of a compiled catalog file.
+
+    Decoded recipes are kept for reuse; with cache_size set, only that many
+    of the most recently used ones are, which bounds the memory of a worker
+    that serves from the pack (see serve.py).
+    """
+
+    def __init__(self, path, cache_size=None):
+        self.path = Path(path)
+        self.cache_size = cache_size
+        self._decoded = OrderedDict()  # record number -> Recipe
+        self._decoded_lock = threading.Lock()
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, record_count, ingredient_count, records_off,
+         ingredients_off, ing_lists_off, strings_off,
+         self._data_off) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} recipe pack")
+
+        # Zero-copy NumPy views straight onto the mapped file
+        buf = memoryview(self._mm)
+        self._records = np.frombuffer(buf, RECORD_DTYPE, record_count, records_off)
+        self._ingredients = np.frombuffer(buf, INGREDIENT_DTYPE, ingredient_count,
+                                          ingredients_off)
+        self._ing_lists = np.frombuffer(buf, "<u4", (strings_off - ing_lists_off) // 4,
+                                        ing_lists_off)
+        self._strings_off = strings_off
+        self._vocabulary = None
+        self._file_numbers = None
+
+    def __len__(self):
+        return len(self._records)
+
+    def _string(self, offset, length):
+        start = self._strings_off + int(offset)
+        return self._mm[start:start + int(length)].decode('utf-8')
+
+    def filename(self, index):
+        record = self._records[index]
+        return self._string(record["filename_off"], record["filename_len"])
+
+    def signature(self, index):
+        """(mtime_ns, size) of the source file when it was packed."""
+        record = self._records[index]
+        return int(record["mtime_ns"]), int(record["file_size"])
+
+    def recipe_id(self, index):
+        record = self._records[index]
+        recipe_id = self._string(record["id_off"], record["id_len"])
+        return json.loads(recipe_id) if record["id_is_json"] else recipe_id
+
+    def filenames(self):
+        """Names of every packed file."""
+        return list(self._files())
+
+    def find_file(self, filename):
+        """Return the record number packed from filename, or None."""
+        return self._files().get(filename)
+
+    def _files(self):
+        if self._file_numbers is None:
+            # The store looks up every file at startup, so decode all the
+            # filenames in one pass rather than binary searching each time
+            strings = self._mm[self._strings_off:self._data_off]
+            offsets = self._records["filename_off"].tolist()
+            lengths = self._records["filename_len"].tolist()
+            self._file_numbers = {
+                strings[offset:offset + length].decode('utf-8'): i
+                for i, (offset, length) in enumerate(zip(offsets, lengths))
+            }
+        return self._file_numbers
+
+    def decode(self, index):
+        """JSON-decode one recipe."""
+        record = self._records[index]
+        start = self._data_off + int(record["data_off"])
+        return json.loads(self._mm[start:start + int(record["data_len"])])
+
+    def recipe(self, index):
+        """Return the Recipe for a record, decoding it at most once while it
+        stays cached."""
+        with self._decoded_lock:
+            recipe = self._decoded.get(index)
+            if recipe is not None:
+                if self.cache_size is not None:
+                    self._decoded.move_to_end(index)
+                return recipe
+        recipe = compact_recipe(self.decode(index))
+        with self._decoded_lock:
+            self._decoded[index] = recipe
+            if self.cache_size is not None:
+                while len(self._decoded) > self.cache_size:
+                    self._decoded.popitem(last=False)
+        return recipe
+
+    def vocabulary(self):
+        """All interned ingredient names, in dictionary order."""
+        if self._vocabulary is None:
+            self._vocabulary = [self._string(entry["name_off"], entry["name_len"])
+                                for entry in self._ingredients]
+        return self._vocabulary
+
+    def ingredient_names(self, index):
+        record = self._records[index]
+        start = int(record["ings_off"])
+        numbers = self._ing_lists[start:start + int(record["ings_count"])]
+        vocabulary = self.vocabulary()
+        return {vocabulary[number] for number in numbers}
+
+    def record(self, index):
+        return PackedRecord(self, index)
+
+    def close(self):
+        # Drop the views before unmapping
+        self._records = self._ingredients = self._ing_lists = None
+        self._mm.close()
+
+
+def open_pack(path, cache_size=None):
+    """Open a pack file, or return None if it is missing or unreadable."""
+    try:
+        return PackedCatalog(path, cache_size)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Ignoring recipe pack {path}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+
+    if command == "compile":
+        recipes_dir = sys.argv[2] if len(sys.argv) > 2 else Path(__file__).parent / "recipes"
+        output = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_PACK_PATH
+        count = compile_catalog(recipes_dir, output)
+        print(f"Packed {count} recipes into {output}")
+    elif command == "info":
+        pack = PackedCatalog(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PACK_PATH)
+        print(f"{pack.path}: {len(pack)} recipes, {len(pack.vocabulary())} ingredients, "
+              f"{pack.path.stat().st_size} bytes")
+    else:
+        print("Usage: python catalog_pack.py compile [recipes_dir] [output]")
+        print("       python catalog_pack.py info [pack_file]")
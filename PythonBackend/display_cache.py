@@ -0,0 +1,127 @@
+"""
+Display Cache
+LRU cache of rendered recipe display text.
+"""
+
+import threading
+from collections import OrderedDict
+
+import metrics
+from recipe_store import id_key
+
+
+class DisplayCache:
+    """
+    LRU cache keyed by (recipe id, content hash, format).
+
+    Because the content hash is part of the key, an edited recipe can never
+    be served from a stale entry. Entries for a recipe are also dropped as
+    soon as the store reports it changed, so they don't linger until evicted.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # (id_key, hash, format) -> text
+        self._keys_by_id = {}          # id_key -> set of entry keys
+        self._lock = threading.Lock()
+
+    def get_or_render(self, recipe, content_hash, display_format, render):
+        """Return cached text for this recipe/format, rendering on a miss."""
+        recipe_key = id_key(recipe.get("id"))
+        key = (recipe_key, content_hash, display_format)
+
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text
+            self.misses += 1
+
+        # Render outside the lock so slow renders don't block other readers
+        with metrics.phase("render"):
+            text = render(recipe)
+
+        with self._lock:
+            self._store(key, text)
+        return text
+
+    def get_or_render_formats(self, recipe, content_hash, formats, render_formats):
+        """
+        Return {format: text} for several formats. The missing ones are
+        rendered by one render_formats(recipe, missing) call, so they share
+        the pieces they have in common (recipe_display.RecipeParts).
+        """
+        recipe_key = id_key(recipe.get("id"))
+        texts = {}
+        with self._lock:
+            for display_format in formats:
+                key = (recipe_key, content_hash, display_format)
+                text = self._entries.get(key)
+                if text is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    texts[display_format] = text
+                else:
+                    self.misses += 1
+
+        missing = [display_format for display_format in formats if display_format not in texts]
+        if missing:
+            with metrics.phase("render"):
+                rendered = render_formats(recipe, missing)
+            with self._lock:
+                for display_format in missing:
+                    self._store((recipe_key, content_hash, display_format),
+                                rendered[display_format])
+            texts.update(rendered)
+        return {display_format: texts[display_format] for display_format in formats}
+
+    def _store(self, key, text):
+        """Add an entry and evict down to maxsize; call with the lock held."""
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = text
+        self._keys_by_id.setdefault(key[0], set()).add(key)
+        while len(self._entries) > self.maxsize:
+            old_key, _ = self._entries.popitem(last=False)
+            self._forget(old_key)
+            self.evictions += 1
+
+    def _forget(self, key):
+        keys = self._keys_by_id.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_id[key[0]]
+
+    def invalidate(self, recipe_id):
+        """Drop every cached format of a recipe."""
+        with self._lock:
+            for key in self._keys_by_id.pop(id_key(recipe_id), ()):
+                self._entries.pop(key, None)
+
+    def on_change(self, filename, old_recipe, new_recipe):
+        """RecipeStore listener."""
+        if old_recipe is not None:
+            self.invalidate(old_recipe.get("id"))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_id.clear()
+
+    def stats(self):
+        """Return hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize
+            }
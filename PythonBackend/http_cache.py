@@ -0,0 +1,98 @@
+"""
+HTTP Caching Helpers
+Strong ETags, 304 responses to If-None-Match (compared weakly), and gzip
+compression of large JSON bodies with the compressed bytes cached per ETag.
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, jsonify, request
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+# How many compressed bodies to keep (one per ETag)
+COMPRESSED_CACHE_SIZE = 64
+
+
+def make_etag(*parts):
+    """Build a strong ETag value from anything that identifies the content."""
+    digest = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        elif not isinstance(part, bytes):
+            part = str(part).encode('utf-8')
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CompressedCache:
+    """Small LRU of gzip-compressed response bodies keyed by ETag."""
+
+    def __init__(self, maxsize=COMPRESSED_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag):
+        with self._lock:
+            body = self._bodies.get(etag)
+            if body is not None:
+                self._bodies.move_to_end(etag)
+            return body
+
+    def put(self, etag, body):
+        with self._lock:
+            self._bodies[etag] = body
+            while len(self._bodies) > self.maxsize:
+                self._bodies.popitem(last=False)
+
+
+compressed_cache = CompressedCache()
+
+
+def _finish(response, etag):
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate it on every use
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def cached_json_response(etag, build_payload):
+    """
+    Return a JSON response for the content identified by etag.
+
+    build_payload() is only called when the client doesn't already have
+    this version and, for gzip clients, when the compressed body isn't
+    cached yet. The gzip variant gets its own ETag ("<etag>-gz") as
+    required for a strong validator.
+    """
+    gzip_etag = etag + "-gz"
+    # If-None-Match uses the weak comparison (RFC 9110 13.1.2): proxies that
+    # re-encode a body send the ETag back as W/"..."
+    if_none_match = request.if_none_match
+    if if_none_match.contains_weak(etag) or if_none_match.contains_weak(gzip_etag):
+        response = Response(status=304)
+        accepts_gzip = "gzip" in request.accept_encodings
+        return _finish(response, gzip_etag if accepts_gzip else etag)
+
+    if "gzip" in request.accept_encodings:
+        body = compressed_cache.get(gzip_etag)
+        if body is None:
+            response = jsonify(build_payload())
+            raw = response.get_data()
+            if len(raw) < MIN_COMPRESS_SIZE:
+                return _finish(response, etag)
+            body = gzip.compress(raw, compresslevel=6, mtime=0)
+            compressed_cache.put(gzip_etag, body)
+        response = Response(body, mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+        return _finish(response, gzip_etag)
+
+    return _finish(jsonify(build_payload()), etag)
@@ -0,0 +1,318 @@
+"""
+Ingredient Index
+Inverted index from ingredient name to the recipes that use it.
+"""
+
+import threading
+from array import array
+
+import numpy as np
+
+from ingredient_vocab import VOCABULARY, canonical_ingredient
+from postings import (
+    ArrayPosting,
+    count_matches,
+    evaluate,
+    filter_ids,
+    optimize,
+    posting_ids,
+    top_k
+)
+
+
+def normalize_ingredient(name):
+    """Normalize an ingredient name for matching (see ingredient_vocab)."""
+    return canonical_ingredient(name)
+
+
+def recipe_ingredient_names(recipe):
+    """Return the set of normalized ingredient names used by a recipe."""
+    # Packed recipes (catalog_pack.PackedRecord) carry their names already
+    # extracted, so indexing them doesn't decode the recipe
+    packed_names = getattr(recipe, "ingredient_names", None)
+    if packed_names is not None:
+        return packed_names()
+
+    ingredients = recipe.get("ingredients", {})
+
+    if isinstance(ingredients, dict):
+        # New format: dictionary with ingredient names as keys
+        names = ingredients.keys()
+    elif isinstance(ingredients, list):
+        # Old format: simple list
+        names = ingredients
+    else:
+        names = []
+
+    return {normalize_ingredient(name) for name in names}
+
+
+def recipe_ingredient_ids(recipe, vocabulary=VOCABULARY):
+    """Return the sorted interned ids of a recipe's ingredients."""
+    return array('I', sorted({vocabulary.intern(name) for name in recipe_ingredient_names(recipe)}))
+
+
+def _loaded(recipe):
+    """The Recipe for a packed record (decoded on first use); Recipes and
+    plain dicts pass through."""
+    packed = getattr(recipe, "recipe", None)
+    return packed() if packed is not None else recipe
+
+
+class IngredientIndex:
+    """
+    Maps each ingredient to a posting of recipe doc ids.
+
+    Doc ids are small integers assigned per recipe file, and ingredients
+    are keyed by their interned id in the shared vocabulary; each recipe
+    keeps a sorted array of its ingredient ids rather than a set of names.
+    The index is kept up to date through RecipeStore.subscribe(), so
+    creating, updating or deleting a recipe only touches the postings of
+    its own ingredients.
+    """
+
+    def __init__(self, vocabulary=VOCABULARY):
+        self.vocabulary = vocabulary
+        self._postings = {}      # ingredient id -> ArrayPosting/BitmapPosting
+        self._doc_ids = {}       # filename -> doc id
+        self._recipes = {}       # doc id -> Recipe, recipe dict or PackedRecord
+        self._ingredients = {}   # doc id -> array('I') of sorted ingredient ids
+        self._sizes = array('H')  # doc id -> number of ingredients
+        self._free_ids = []
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+    def _assign_id(self, filename):
+        doc_id = self._doc_ids.get(filename)
+        if doc_id is None:
+            if self._free_ids:
+                doc_id = self._free_ids.pop()
+            else:
+                doc_id = self._next_id
+                self._next_id += 1
+            self._doc_ids[filename] = doc_id
+        return doc_id
+
+    def _add_posting(self, ingredient_id, doc_id, touched=None):
+        posting = self._postings.get(ingredient_id)
+        if posting is None:
+            posting = self._postings[ingredient_id] = ArrayPosting()
+        posting.add(doc_id)
+        self._settle(ingredient_id, touched)
+
+    def _remove_posting(self, ingredient_id, doc_id, touched=None):
+        posting = self._postings.get(ingredient_id)
+        if posting is None:
+            return
+        posting.discard(doc_id)
+        self._settle(ingredient_id, touched)
+
+    def _settle(self, ingredient_id, touched):
+        """Re-pick a changed posting's representation, or defer it to the
+        end of a batch by adding ingredient_id to touched."""
+        if touched is not None:
+            touched.add(ingredient_id)
+            return
+        posting = self._postings[ingredient_id]
+        if posting:
+            self._postings[ingredient_id] = optimize(posting, self._next_id)
+        else:
+            del self._postings[ingredient_id]
+
+    def _add(self, filename, recipe, touched=None):
+        doc_id = self._assign_id(filename)
+        old_ids = set(self._ingredients.get(doc_id, ()))
+        new_ids = recipe_ingredient_ids(recipe, self.vocabulary)
+
+        for ingredient_id in old_ids.difference(new_ids):
+            self._remove_posting(ingredient_id, doc_id, touched)
+        for ingredient_id in set(new_ids) - old_ids:
+            self._add_posting(ingredient_id, doc_id, touched)
+
+        self._ingredients[doc_id] = new_ids
+        self._recipes[doc_id] = recipe
+        if doc_id >= len(self._sizes):
+            self._sizes.extend([0] * (doc_id + 1 - len(self._sizes)))
+        self._sizes[doc_id] = min(len(new_ids), 0xFFFF)
+
+    def _remove(self, filename, touched=None):
+        doc_id = self._doc_ids.pop(filename, None)
+        if doc_id is None:
+            return
+        for ingredient_id in self._ingredients.pop(doc_id, ()):
+            self._remove_posting(ingredient_id, doc_id, touched)
+        del self._recipes[doc_id]
+        self._sizes[doc_id] = 0
+        self._free_ids.append(doc_id)
+
+    def add(self, filename, recipe):
+        """Index (or re-index) the recipe stored in filename."""
+        with self._lock:
+            self._add(filename, recipe)
+
+    def remove(self, filename):
+        """Drop the recipe stored in filename from the index."""
+        with self._lock:
+            self._remove(filename)
+
+    def on_change(self, filename, old_recipe, new_recipe):
+        """RecipeStore listener."""
+        if new_recipe is None:
+            self.remove(filename)
+        else:
+            self.add(filename, new_recipe)
+
+    def on_changes(self, changes):
+        """
+        RecipeStore batch listener: apply many (filename, old, new) changes
+        under one lock, re-optimizing each touched posting once at the end.
+        """
+        with self._lock:
+            touched = set()
+            for filename, old_recipe, new_recipe in changes:
+                if new_recipe is None:
+                    self._remove(filename, touched)
+                else:
+                    self._add(filename, new_recipe, touched)
+            for ingredient_id in touched:
+                self._settle(ingredient_id, None)
+
+    def _lookup(self, items):
+        """Ingredient ids for search inputs; None for names no recipe uses."""
+        return {self.vocabulary.lookup(item) for item in items}
+
+    def match_all(self, selected_items):
+        """Return recipes that contain ALL selected items."""
+        return self.match(selected_items)
+
+    def match(self, all_of, any_of=(), none_of=()):
+        """
+        Return recipes that contain every ingredient in all_of, at least one
+        in any_of (if given) and none in none_of.
+
+        The rarest all_of posting drives the intersection, so the cost
+        depends on that posting rather than the catalog size.
+        """
+        with self._lock:
+            all_ids = self._lookup(all_of)
+            any_ids = self._lookup(any_of)
+            none_ids = self._lookup(none_of)
+
+            required = [self._postings.get(ingredient_id) for ingredient_id in all_ids]
+            if any(posting is None for posting in required):
+                return []
+            optional = [self._postings[ingredient_id] for ingredient_id in any_ids
+                        if ingredient_id in self._postings]
+            if any_ids and not optional:
+                return []
+            excluded = [self._postings[ingredient_id] for ingredient_id in none_ids
+                        if ingredient_id in self._postings]
+
+            if not required:
+                # Nothing required: start from every recipe
+                doc_ids = [
+                    doc_id for doc_id in sorted(self._recipes)
+                    if (not optional or any(doc_id in p for p in optional))
+                    and not any(doc_id in p for p in excluded)
+                ]
+            else:
+                doc_ids = evaluate(required, optional, excluded)
+            return [_loaded(self._recipes[doc_id]) for doc_id in doc_ids]
+
+    def match_many(self, queries):
+        """
+        Answer many match() queries at once.
+
+        queries is a list of (all_of, none_of) pairs. Each query's
+        ingredients are ordered rarest first and every intersection prefix
+        is remembered, so queries sharing ingredients (or repeated outright)
+        reuse each other's work. Returns one list of recipes per query.
+        """
+        with self._lock:
+            prefixes = {}  # tuple of ingredient ids, rarest first -> doc id array
+            results = []
+            for all_of, none_of in queries:
+                ingredient_ids = self._lookup(all_of)
+                if any(ingredient_id not in self._postings for ingredient_id in ingredient_ids):
+                    results.append([])
+                    continue
+
+                ordered = tuple(sorted(
+                    ingredient_ids,
+                    key=lambda ingredient_id: (len(self._postings[ingredient_id]), ingredient_id)))
+                ids = self._prefix_ids(ordered, prefixes)
+
+                for ingredient_id in self._lookup(none_of):
+                    if ingredient_id in self._postings:
+                        ids = filter_ids(ids, self._postings[ingredient_id], keep=False)
+                results.append([_loaded(self._recipes[doc_id]) for doc_id in ids.tolist()])
+            return results
+
+    def _prefix_ids(self, ordered, prefixes):
+        """Intersect postings for ordered ingredient ids, reusing cached prefixes."""
+        if not ordered:
+            return np.array(sorted(self._recipes), dtype=np.uint32)
+
+        # Longest prefix already computed by an earlier query
+        known = len(ordered)
+        while known and ordered[:known] not in prefixes:
+            known -= 1
+
+        if known:
+            ids = prefixes[ordered[:known]]
+        else:
+            ids = posting_ids(self._postings[ordered[0]])
+            known = 1
+            prefixes[ordered[:1]] = ids
+
+        for end in range(known, len(ordered)):
+            ids = filter_ids(ids, self._postings[ordered[end]])
+            prefixes[ordered[:end + 1]] = ids
+        return ids
+
+    def rank_by_coverage(self, selected_items, limit=10):
+        """
+        Rank recipes by how much of them the selected items cover.
+
+        Each recipe using at least one selected item is scored by the share
+        of its ingredients that were selected; ties go to the recipe with
+        more matches. Only postings of the selected items are read.
+
+        Returns up to limit dicts with "recipe", "coverage", "matched" and
+        "missing" (the recipe's ingredients that were not selected).
+        """
+        with self._lock:
+            selected = self._lookup(selected_items)
+            postings = [self._postings[ingredient_id] for ingredient_id in selected
+                        if ingredient_id in self._postings]
+            if not postings or limit <= 0:
+                return []
+
+            doc_ids, matched = count_matches(postings)
+            sizes = np.frombuffer(self._sizes, dtype=np.uint16)[doc_ids]
+            coverage = matched / np.maximum(sizes, 1)
+
+            results = []
+            name = self.vocabulary.name
+            for doc_id in top_k(doc_ids, coverage, matched, limit):
+                recipe_ids = self._ingredients[doc_id]
+                matched_names = sorted(name(i) for i in recipe_ids if i in selected)
+                results.append({
+                    "recipe": _loaded(self._recipes[doc_id]),
+                    "coverage": round(len(matched_names) / max(len(recipe_ids), 1), 4),
+                    "matched": matched_names,
+                    "missing": sorted(name(i) for i in recipe_ids if i not in selected)
+                })
+            return results
+
+    def memory_usage(self):
+        """Return bytes held by posting buffers, split by representation."""
+        with self._lock:
+            usage = {}
+            for posting in self._postings.values():
+                kind = type(posting).__name__
+                usage[kind] = usage.get(kind, 0) + posting.nbytes
+            return usage
+
+    def __len__(self):
+        return len(self._recipes)
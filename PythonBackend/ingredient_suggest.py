@@ -0,0 +1,208 @@
+"""
+Ingredient Suggestions
+Autocomplete over every ingredient name in the catalog, for the basket UI.
+"""
+
+import re
+import threading
+from bisect import bisect_left
+
+import numpy as np
+
+from ingredient_index import recipe_ingredient_names
+from ingredient_vocab import canonical_ingredient
+
+# Names longer than this are compared on their first FUZZY_WIDTH characters
+FUZZY_WIDTH = 32
+# Queries shorter than this only get prefix matches
+MIN_FUZZY_LENGTH = 3
+
+WORD_BREAK = re.compile(r"[\s_]+")
+
+# Number of set bits in every 16-bit value
+BIT_COUNTS = np.array([bin(value).count("1") for value in range(1 << 16)], dtype=np.uint8)
+
+
+def suggestion_key(text):
+    """Lowercase and treat "olive_oil" and "olive  oil" alike."""
+    return WORD_BREAK.sub(" ", str(text).lower()).strip()
+
+
+def max_typos(query):
+    """Edit distance allowed for a query: 1, or 2 from 6 characters on."""
+    return 1 if len(query) < 6 else 2
+
+
+class IngredientSuggester:
+    """
+    Prefix and typo-tolerant lookup of ingredient names, most used first.
+
+    Keeps a count of recipes per ingredient up to date through
+    RecipeStore.subscribe(). Lookups use a sorted array of keys (each name,
+    plus each later word of it, so "oil" finds "olive oil") and bisect; the
+    array is rebuilt on the first lookup after the vocabulary changed.
+    Fuzzy matches are found with an edit-distance table computed for all
+    names at once over a character matrix.
+    """
+
+    def __init__(self):
+        self._counts = {}   # ingredient -> recipes using it
+        self._dirty = True
+        # Built by _build(): sorted names, their counts, and the key array
+        self._names = []
+        self._positions = {}  # name -> position in self._names
+        self._name_counts = np.zeros(0, dtype=np.int64)
+        self._lock = threading.RLock()
+
+    def _set_count(self, name, count):
+        if count > 0:
+            self._counts[name] = count
+        else:
+            self._counts.pop(name, None)
+        position = self._positions.get(name)
+        if position is None or count <= 0:
+            # The set of names changed; rebuild the keys on the next lookup
+            self._dirty = True
+        else:
+            self._name_counts[position] = count
+
+    def _apply(self, old_recipe, new_recipe):
+        old_names = recipe_ingredient_names(old_recipe) if old_recipe is not None else set()
+        new_names = recipe_ingredient_names(new_recipe) if new_recipe is not None else set()
+        for name in old_names - new_names:
+            self._set_count(name, self._counts.get(name, 0) - 1)
+        for name in new_names - old_names:
+            self._set_count(name, self._counts.get(name, 0) + 1)
+
+    def on_change(self, filename, old_recipe, new_recipe):
+        """RecipeStore listener."""
+        with self._lock:
+            self._apply(old_recipe, new_recipe)
+
+    def on_changes(self, changes):
+        """RecipeStore batch listener."""
+        with self._lock:
+            for filename, old_recipe, new_recipe in changes:
+                self._apply(old_recipe, new_recipe)
+
+    def _build(self):
+        self._names = sorted(self._counts)
+        self._positions = {name: i for i, name in enumerate(self._names)}
+        self._name_counts = np.array([self._counts[name] for name in self._names], dtype=np.int64)
+        keys = []
+        for i, name in enumerate(self._names):
+            key = suggestion_key(name)
+            keys.append((key, i))
+            words = key.split(" ")
+            for start in range(1, len(words)):
+                keys.append((" ".join(words[start:]), i))
+        keys.sort()
+        self._keys = [key for key, _ in keys]
+        self._key_names = np.array([i for _, i in keys], dtype=np.int32)
+
+        # One row of UTF-32 code points per name, zero padded
+        folded = [suggestion_key(name)[:FUZZY_WIDTH] for name in self._names]
+        self._chars = (np.array(folded, dtype=f"<U{FUZZY_WIDTH}")
+                       .view(np.uint32).reshape(len(folded), FUZZY_WIDTH))
+        self._lengths = np.array([len(name) for name in folded], dtype=np.int32)
+        # letter_masks[j, n]: bit set of the letters in the first j characters
+        # of name n (a-z, plus one bit for everything else)
+        offsets = self._chars.T.astype(np.int64) - ord("a")
+        bits = np.where((offsets >= 0) & (offsets < 26), 1 << np.clip(offsets, 0, 25), 1 << 26)
+        bits[self._chars.T == 0] = 0
+        self._letter_masks = np.zeros((FUZZY_WIDTH + 1, len(folded)), dtype=np.uint32)
+        self._letter_masks[1:] = np.bitwise_or.accumulate(bits, axis=0)
+        self._dirty = False
+
+    def _candidates(self, query, allowed):
+        """
+        Names that may be within allowed edits of a prefix: each edit adds at
+        most one letter, so the first len(query) + allowed characters must
+        contain all but allowed of the query's distinct letters.
+        """
+        query_mask = 0
+        for char in set(query):
+            offset = ord(char) - ord("a")
+            query_mask |= 1 << offset if 0 <= offset < 26 else 1 << 26
+        width = min(len(query) + allowed, FUZZY_WIDTH)
+        missing = np.uint32(query_mask) & ~self._letter_masks[width]
+        missing_count = BIT_COUNTS[missing & 0xFFFF] + BIT_COUNTS[missing >> 16]
+        return np.flatnonzero(missing_count <= allowed)
+
+    def _prefix_distances(self, query, limit_distance, candidates):
+        """
+        For each candidate name, the edit distance between query and the
+        closest prefix of the name (how many typos turn query into the
+        start of it).
+        """
+        m = len(query)
+        width = min(m + limit_distance, FUZZY_WIDTH)
+        chars = self._chars[candidates, :width]
+        lengths = np.minimum(self._lengths[candidates], width)
+        columns = np.arange(width + 1, dtype=np.int16)
+        row = np.broadcast_to(columns, (len(chars), width + 1))
+        # Columns past a name's end are disabled so a "prefix" never runs off it
+        past_end = columns[None, :] > lengths[:, None]
+        for i, char in enumerate(query, 1):
+            new = np.empty((len(chars), width + 1), dtype=np.int16)
+            new[:, 0] = i
+            np.minimum(row[:, :-1] + (chars != ord(char)), row[:, 1:] + 1, out=new[:, 1:])
+            # Insertions: new[j] = min over k <= j of new[k] + (j - k)
+            new = np.minimum.accumulate(new - columns, axis=1) + columns
+            new[past_end] = FUZZY_WIDTH
+            row = new
+        return row.min(axis=1)
+
+    def flush(self):
+        """Rebuild the lookup tables now instead of on the next lookup."""
+        with self._lock:
+            if self._dirty:
+                self._build()
+
+    def suggest(self, query, limit=10, fuzzy=True):
+        """
+        Return up to limit {"name", "count", "distance"} suggestions for
+        query: names starting with it (or with a word starting with it) by
+        descending count, then names within max_typos(query) edits. Names
+        are indexed in canonical form, so the query's canonical form
+        ("tomatoes" -> "tomato") is looked up as well.
+        """
+        query = suggestion_key(query)
+        if not query or limit <= 0:
+            return []
+        prefixes = {query, suggestion_key(canonical_ingredient(query))}
+        with self._lock:
+            if self._dirty:
+                self._build()
+            names, counts = self._names, self._name_counts
+            key_names, keys = self._key_names, self._keys
+
+            ranges = []
+            for prefix in prefixes:
+                lo = bisect_left(keys, prefix)
+                ranges.append(key_names[lo:bisect_left(keys, prefix + "\uffff", lo)])
+            found = np.unique(np.concatenate(ranges))
+            found_counts = counts[found]
+            if len(found) > limit:
+                top = np.argpartition(-found_counts, limit - 1)[:limit]
+                found, found_counts = found[top], found_counts[top]
+            order = np.lexsort((found, -found_counts))
+            results = [{"name": names[i], "count": int(found_counts[k]), "distance": 0}
+                       for k, i in zip(order.tolist(), found[order].tolist())]
+
+            if fuzzy and len(results) < limit and len(query) >= MIN_FUZZY_LENGTH and names:
+                allowed = max_typos(query)
+                candidates = np.setdiff1d(self._candidates(query, allowed), found)
+                distances = self._prefix_distances(query, allowed, candidates)
+                within = distances <= allowed
+                close, distances = candidates[within], distances[within]
+                close_counts = counts[close]
+                order = np.lexsort((close, -close_counts, distances))
+                for k in order[:limit - len(results)].tolist():
+                    results.append({"name": names[close[k]], "count": int(close_counts[k]),
+                                    "distance": int(distances[k])})
+            return results
+
+    def __len__(self):
+        with self._lock:
+            return len(self._counts)
@@ -0,0 +1,131 @@
+"""
+Ingredient Vocabulary
+Canonical ingredient names, and small integer ids interned for them.
+
+"Tomatoes", "tomato" and "Tomato" are one ingredient, as are "olive_oil"
+and "olive oil", and "scallions" and "green onion". Recipes and search
+inputs both go through canonical_ingredient(), so they always agree.
+"""
+
+import re
+import threading
+from functools import lru_cache
+
+# Bump whenever canonical_ingredient() changes, so names stored by an older
+# version (packed catalogs, SQLite ingredient tables) are rebuilt
+# 2: "fries" is left alone, "quiches" and the like keep their "e"
+NORMALIZATION_VERSION = 2
+
+WORD_BREAK = re.compile(r"[\s_]+")
+
+# Regional and alternative names -> the name recipes are indexed under
+# (keys and values are already lowercase and singular)
+ALIASES = {
+    "all-purpose flour": "flour",
+    "all purpose flour": "flour",
+    "aubergine": "eggplant",
+    "capsicum": "bell pepper",
+    "chick pea": "chickpea",
+    "cilantro leaf": "cilantro",
+    "confectioners sugar": "powdered sugar",
+    "coriander leaf": "cilantro",
+    "courgette": "zucchini",
+    "garbanzo": "chickpea",
+    "garbanzo bean": "chickpea",
+    "icing sugar": "powdered sugar",
+    "prawn": "shrimp",
+    "rocket": "arugula",
+    "scallion": "green onion",
+    "spring onion": "green onion",
+    "whole milk": "milk",
+}
+
+# Plurals the suffix rules below get wrong
+IRREGULAR_PLURALS = {
+    "brioches": "brioche",
+    "brownies": "brownie",
+    "calves": "calf",
+    "cookies": "cookie",
+    "ganaches": "ganache",
+    "halves": "half",
+    "knives": "knife",
+    "leaves": "leaf",
+    "loaves": "loaf",
+    "quiches": "quiche",
+    "smoothies": "smoothie",
+    "veggies": "veggie",
+}
+
+# Words that end in "s" without being plural (or are only used in the plural)
+SINGULAR_WORDS = {
+    "asparagus", "bass", "citrus", "couscous", "fries", "grits", "hummus",
+    "molasses", "oats", "swiss", "watercress",
+}
+
+
+def singular(word):
+    """The singular of an English ingredient word (left alone if unsure)."""
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if len(word) <= 3 or word in SINGULAR_WORDS or not word.endswith("s"):
+        return word
+    if word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"       # berries -> berry
+    if word.endswith(("oes", "ches", "shes", "xes")):
+        return word[:-2]             # tomatoes -> tomato, peaches -> peach
+    return word[:-1]                 # eggs -> egg, olives -> olive
+
+
+@lru_cache(maxsize=65536)
+def canonical_ingredient(name):
+    """
+    The name an ingredient is indexed and searched under: lowercase, with
+    underscores and repeated spaces folded to one space, the last word made
+    singular and known aliases replaced.
+    """
+    words = WORD_BREAK.sub(" ", str(name).lower()).strip().split(" ")
+    words[-1] = singular(words[-1])
+    canonical = " ".join(words)
+    return ALIASES.get(canonical, canonical)
+
+
+class IngredientVocabulary:
+    """
+    Interns canonical ingredient names as small integer ids.
+
+    Ids are handed out in first-seen order and never reused, so they can be
+    stored in compact arrays in place of name strings.
+    """
+
+    def __init__(self):
+        self._ids = {}     # canonical name -> id
+        self._names = []   # id -> canonical name
+        self._lock = threading.Lock()
+
+    def intern(self, name):
+        """The id of name's canonical form, assigning one if it is new."""
+        canonical = canonical_ingredient(name)
+        ingredient_id = self._ids.get(canonical)
+        if ingredient_id is None:
+            with self._lock:
+                ingredient_id = self._ids.get(canonical)
+                if ingredient_id is None:
+                    ingredient_id = self._ids[canonical] = len(self._names)
+                    self._names.append(canonical)
+        return ingredient_id
+
+    def lookup(self, name):
+        """The id of name's canonical form, or None if it was never interned."""
+        return self._ids.get(canonical_ingredient(name))
+
+    def name(self, ingredient_id):
+        return self._names[ingredient_id]
+
+    def __len__(self):
+        return len(self._names)
+
+
+# Shared by every index in the process, so ids mean the same thing everywhere
+VOCABULARY = IngredientVocabulary()
@@ -0,0 +1,325 @@
+"""
+Metrics
+Hot-path instrumentation for the recipe API, exported in the Prometheus
+text format by GET /api/metrics.
+
+Also has an opt-in sampling profiler: a fraction of requests run under
+cProfile and the slowest of those are kept with their profiles.
+"""
+
+import bisect
+import cProfile
+import functools
+import heapq
+import io
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+from flask.json.provider import DefaultJSONProvider
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels."""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Bucketed distribution of observed values, optionally split by labels."""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, ("le", bound))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key, ("le", "+Inf"))
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time."""
+
+    def __init__(self, name, help_text, read):
+        self.name = name
+        self.help = help_text
+        self.read = read
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {self.read()}"]
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "recipe_api_request_seconds", "Request latency by route",
+    ("method", "route", "status")))
+RESPONSE_BYTES = REGISTRY.register(Histogram(
+    "recipe_api_response_bytes", "Serialized response body size by route",
+    ("method", "route"), SIZE_BUCKETS))
+FILES_PARSED_PER_REQUEST = REGISTRY.register(Histogram(
+    "recipe_api_files_parsed_per_request", "Recipe JSON files parsed while serving a request",
+    ("route",), COUNT_BUCKETS))
+FILES_PARSED = REGISTRY.register(Counter(
+    "recipe_files_parsed_total", "Recipe JSON files parsed"))
+PHASE_SECONDS = REGISTRY.register(Histogram(
+    "recipe_phase_seconds",
+    "Time spent in hot-path phases (directory scan, JSON parse, search, serialize, ...)",
+    ("phase",)))
+
+# Per-thread count of files parsed during the current request
+_request_state = threading.local()
+
+
+def record_file_parsed():
+    """Count one recipe JSON file parse (called by the recipe store)."""
+    FILES_PARSED.inc()
+    _request_state.files_parsed = getattr(_request_state, "files_parsed", 0) + 1
+
+
+def phase(name):
+    """Context manager timing one hot-path phase, e.g. with phase("search"):"""
+    return PHASE_SECONDS.time(phase=name)
+
+
+def timed(name):
+    """Decorator timing every call of a function as phase `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with PHASE_SECONDS.time(phase=name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def register_gauge(name, help_text, read):
+    """Export a value computed at scrape time (e.g. cache hit rate)."""
+    return REGISTRY.register(Gauge(name, help_text, read))
+
+
+def render():
+    """Return all metrics in the Prometheus text exposition format."""
+    return REGISTRY.render()
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that records time spent serializing responses."""
+
+    def response(self, *args, **kwargs):
+        with PHASE_SECONDS.time(phase="serialize"):
+            return super().response(*args, **kwargs)
+
+
+class SlowRequestProfiler:
+    """
+    Profiles a random sample of requests and keeps the slowest ones.
+
+    Disabled unless sample_rate > 0, since cProfile slows the profiled
+    request down considerably. With dump_path set, the slowest requests are
+    rewritten to that file whenever the set changes.
+    """
+
+    def __init__(self, sample_rate=0.0, keep=10, dump_path=None):
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.dump_path = dump_path
+        self._slowest = []  # min-heap of (seconds, counter, entry)
+        self._counter = 0
+        self._lock = threading.Lock()
+        # Held while a request is profiled: from Python 3.12 cProfile can't
+        # enable a profiler while another one is active, even on another thread
+        self._active = threading.Lock()
+
+    def should_sample(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        """
+        Start profiling a request if it is sampled. Returns the profile, or
+        None if it isn't sampled or another profiler is running, in which
+        case the request is simply not profiled.
+        """
+        if not self.should_sample() or not self._active.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Some other profiler (a debugger, coverage) is active
+            self._active.release()
+            return None
+        return profile
+
+    def stop(self, profile):
+        profile.disable()
+        self._active.release()
+
+    def record(self, seconds, method, path, profiler):
+        with self._lock:
+            self._counter += 1
+            if len(self._slowest) >= self.keep and seconds <= self._slowest[0][0]:
+                return
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(25)
+            entry = {
+                "seconds": round(seconds, 6),
+                "method": method,
+                "path": path,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "profile": out.getvalue()
+            }
+            item = (seconds, self._counter, entry)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, item)
+            else:
+                heapq.heapreplace(self._slowest, item)
+        # Keep the dump file current whenever the slowest set changes
+        if self.dump_path:
+            self.dump(self.dump_path)
+
+    def slowest(self):
+        """Profiled requests, slowest first."""
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._slowest, reverse=True)]
+
+    def dump(self, path):
+        """Write the slowest profiled requests to a text file."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for entry in self.slowest():
+                f.write(f"=== {entry['seconds']:.6f}s {entry['method']} "
+                        f"{entry['path']} at {entry['time']} ===\n")
+                f.write(entry["profile"])
+                f.write("\n")
+
+
+def init_app(app, profiler=None):
+    """Install request timing hooks (and the optional profiler) on a Flask app."""
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_timer():
+        _request_state.files_parsed = 0
+        g.metrics_start = time.perf_counter()
+        if profiler is not None:
+            sampled = profiler.start()
+            if sampled is not None:
+                g.metrics_profiler = sampled
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        seconds = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+
+        REQUEST_SECONDS.observe(seconds, method=request.method, route=route,
+                                status=response.status_code)
+        if response.content_length is not None:
+            RESPONSE_BYTES.observe(response.content_length, method=request.method,
+                                   route=route)
+        FILES_PARSED_PER_REQUEST.observe(getattr(_request_state, "files_parsed", 0),
+                                         route=route)
+
+        sampled = g.pop("metrics_profiler", None)
+        if sampled is not None:
+            profiler.stop(sampled)
+            profiler.record(seconds, request.method, request.full_path, sampled)
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        # after_request didn't run (the request failed): don't leave it enabled
+        sampled = g.pop("metrics_profiler", None)
+        if sampled is not None:
+            profiler.stop(sampled)
@@ -0,0 +1,240 @@
+"""
+Posting Lists
+Compact sets of recipe doc ids for the ingredient index.
+
+Rare ingredients use a sorted array('I') (4 bytes per recipe); frequent
+ones use a bitmap (1 bit per possible recipe). Set operations view those
+buffers as NumPy arrays, so AND, OR and NOT run over whole buffers at once
+instead of per id in Python.
+"""
+
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+# An array costs 32 bits per member and a bitmap 1 bit per possible id,
+# so a bitmap is smaller once more than 1 in 32 ids is a member.
+BITMAP_DENSITY = 32
+
+
+class ArrayPosting:
+    """Sorted array of doc ids, for ingredients used by few recipes."""
+
+    __slots__ = ("ids",)
+
+    def __init__(self, ids=()):
+        self.ids = array('I', sorted(ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __contains__(self, doc_id):
+        i = bisect_left(self.ids, doc_id)
+        return i < len(self.ids) and self.ids[i] == doc_id
+
+    def add(self, doc_id):
+        ids = self.ids
+        if not ids or ids[-1] < doc_id:
+            ids.append(doc_id)
+            return
+        i = bisect_left(ids, doc_id)
+        if i == len(ids) or ids[i] != doc_id:
+            ids.insert(i, doc_id)
+
+    def discard(self, doc_id):
+        i = bisect_left(self.ids, doc_id)
+        if i < len(self.ids) and self.ids[i] == doc_id:
+            del self.ids[i]
+
+    @property
+    def nbytes(self):
+        return self.ids.itemsize * len(self.ids)
+
+
+class BitmapPosting:
+    """Bitmap of doc ids, for ingredients used by many recipes."""
+
+    __slots__ = ("bits", "count")
+
+    def __init__(self, ids=()):
+        ids = np.unique(np.asarray(ids, dtype=np.uint32))
+        nbytes = int(ids[-1] >> 3) + 1 if len(ids) else 0
+        self.bits = bytearray(_set_bits(np.zeros(nbytes, dtype=np.uint8), ids))
+        self.count = len(ids)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(_bitmap_ids(self.bits).tolist())
+
+    def __contains__(self, doc_id):
+        byte = doc_id >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] >> (doc_id & 7) & 1)
+
+    def add(self, doc_id):
+        byte, mask = doc_id >> 3, 1 << (doc_id & 7)
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        if not self.bits[byte] & mask:
+            self.bits[byte] |= mask
+            self.count += 1
+
+    def discard(self, doc_id):
+        byte, mask = doc_id >> 3, 1 << (doc_id & 7)
+        if byte < len(self.bits) and self.bits[byte] & mask:
+            self.bits[byte] &= ~mask
+            self.count -= 1
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+
+def optimize(posting, universe):
+    """
+    Return posting in the representation that is smaller for its density.
+
+    universe is the number of doc ids in use. Bitmaps only shrink back to
+    arrays at half the switch-over density so a posting near the threshold
+    doesn't flip on every write.
+    """
+    count = len(posting)
+    if isinstance(posting, ArrayPosting):
+        if count * BITMAP_DENSITY > universe:
+            return BitmapPosting(posting.ids)
+    elif count * BITMAP_DENSITY * 2 < universe:
+        return ArrayPosting(posting)
+    return posting
+
+
+def _bitmap_ids(bits):
+    """Return the sorted ids set in a little-endian bitmap buffer."""
+    unpacked = np.unpackbits(np.frombuffer(bits, dtype=np.uint8), bitorder='little')
+    return np.flatnonzero(unpacked).astype(np.uint32)
+
+
+def _set_bits(bits, ids):
+    """Set the bits for ids (all within range) in a uint8 bitmap array."""
+    np.bitwise_or.at(bits, ids >> 3, (1 << (ids & 7)).astype(np.uint8))
+    return bits
+
+
+def _ids(posting):
+    if isinstance(posting, ArrayPosting):
+        return np.frombuffer(posting.ids, dtype=np.uint32).copy()
+    return _bitmap_ids(posting.bits)
+
+
+def _bitmap(posting, nbytes):
+    """Return posting as a bitmap of exactly nbytes bytes."""
+    bits = np.zeros(nbytes, dtype=np.uint8)
+    if isinstance(posting, BitmapPosting):
+        size = min(nbytes, len(posting.bits))
+        bits[:size] = np.frombuffer(posting.bits, dtype=np.uint8, count=size)
+    else:
+        ids = np.frombuffer(posting.ids, dtype=np.uint32)
+        _set_bits(bits, ids[ids < nbytes * 8])
+    return bits
+
+
+def _member(posting, ids):
+    """Return a boolean mask of which ids are in posting."""
+    if isinstance(posting, ArrayPosting):
+        members = np.frombuffer(posting.ids, dtype=np.uint32)
+        if not len(members):
+            return np.zeros(len(ids), dtype=bool)
+        pos = np.minimum(np.searchsorted(members, ids), len(members) - 1)
+        return members[pos] == ids
+    bits = np.frombuffer(posting.bits, dtype=np.uint8)
+    if not len(bits):
+        return np.zeros(len(ids), dtype=bool)
+    byte = bits[np.minimum(ids >> 3, len(bits) - 1)]
+    return (ids < len(bits) * 8) & ((byte >> (ids & 7)) & 1).astype(bool)
+
+
+def posting_ids(posting):
+    """Return the doc ids of a posting as a sorted NumPy array."""
+    return _ids(posting)
+
+
+def filter_ids(ids, posting, keep=True):
+    """Keep only the ids in posting (or, with keep=False, only those not in it)."""
+    mask = _member(posting, ids)
+    return ids[mask] if keep else ids[~mask]
+
+
+def evaluate(all_of, any_of=(), none_of=()):
+    """
+    Return sorted doc ids in every all_of posting, in at least one any_of
+    posting (when given), and in no none_of posting.
+
+    all_of must not be empty. If every all_of posting is a bitmap they are
+    ANDed as whole buffers; otherwise the rarest posting's ids are filtered
+    by vectorized membership tests against the rest.
+    """
+    all_of = sorted(all_of, key=len)
+    none_of = list(none_of)
+
+    if all(isinstance(posting, BitmapPosting) for posting in all_of):
+        # The AND can't extend past the shortest buffer
+        nbytes = min(len(posting.bits) for posting in all_of)
+        bits = _bitmap(all_of[0], nbytes)
+        for posting in all_of[1:]:
+            bits &= _bitmap(posting, nbytes)
+        if any_of:
+            either = np.zeros(nbytes, dtype=np.uint8)
+            for posting in any_of:
+                either |= _bitmap(posting, nbytes)
+            bits &= either
+            any_of = ()
+        for posting in none_of:
+            bits &= ~_bitmap(posting, nbytes)
+        none_of = []
+        ids = _bitmap_ids(bits)
+    else:
+        ids = _ids(all_of[0])
+        for posting in all_of[1:]:
+            ids = ids[_member(posting, ids)]
+
+    if any_of:
+        mask = np.zeros(len(ids), dtype=bool)
+        for posting in any_of:
+            mask |= _member(posting, ids)
+        ids = ids[mask]
+    for posting in none_of:
+        ids = ids[~_member(posting, ids)]
+    return ids.tolist()
+
+
+def count_matches(postings):
+    """
+    Count, for every doc id, how many of the given postings contain it.
+
+    Returns (doc_ids, counts) for the ids that appear at least once.
+    """
+    if not postings:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.intp)
+    counts = np.bincount(np.concatenate([_ids(posting) for posting in postings]))
+    doc_ids = np.flatnonzero(counts)
+    return doc_ids, counts[doc_ids]
+
+
+def top_k(doc_ids, scores, tiebreak, k):
+    """
+    Return the k doc ids with the highest score, ties broken by the higher
+    tiebreak and then the lower doc id.
+
+    Only candidates at or above the k-th best score are fully sorted, which
+    is the vectorized equivalent of keeping a bounded heap of size k.
+    """
+    if len(doc_ids) > k:
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        keep = scores >= kth
+        doc_ids, scores, tiebreak = doc_ids[keep], scores[keep], tiebreak[keep]
+    order = np.lexsort((doc_ids, -tiebreak, -scores))[:k]
+    return doc_ids[order].tolist()
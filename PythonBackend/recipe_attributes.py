@@ -0,0 +1,256 @@
+"""
+Recipe Attributes
+Parsed prep/total minutes, servings and type of every recipe, kept as
+columns so lists can be filtered and sorted without reading the recipes.
+"""
+
+import re
+import threading
+
+import numpy as np
+
+from catalog_pack import resolve
+from recipe_store import id_key
+
+# Numeric attributes that can be filtered (min_<name>/max_<name>) and sorted on
+SORTABLE = ("prep", "total", "servings")
+
+# A whole or decimal number, a fraction or a mixed number ("1 1/2", "1-1/2")
+NUMBER = r"\d+(?:\s+|-)\d+/\d+|\d+/\d+|\d+(?:\.\d+)?"
+UNIT = r"hours?|hrs?|h|minutes?|mins?|m"
+# One duration, or a range of two ("30-45 minutes", "2 to 3 hours")
+TIME_PART = re.compile(
+    rf"({NUMBER})\s*({UNIT})?(?:\s*(?:-|–|to)\s*({NUMBER})\s*({UNIT})?)?(?![a-z])",
+    re.IGNORECASE)
+
+
+def parse_number(text):
+    """The value of a NUMBER match ("1 1/2" -> 1.5)."""
+    value = 0.0
+    for part in re.split(r"\s+|-", text):
+        numerator, _, denominator = part.partition("/")
+        if denominator:
+            denominator = float(denominator)
+            value += float(numerator) / denominator if denominator else 0.0
+        else:
+            value += float(numerator)
+    return value
+
+
+def parse_minutes(text):
+    """
+    Return a duration in minutes ("1 hour 15 minutes" -> 75,
+    "1 1/2 hours" -> 90), or None. A range counts as its upper bound
+    ("30-45 minutes" -> 45, "2 to 3 hours" -> 180), so a max_ filter only
+    matches recipes that are sure to fit.
+    """
+    if isinstance(text, bool):
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    if not isinstance(text, str):
+        return None
+    minutes = None
+    for low, low_unit, high, high_unit in TIME_PART.findall(text):
+        # "30-45 minutes": the unit after the range applies to both ends
+        number, unit = (high, high_unit or low_unit) if high else (low, low_unit)
+        value = parse_number(number)
+        if unit and unit.lower().startswith("h"):
+            value *= 60
+        minutes = (minutes or 0) + value
+    return minutes
+
+
+def recipe_times(recipe):
+    """
+    Return (prep_minutes, total_minutes) of a Recipe (or recipe dict),
+    None where unknown.
+    """
+    recipe = resolve(recipe)
+    return parse_minutes(recipe.prep_time), parse_minutes(recipe.total_time)
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return np.nan
+    return float(value)
+
+
+class AttributeIndex:
+    """
+    Columns of prep minutes, total minutes, servings and type per recipe.
+
+    Numeric filters are range queries: each column has a sorted order
+    (built on first use after a change), and min/max are found with a
+    binary search. Like ShoppingListPlanner, changes from the store are
+    queued and applied by the next query.
+    """
+
+    def __init__(self):
+        self._pending = {}     # filename -> recipe (None = deleted)
+        self._slots = {}       # filename -> slot
+        self._filenames = []   # slot -> filename (None = free)
+        self._slot_ids = []    # slot -> id_key
+        self._by_id = {}       # id_key -> slot
+        self._free_slots = []
+        self._types = {}       # lowercased type -> code
+        self._columns = {name: np.zeros(0) for name in SORTABLE}
+        self._type_codes = np.zeros(0, dtype=np.int32)
+        self._live = np.zeros(0, dtype=bool)
+        self._orders = {}      # sort key -> slots, cleared on change
+        self._file_rank = None  # slot -> position in filename order
+        self._lock = threading.RLock()
+
+    def on_change(self, filename, old_recipe, new_recipe):
+        """RecipeStore listener."""
+        with self._lock:
+            self._pending[filename] = new_recipe
+
+    def on_changes(self, changes):
+        """RecipeStore batch listener."""
+        with self._lock:
+            for filename, old_recipe, new_recipe in changes:
+                self._pending[filename] = new_recipe
+
+    def _grow(self, size):
+        if size <= len(self._live):
+            return
+        size = max(size, 2 * len(self._live), 1024)
+        for name, column in self._columns.items():
+            self._columns[name] = np.concatenate([column, np.full(size - len(column), np.nan)])
+        self._type_codes = np.concatenate(
+            [self._type_codes, np.full(size - len(self._type_codes), -1, dtype=np.int32)])
+        self._live = np.concatenate([self._live, np.zeros(size - len(self._live), dtype=bool)])
+
+    def _apply_pending(self):
+        if not self._pending:
+            return
+        for filename, recipe in self._pending.items():
+            slot = self._slots.get(filename)
+            if recipe is None:
+                if slot is not None:
+                    del self._slots[filename]
+                    self._forget_id(slot)
+                    self._filenames[slot] = None
+                    self._live[slot] = False
+                    self._free_slots.append(slot)
+                    self._file_rank = None
+                continue
+
+            recipe = resolve(recipe)
+            if slot is None:
+                if self._free_slots:
+                    slot = self._free_slots.pop()
+                else:
+                    slot = len(self._filenames)
+                    self._filenames.append(None)
+                    self._slot_ids.append(None)
+                    self._grow(slot + 1)
+                self._slots[filename] = slot
+                self._filenames[slot] = filename
+                self._file_rank = None
+
+            prep, total = recipe_times(recipe)
+            self._columns["prep"][slot] = np.nan if prep is None else prep
+            self._columns["total"][slot] = np.nan if total is None else total
+            self._columns["servings"][slot] = _number(recipe.get("servings"))
+            recipe_type = str(recipe.get("type", "")).lower()
+            self._type_codes[slot] = self._types.setdefault(recipe_type, len(self._types))
+            self._forget_id(slot)
+            self._slot_ids[slot] = id_key(recipe.get("id"))
+            self._by_id[self._slot_ids[slot]] = slot
+            self._live[slot] = True
+        self._pending.clear()
+        self._orders.clear()
+
+    def _forget_id(self, slot):
+        recipe_key = self._slot_ids[slot]
+        if recipe_key is not None and self._by_id.get(recipe_key) == slot:
+            del self._by_id[recipe_key]
+        self._slot_ids[slot] = None
+
+    def _filename_rank(self):
+        if self._file_rank is None:
+            live = np.flatnonzero(self._live)
+            names = np.array([self._filenames[slot] for slot in live])
+            rank = np.full(len(self._live), len(live), dtype=np.int64)
+            rank[live[np.argsort(names, kind="stable")]] = np.arange(len(live))
+            self._file_rank = rank
+        return self._file_rank
+
+    def _order(self, key):
+        """Live slots sorted by key ("name" for filename order, "-total", ...),
+        unknown values last and ties in filename order."""
+        order = self._orders.get(key)
+        if order is None:
+            live = np.flatnonzero(self._live)
+            rank = self._filename_rank()[live]
+            if key == "name":
+                order = live[np.argsort(rank, kind="stable")]
+            else:
+                values = self._columns[key.lstrip("-")][live]
+                if key.startswith("-"):
+                    values = -values
+                # lexsort sorts by the last key first; NaN goes last
+                order = live[np.lexsort((rank, values))]
+            self._orders[key] = order
+        return order
+
+    def _mask(self, filters):
+        mask = self._live.copy()
+        recipe_type = filters.get("type")
+        if recipe_type is not None:
+            code = self._types.get(str(recipe_type).lower(), -2)
+            mask &= self._type_codes == code
+        for name in SORTABLE:
+            low, high = filters.get(f"min_{name}"), filters.get(f"max_{name}")
+            if low is None and high is None:
+                continue
+            order = self._order(name)
+            values = self._columns[name][order]
+            start = 0 if low is None else np.searchsorted(values, low, side="left")
+            # NaN sorts last, so the unknowns are never inside a range
+            end = (np.searchsorted(values, high, side="right") if high is not None
+                   else len(values) - np.count_nonzero(np.isnan(values)))
+            in_range = np.zeros(len(mask), dtype=bool)
+            in_range[order[start:end]] = True
+            mask &= in_range
+        return mask
+
+    def flush(self):
+        """Apply queued changes now instead of on the next lookup."""
+        with self._lock:
+            self._apply_pending()
+
+    def select(self, filters, sort=None):
+        """Filenames of the recipes matching filters, ordered by sort
+        (a SORTABLE name, "-" prefixed for descending) or by filename."""
+        with self._lock:
+            self._apply_pending()
+            order = self._order(sort or "name")
+            mask = self._mask(filters)
+            return [self._filenames[slot] for slot in order[mask[order]].tolist()]
+
+    def select_among(self, recipe_ids, filters, sort=None):
+        """
+        Positions in recipe_ids of the recipes that match filters, ordered
+        by sort, or kept in their given order when sort is None. Used to
+        filter and sort search results.
+        """
+        with self._lock:
+            self._apply_pending()
+            slots = np.array([self._by_id.get(id_key(recipe_id), -1) for recipe_id in recipe_ids],
+                             dtype=np.int64)
+            mask = np.append(self._mask(filters), False)  # slot -1 never matches
+            positions = np.flatnonzero(mask[slots])
+            if sort is not None:
+                rank = np.zeros(len(self._live) + 1, dtype=np.int64)
+                order = self._order(sort)
+                rank[order] = np.arange(len(order))
+                positions = positions[np.argsort(rank[slots[positions]], kind="stable")]
+            return positions.tolist()
+
+    def __len__(self):
+        with self._lock:
+            self._apply_pending()
+            return len(self._slots)
@@ -4,228 +4,295 @@ Provides various display formats for recipes.
 """
 
 import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
+from itertools import islice
 from pathlib import Path
 
+import metrics
+from recipe_model import compact_recipe
+from recipe_store import get_store
+
+RECIPES_DIR = Path(os.environ.get("RECIPES_DIR", Path(__file__).parent / "recipes"))
+
+@metrics.timed("load_recipe")
 def load_recipe(recipe_id):
-    """Load a single recipe by ID."""
-    recipes_dir = Path(__file__).parent / "recipes"
-    
-    # Search through all recipes for matching ID
-    for recipe_file in recipes_dir.glob("*.json"):
-        try:
-            with open(recipe_file, 'r', encoding='utf-8') as f:
-                recipe = json.load(f)
-                # Match by ID (handle both string and int IDs)
-                recipe_id_value = recipe.get("id")
-                if recipe_id_value == recipe_id:
-                    return recipe
-                # Also try converting to int if recipe_id is numeric
-                if isinstance(recipe_id, str) and recipe_id.isdigit():
-                    if recipe_id_value == int(recipe_id):
-                        return recipe
-        except Exception as e:
-            continue
-    
-    return None
+    """Load a single recipe by ID (string or numeric)."""
+    return get_store(RECIPES_DIR).get_by_id(recipe_id)
+
+class RecipeParts:
+    """
+    Pieces of a recipe's display text that several formats print, built on
+    first use and shared by every renderer given the same parts. recipe is
+    a recipe_model.Recipe; a plain recipe dict is converted to one.
+    """
+
+    def __init__(self, recipe):
+        self.recipe = compact_recipe(recipe)
+
+    @cached_property
+    def title(self):
+        return self.recipe.get('name', 'Unknown').title()
+
+    @cached_property
+    def info_lines(self):
+        """Type, servings and time, as the simple and full formats show them."""
+        recipe = self.recipe
+        output = []
+        if recipe.type is not None:
+            output.append(f"Type: {recipe.type.title()}")
+        if 'servings' in recipe:
+            output.append(f"Serves: {recipe.servings}")
+        if 'time' in recipe:
+            if recipe.prep_time is not None:
+                output.append(f"Prep Time: {recipe.prep_time}")
+                if recipe.total_time is not None:
+                    output.append(f"Total Time: {recipe.total_time}")
+            else:
+                output.append(f"Time: {recipe.total_time}")
+        return output
+
+    @cached_property
+    def ingredient_items(self):
+        """One "Name: amount unit" (or, for the old list format, "Name") per ingredient."""
+        if self.recipe.legacy_ingredients:
+            return [ingredient.name.title() for ingredient in self.recipe.ingredients]
+        return [f"{ingredient.name.title()}: {ingredient.get('amount', '')} "
+                f"{ingredient.get('unit', '')}"
+                for ingredient in self.recipe.ingredients]
+
+    @cached_property
+    def ingredient_lines(self):
+        return [f"  • {item}" for item in self.ingredient_items]
+
+    @cached_property
+    def step_lines(self):
+        output = []
+        for i, step in enumerate(self.recipe.steps, 1):
+            # Remove numbering if already present
+            step_text = step.lstrip('0123456789. ')
+            output.append(f"{i}. {step_text}")
+        return output
 
-def display_recipe_simple(recipe):
+    @cached_property
+    def material_lines(self):
+        return [f"  • {material.title()}" for material in self.recipe.materials]
+
+def display_recipe_simple(recipe, parts=None):
     """Display recipe in simple text format."""
     if not recipe:
         return "Recipe not found"
+    parts = parts or RecipeParts(recipe)
     
     output = []
     output.append(f"\n{'='*60}")
-    output.append(f"Recipe: {recipe.get('name', 'Unknown').title()}")
+    output.append(f"Recipe: {parts.title}")
     output.append(f"{'='*60}")
-    
-    if 'type' in recipe:
-        output.append(f"Type: {recipe['type'].title()}")
-    
-    if 'servings' in recipe:
-        output.append(f"Serves: {recipe['servings']}")
-    
-    if 'time' in recipe:
-        if isinstance(recipe['time'], list):
-            output.append(f"Prep Time: {recipe['time'][0]}")
-            if len(recipe['time']) > 1:
-                output.append(f"Total Time: {recipe['time'][1]}")
-        else:
-            output.append(f"Time: {recipe['time']}")
+    output.extend(parts.info_lines)
     
     return "\n".join(output)
 
-def display_recipe_ingredients(recipe):
+def display_recipe_ingredients(recipe, parts=None):
     """Display recipe ingredients in formatted way."""
     if not recipe:
         return "Recipe not found"
+    parts = parts or RecipeParts(recipe)
     
     output = []
     output.append(f"\n{'='*60}")
-    output.append(f"Ingredients for {recipe.get('name', 'Unknown').title()}")
+    output.append(f"Ingredients for {parts.title}")
     output.append(f"{'='*60}")
-    
-    ingredients = recipe.get('ingredients', {})
-    
-    if isinstance(ingredients, dict):
-        # New format with amounts and units
-        for ingredient, details in ingredients.items():
-            amount = details.get('amount', '')
-            unit = details.get('unit', '')
-            output.append(f"  • {ingredient.title()}: {amount} {unit}")
-    elif isinstance(ingredients, list):
-        # Old format - simple list
-        for ingredient in ingredients:
-            output.append(f"  • {ingredient.title()}")
+    output.extend(parts.ingredient_lines)
     
     return "\n".join(output)
 
-def display_recipe_steps(recipe):
+def display_recipe_steps(recipe, parts=None):
     """Display recipe steps in formatted way."""
     if not recipe:
         return "Recipe not found"
+    parts = parts or RecipeParts(recipe)
     
     output = []
     output.append(f"\n{'='*60}")
-    output.append(f"Steps for {recipe.get('name', 'Unknown').title()}")
+    output.append(f"Steps for {parts.title}")
     output.append(f"{'='*60}")
-    
-    steps = recipe.get('steps', [])
-    for i, step in enumerate(steps, 1):
-        # Remove numbering if already present
-        step_text = step.lstrip('0123456789. ')
-        output.append(f"{i}. {step_text}")
+    output.extend(parts.step_lines)
     
     return "\n".join(output)
 
-def display_recipe_materials(recipe):
+def display_recipe_materials(recipe, parts=None):
     """Display required materials/tools."""
     if not recipe:
         return "Recipe not found"
+    parts = parts or RecipeParts(recipe)
     
     output = []
     output.append(f"\n{'='*60}")
-    output.append(f"Materials Needed for {recipe.get('name', 'Unknown').title()}")
+    output.append(f"Materials Needed for {parts.title}")
     output.append(f"{'='*60}")
-    
-    materials = recipe.get('materials', [])
-    for material in materials:
-        output.append(f"  • {material.title()}")
+    output.extend(parts.material_lines)
     
     return "\n".join(output)
 
-def display_recipe_full(recipe):
+def display_recipe_full(recipe, parts=None):
     """Display complete recipe in full format."""
     if not recipe:
         return "Recipe not found"
+    parts = parts or RecipeParts(recipe)
     
     output = []
     output.append(f"\n{'='*60}")
-    output.append(f"{recipe.get('name', 'Unknown').title().center(60)}")
+    output.append(f"{parts.title.center(60)}")
     output.append(f"{'='*60}")
     
     # Basic info
-    if 'type' in recipe:
-        output.append(f"Type: {recipe['type'].title()}")
-    if 'servings' in recipe:
-        output.append(f"Serves: {recipe['servings']}")
-    if 'time' in recipe:
-        if isinstance(recipe['time'], list):
-            output.append(f"Prep Time: {recipe['time'][0]}")
-            if len(recipe['time']) > 1:
-                output.append(f"Total Time: {recipe['time'][1]}")
-        else:
-            output.append(f"Time: {recipe['time']}")
+    output.extend(parts.info_lines)
     
     output.append(f"\n{'─'*60}")
     output.append("INGREDIENTS:")
     output.append(f"{'─'*60}")
-    
-    # Ingredients
-    ingredients = recipe.get('ingredients', {})
-    if isinstance(ingredients, dict):
-        for ingredient, details in ingredients.items():
-            amount = details.get('amount', '')
-            unit = details.get('unit', '')
-            output.append(f"  • {ingredient.title()}: {amount} {unit}")
-    elif isinstance(ingredients, list):
-        for ingredient in ingredients:
-            output.append(f"  • {ingredient.title()}")
+    output.extend(parts.ingredient_lines)
     
     output.append(f"\n{'─'*60}")
     output.append("STEPS:")
     output.append(f"{'─'*60}")
-    
-    # Steps
-    steps = recipe.get('steps', [])
-    for i, step in enumerate(steps, 1):
-        step_text = step.lstrip('0123456789. ')
-        output.append(f"{i}. {step_text}")
+    output.extend(parts.step_lines)
     
     output.append(f"\n{'─'*60}")
     output.append("MATERIALS NEEDED:")
     output.append(f"{'─'*60}")
-    
-    # Materials
-    materials = recipe.get('materials', [])
-    for material in materials:
-        output.append(f"  • {material.title()}")
+    output.extend(parts.material_lines)
     
     # Combos
-    if 'combos' in recipe and recipe['combos']:
+    recipe = parts.recipe
+    if recipe.combos:
         output.append(f"\n{'─'*60}")
         output.append("GOES WELL WITH:")
         output.append(f"{'─'*60}")
-        for combo in recipe['combos']:
+        for combo in recipe.combos:
             output.append(f"  • {combo}")
     
     return "\n".join(output)
 
-def display_recipe_card(recipe):
+def display_recipe_card(recipe, parts=None):
     """Display recipe as a card format (compact)."""
     if not recipe:
         return "Recipe not found"
+    parts = parts or RecipeParts(recipe)
     
     output = []
     output.append(f"\n┌{'─'*58}┐")
-    output.append(f"│ {recipe.get('name', 'Unknown').title():<56} │")
+    output.append(f"│ {parts.title:<56} │")
     output.append(f"├{'─'*58}┤")
     
-    if 'type' in recipe:
-        output.append(f"│ Type: {recipe['type'].title():<49} │")
+    recipe = parts.recipe
+    if recipe.type is not None:
+        output.append(f"│ Type: {recipe.type.title():<49} │")
     if 'servings' in recipe:
-        output.append(f"│ Serves: {recipe['servings']:<48} │")
+        output.append(f"│ Serves: {recipe.servings:<48} │")
     if 'time' in recipe:
-        if isinstance(recipe['time'], list):
-            output.append(f"│ Time: {recipe['time'][1] if len(recipe['time']) > 1 else recipe['time'][0]:<49} │")
-        else:
-            output.append(f"│ Time: {recipe['time']:<49} │")
+        time = recipe.total_time if recipe.total_time is not None else recipe.prep_time
+        output.append(f"│ Time: {time:<49} │")
     
     output.append(f"├{'─'*58}┤")
     output.append(f"│ Ingredients: {' ' * 45} │")
     
-    ingredients = recipe.get('ingredients', {})
-    if isinstance(ingredients, dict):
-        for ingredient, details in ingredients.items():
-            amount = details.get('amount', '')
-            unit = details.get('unit', '')
-            ing_line = f"│   • {ingredient.title()}: {amount} {unit}"
+    if recipe.legacy_ingredients:
+        for item in parts.ingredient_items[:5]:  # Limit to 5 for card
+            output.append(f"│   • {item:<52} │")
+        if len(recipe.ingredients) > 5:
+            output.append(f"│   ... and {len(recipe.ingredients) - 5} more{' ' * 38} │")
+    else:
+        for item in parts.ingredient_items:
+            ing_line = f"│   • {item}"
             output.append(f"{ing_line:<59} │")
-    elif isinstance(ingredients, list):
-        for ingredient in ingredients[:5]:  # Limit to 5 for card
-            output.append(f"│   • {ingredient.title():<52} │")
-        if len(ingredients) > 5:
-            output.append(f"│   ... and {len(ingredients) - 5} more{' ' * 38} │")
     
     output.append(f"└{'─'*58}┘")
     
     return "\n".join(output)
 
-def display_recipe_json(recipe):
+def display_recipe_json(recipe, parts=None):
     """Display recipe as formatted JSON."""
     if not recipe:
         return "Recipe not found"
     
-    return json.dumps(recipe, indent=2, ensure_ascii=False)
+    return json.dumps(compact_recipe(recipe).to_dict(), indent=2, ensure_ascii=False)
+
+# Format name -> renderer, in display order
+DISPLAY_FORMATS = {
+    "simple": display_recipe_simple,
+    "ingredients": display_recipe_ingredients,
+    "steps": display_recipe_steps,
+    "materials": display_recipe_materials,
+    "full": display_recipe_full,
+    "card": display_recipe_card,
+    "json": display_recipe_json
+}
+
+# Headings display_all_formats prints before each format
+FORMAT_TITLES = {
+    "simple": "SIMPLE FORMAT",
+    "ingredients": "INGREDIENTS ONLY",
+    "steps": "STEPS ONLY",
+    "materials": "MATERIALS ONLY",
+    "full": "FULL RECIPE",
+    "card": "CARD FORMAT",
+    "json": "JSON FORMAT"
+}
+
+# Recipes sent to a worker process at a time by render_batch
+BATCH_CHUNK_SIZE = 200
+# Jobs smaller than this are rendered in-process; a pool isn't worth it
+PARALLEL_MIN_RECIPES = 2000
+# Chunks render_batch keeps queued in the pool while output is consumed
+CHUNKS_IN_FLIGHT = 2 * (os.cpu_count() or 1)
+
+def render_formats(recipe, formats=None):
+    """Return {format: text} for a recipe, building shared pieces once."""
+    parts = RecipeParts(recipe)
+    return {name: DISPLAY_FORMATS[name](recipe, parts) for name in (formats or DISPLAY_FORMATS)}
+
+def _render_chunk(recipes, formats):
+    return [render_formats(recipe, formats) for recipe in recipes]
+
+def render_batch(recipes, formats=None, executor=None):
+    """
+    Yield (recipe, {format: text}) for each recipe, in order.
+
+    With an executor (a ProcessPoolExecutor) and at least
+    PARALLEL_MIN_RECIPES recipes, chunks are rendered in worker processes,
+    keeping only a few chunks per worker in flight so output can be streamed
+    as it is produced.
+    """
+    if executor is None or (isinstance(recipes, list) and len(recipes) < PARALLEL_MIN_RECIPES):
+        for recipe in recipes:
+            yield recipe, render_formats(recipe, formats)
+        return
+    
+    recipes = iter(recipes)
+    in_flight = deque()
+    while True:
+        while len(in_flight) < CHUNKS_IN_FLIGHT:
+            chunk = list(islice(recipes, BATCH_CHUNK_SIZE))
+            if not chunk:
+                break
+            in_flight.append((chunk, executor.submit(_render_chunk, chunk, formats)))
+        if not in_flight:
+            return
+        chunk, future = in_flight.popleft()
+        yield from zip(chunk, future.result())
+
+def format_rendered(recipe, rendered):
+    """Printable text for one recipe's rendered formats, as display_all_formats prints them."""
+    output = [f"\n{'='*60}", f"{recipe.get('name', 'Unknown').title()} ({recipe.get('id')})",
+              f"{'='*60}"]
+    for i, (name, text) in enumerate(rendered.items(), 1):
+        output.append(f"\n{i}. {FORMAT_TITLES[name]}:")
+        output.append(text)
+    return "\n".join(output) + "\n"
 
 def display_all_formats(recipe_id):
     """Display a recipe in all available formats."""
@@ -239,36 +306,84 @@ def display_all_formats(recipe_id):
     print("DISPLAYING RECIPE IN ALL FORMATS")
     print("="*60)
     
-    print("\n1. SIMPLE FORMAT:")
-    print(display_recipe_simple(recipe))
-    
-    print("\n2. INGREDIENTS ONLY:")
-    print(display_recipe_ingredients(recipe))
-    
-    print("\n3. STEPS ONLY:")
-    print(display_recipe_steps(recipe))
-    
-    print("\n4. MATERIALS ONLY:")
-    print(display_recipe_materials(recipe))
-    
-    print("\n5. FULL RECIPE:")
-    print(display_recipe_full(recipe))
-    
-    print("\n6. CARD FORMAT:")
-    print(display_recipe_card(recipe))
-    
-    print("\n7. JSON FORMAT:")
-    print(display_recipe_json(recipe))
+    for i, (name, text) in enumerate(render_formats(recipe).items(), 1):
+        print(f"\n{i}. {FORMAT_TITLES[name]}:")
+        print(text)
+
+def display_batch(recipe_ids, formats=None, out=None, ndjson=False, workers=None):
+    """
+    Render many recipes (every recipe if recipe_ids is empty) to out, or
+    stdout, loading the catalog once. Returns (rendered, missing ids).
+    """
+    out = out or sys.stdout
+    store = get_store(RECIPES_DIR)
+    missing = []
+    if recipe_ids:
+        recipes = []
+        for recipe_id in recipe_ids:
+            recipe = store.get_by_id(recipe_id)
+            if recipe is None:
+                missing.append(recipe_id)
+            else:
+                recipes.append(recipe)
+    else:
+        recipes = store.all()
+    
+    rendered = 0
+    executor = (ProcessPoolExecutor(max_workers=workers)
+                if len(recipes) >= PARALLEL_MIN_RECIPES and workers != 1 else None)
+    try:
+        for recipe, texts in render_batch(recipes, formats, executor):
+            if ndjson:
+                out.write(json.dumps({"recipe_id": recipe.get("id"), "formats": texts},
+                                     ensure_ascii=False) + "\n")
+            else:
+                out.write(format_rendered(recipe, texts))
+            rendered += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return rendered, missing
 
 if __name__ == "__main__":
     # Example usage
-    import sys
-    
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        import argparse
+        
+        parser = argparse.ArgumentParser(prog="recipe_display.py batch",
+                                         description="Render many recipes in one pass.")
+        parser.add_argument("recipe_ids", nargs="*", help="recipes to render (default: all)")
+        parser.add_argument("--formats", help="comma-separated formats (default: all)")
+        parser.add_argument("--output", help="file to write (default: stdout)")
+        parser.add_argument("--ndjson", action="store_true",
+                            help="write one JSON object per recipe")
+        parser.add_argument("--workers", type=int,
+                            help="worker processes for large jobs (default: one per CPU)")
+        args = parser.parse_args(sys.argv[2:])
+        
+        formats = args.formats.split(",") if args.formats else None
+        unknown = [name for name in formats or () if name not in DISPLAY_FORMATS]
+        if unknown:
+            parser.error(f"unknown formats {', '.join(unknown)} "
+                         f"(available: {', '.join(DISPLAY_FORMATS)})")
+        
+        out = open(args.output, "w", encoding="utf-8") if args.output else None
+        try:
+            rendered, missing = display_batch(args.recipe_ids, formats, out, args.ndjson,
+                                              args.workers)
+        finally:
+            if out is not None:
+                out.close()
+        for recipe_id in missing:
+            print(f"Recipe '{recipe_id}' not found", file=sys.stderr)
+        print(f"Rendered {rendered} recipes", file=sys.stderr)
+    elif len(sys.argv) > 1:
         recipe_id = sys.argv[1]
         display_all_formats(recipe_id)
     else:
         print("Usage: python recipe_display.py <recipe_id>")
+        print("       python recipe_display.py batch [recipe_id ...] [--formats full,card]")
+        print("                                      [--output file] [--ndjson] [--workers N]")
         print("\nExample: python recipe_display.py sweet_potato_cake")
         print("\nOr use individual functions:")
         print("  from recipe_display import display_recipe_full, load_recipe")
@@ -0,0 +1,304 @@
+"""
+Recipe Images
+Resized, re-encoded copies ("derivatives") of recipe images, rendered in a
+process pool and kept in a size-bounded, content-addressed disk cache.
+
+Usage: python recipe_images.py pregenerate [recipes_dir] [images_dir]
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Longest side in pixels of each derivative size (never upscaled)
+SIZES = {"thumb": 160, "card": 480, "full": 1600}
+
+# Encoder name, file extension and content type of each output format
+FORMATS = {
+    "webp": ("WEBP", "webp", "image/webp"),
+    "jpeg": ("JPEG", "jpg", "image/jpeg"),
+}
+
+# Encoder quality of each quality level
+QUALITIES = {"low": 50, "medium": 75, "high": 90}
+
+DEFAULT_SIZE, DEFAULT_FORMAT, DEFAULT_QUALITY = "card", "webp", "medium"
+
+# What `pregenerate` renders for every recipe: what list views ask for
+PREGENERATE = [("thumb", "webp", "medium"), ("card", "webp", "medium"),
+               ("thumb", "jpeg", "medium"), ("card", "jpeg", "medium")]
+
+# Bump when render_derivative() changes, so old derivatives aren't reused
+PIPELINE_VERSION = 1
+
+
+def image_path(images_dir, name):
+    """The original for a recipe's "image" field, or None if it isn't a
+    plain file name in images_dir or doesn't exist."""
+    if not isinstance(name, str) or not name or Path(name).name != name:
+        return None
+    path = Path(images_dir) / name
+    return path if path.is_file() else None
+
+
+def render_derivative(source, target, width, encoder, quality):
+    """
+    Resize source to fit in width x width and encode it to target.
+    Runs in a worker process; returns the number of bytes written.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width, width), Image.LANCZOS)
+        if encoder == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        # Written next to the target and renamed, so readers never see half a file
+        partial = Path(target).with_name(f".{uuid.uuid4().hex}.tmp")
+        try:
+            image.save(partial, encoder, quality=quality, optimize=True)
+            os.replace(partial, target)
+        finally:
+            partial.unlink(missing_ok=True)
+    return os.path.getsize(target)
+
+
+class ImageCache:
+    """
+    Derivatives on disk, named by a digest of the original's bytes and the
+    size, format and quality, so a changed image gets new names and a
+    derivative can be cached by clients forever.
+
+    The least recently used files are deleted once the cache is larger than
+    max_bytes; use is recorded in each file's modification time, so the
+    order survives restarts. Files used in the last grace_seconds are kept
+    even over max_bytes, so a name just handed out is still there when the
+    client asks for it. Concurrent requests for the same missing derivative
+    wait for a single render.
+
+    Worker processes (serve.py) share the directory but each keeps its own
+    index, so the file's modification time is re-read before an eviction,
+    and a derivative another process deleted is rendered again.
+    """
+
+    def __init__(self, images_dir, cache_dir, max_bytes=512 * 1024 * 1024, workers=None,
+                 grace_seconds=300):
+        self.images_dir = Path(images_dir)
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.grace_seconds = grace_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._files = None         # digest -> (path, size, last use), oldest use first
+        self._total_bytes = 0
+        self._source_hashes = {}   # path -> (mtime_ns, size, sha256)
+        self._rendering = {}       # digest -> Future
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Index the files already in the cache directory, oldest use first."""
+        if self._files is not None:
+            return
+        entries = []
+        for path in self.cache_dir.glob("*/*.*"):
+            if path.name.startswith("."):
+                continue
+            stat = path.stat()
+            entries.append((stat.st_mtime, path.stem, path, stat.st_size))
+        entries.sort()
+        self._files = OrderedDict((digest, (path, size, used))
+                                  for used, digest, path, size in entries)
+        self._total_bytes = sum(size for _, _, _, size in entries)
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def source_hash(self, path):
+        """sha256 of an original, re-read only when its mtime or size changes."""
+        stat = path.stat()
+        with self._lock:
+            cached = self._source_hashes.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        with self._lock:
+            self._source_hashes[path] = (stat.st_mtime_ns, stat.st_size, digest.hexdigest())
+        return digest.hexdigest()
+
+    def derivative_name(self, path, size, image_format, quality):
+        """The cache file name ("<digest>.<ext>") for a derivative of path."""
+        key = f"{self.source_hash(path)}:{size}:{image_format}:{quality}:{PIPELINE_VERSION}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:40]
+        return f"{digest}.{FORMATS[image_format][1]}"
+
+    def path_for(self, name):
+        """The cached file for a derivative name, or None if it isn't cached."""
+        digest, _, extension = name.partition(".")
+        if (len(digest) != 40 or not set(digest) <= set("0123456789abcdef")
+                or extension not in {ext for _, ext, _ in FORMATS.values()}):
+            return None
+        # Checked on disk: a render's file exists just before _finish() indexes it
+        path = self.cache_dir / digest[:2] / name
+        if not path.is_file():
+            return None
+        with self._lock:
+            self._load()
+            if digest in self._files:
+                self._touch(digest)
+        return path
+
+    def _touch(self, digest):
+        """Record a use; returns False if the file is gone from disk."""
+        path, size, _ = self._files[digest]
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process sharing the directory
+            del self._files[digest]
+            self._total_bytes -= size
+            return False
+        self._files[digest] = (path, size, time.time())
+        self._files.move_to_end(digest)
+        return True
+
+    def submit(self, path, size, image_format, quality):
+        """
+        Start rendering a derivative of the original at path unless it is
+        cached; returns (name, future), where the future is None on a hit
+        and otherwise resolves once the file is in the cache.
+        """
+        name = self.derivative_name(path, size, image_format, quality)
+        digest = Path(name).stem
+        with self._lock:
+            self._load()
+            if digest in self._files and self._touch(digest):
+                self.hits += 1
+                return name, None
+            future = self._rendering.get(digest)
+            if future is not None:
+                self.hits += 1
+                return name, future
+            self.misses += 1
+            target = self.cache_dir / digest[:2] / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            future = self._executor().submit(render_derivative, str(path), str(target),
+                                             SIZES[size], FORMATS[image_format][0],
+                                             QUALITIES[quality])
+            self._rendering[digest] = future
+        future.add_done_callback(lambda done: self._finish(digest, target, done))
+        return name, future
+
+    def _finish(self, digest, target, future):
+        with self._lock:
+            self._rendering.pop(digest, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._files[digest] = (target, future.result(), time.time())
+            self._total_bytes += future.result()
+            self._evict()
+
+    def _evict(self):
+        recent = time.time() - self.grace_seconds
+        while self._total_bytes > self.max_bytes and len(self._files) > 1:
+            digest, (path, size, used) = next(iter(self._files.items()))
+            if used > recent:
+                break  # this and every later file were used too recently
+            try:
+                used = path.stat().st_mtime
+            except FileNotFoundError:
+                used = None
+            if used is not None and used > recent:
+                # Used through another process since this one last looked
+                self._files[digest] = (path, size, used)
+                self._files.move_to_end(digest)
+                continue
+            del self._files[digest]
+            path.unlink(missing_ok=True)
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def get(self, path, size=DEFAULT_SIZE, image_format=DEFAULT_FORMAT, quality=DEFAULT_QUALITY):
+        """Return the cache file name of a derivative, rendering it if needed."""
+        name, future = self.submit(path, size, image_format, quality)
+        if future is not None:
+            future.result()
+        return name
+
+    def pregenerate(self, recipes, variants=PREGENERATE):
+        """
+        Render every variant of every recipe's image across the pool.
+        Returns (rendered or already cached, skipped recipes without an
+        image file, failures).
+        """
+        futures, done, skipped, failed = [], 0, 0, 0
+        for recipe in recipes:
+            path = image_path(self.images_dir, recipe.get("image"))
+            if path is None:
+                skipped += 1
+                continue
+            for size, image_format, quality in variants:
+                name, future = self.submit(path, size, image_format, quality)
+                if future is None:
+                    done += 1
+                else:
+                    futures.append((name, future))
+        for name, future in futures:
+            try:
+                future.result()
+                done += 1
+            except Exception as e:
+                print(f"Error rendering {name}: {e}")
+                failed += 1
+        return done, skipped, failed
+
+    def stats(self):
+        with self._lock:
+            self._load()
+            return {"files": len(self._files), "bytes": self._total_bytes,
+                    "max_bytes": self.max_bytes, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+
+    if command == "pregenerate":
+        from recipe_store import RecipeStore
+
+        here = Path(__file__).parent
+        recipes_dir = Path(sys.argv[2]) if len(sys.argv) > 2 else here / "recipes"
+        images_dir = Path(sys.argv[3]) if len(sys.argv) > 3 else here / "images"
+        cache_dir = Path(os.environ.get("RECIPE_IMAGE_CACHE", here / "data" / "image_cache"))
+        max_bytes = int(os.environ.get("RECIPE_IMAGE_CACHE_MB", 512)) * 1024 * 1024
+
+        store = RecipeStore(recipes_dir)
+        cache = ImageCache(images_dir, cache_dir, max_bytes)
+        try:
+            done, skipped, failed = cache.pregenerate(store.all())
+        finally:
+            cache.close()
+        print(f"{done} derivatives ready in {cache_dir}, "
+              f"{skipped} recipes without an image, {failed} failed")
+    else:
+        print("Usage: python recipe_images.py pregenerate [recipes_dir] [images_dir]")
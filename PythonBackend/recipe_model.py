@@ -0,0 +1,228 @@
+"""
+Recipe Model
+Compact in-memory form of a recipe, normalized once when it is loaded.
+
+Recipe JSON comes in two shapes: "ingredients" is either a dict of
+{"amount", "unit"} details or a legacy list of names, and "time" is either
+[prep, total] or a single string. A Recipe keeps one representation of each
+(a tuple of Ingredient, a tuple of times) in __slots__ instead of nested
+dicts and lists, and interns the strings that repeat across a catalog:
+ingredient names, units, amounts, materials and types.
+
+Code that reads recipes uses the normalized accessors (ingredients,
+legacy_ingredients, prep_time, total_time, ...) rather than branching on
+the JSON shapes. to_dict() gives back exactly the JSON the recipe was
+loaded from, with the same key order and legacy shapes, and is only called
+when a recipe is serialized, so files and API responses don't change.
+"""
+
+import sys
+
+from ingredient_vocab import canonical_ingredient
+
+# Layout tuples shared by every recipe (or ingredient) with the same keys
+_layouts = {}
+# Repeated non-string values (e.g. amounts like 0.5); bounded so ids and
+# free-text numbers can't grow it without limit
+_values = {}
+MAX_INTERNED_VALUES = 65536
+
+
+def _layout(keys):
+    keys = tuple(keys)
+    return _layouts.setdefault(keys, keys)
+
+
+# The usual ingredient details, which details() builds without reordering
+_AMOUNT_UNIT = _layout(("amount", "unit"))
+
+
+def intern_value(value):
+    """The shared copy of a string or number that many recipes repeat."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    # 0.0 == -0.0, so zeros keep their own sign
+    if isinstance(value, float) and value and len(_values) < MAX_INTERNED_VALUES:
+        return _values.setdefault(value, value)
+    return value
+
+
+class Ingredient:
+    """
+    One ingredient. amount and unit are None for the legacy list format,
+    which layout also tells apart (None there, the detail keys otherwise).
+    """
+
+    __slots__ = ("name", "amount", "unit", "layout", "extra")
+
+    def __init__(self, name, amount=None, unit=None, layout=None, extra=None):
+        self.name = name
+        self.amount = amount
+        self.unit = unit
+        self.layout = layout   # keys of the details dict, in order
+        self.extra = extra     # detail keys other than amount and unit
+
+    @classmethod
+    def from_details(cls, name, details):
+        extra = {key: value for key, value in details.items()
+                 if key not in ("amount", "unit")} or None
+        return cls(intern_value(name), intern_value(details.get("amount")),
+                   intern_value(details.get("unit")), _layout(details), extra)
+
+    def details(self):
+        """The {"amount": ..., "unit": ...} dict this ingredient was loaded from."""
+        if self.layout is _AMOUNT_UNIT and not self.extra:
+            return {"amount": self.amount, "unit": self.unit}
+        values = {"amount": self.amount, "unit": self.unit}
+        if self.extra:
+            values.update(self.extra)
+        return {key: values[key] for key in self.layout}
+
+    def get(self, key, default=None):
+        """One detail ("amount", "unit", ...) as the details dict has it."""
+        if self.layout is None or key not in self.layout:
+            return default
+        if key == "amount":
+            return self.amount
+        if key == "unit":
+            return self.unit
+        return self.extra[key]
+
+    def __repr__(self):
+        return f"Ingredient({self.name!r}, {self.amount!r}, {self.unit!r})"
+
+
+def _string_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+class Recipe:
+    """
+    A recipe held as slots. Use Recipe.from_dict() to build one and
+    to_dict() to get the JSON dict back; get() reads one key as that dict
+    would have it, without building the rest.
+
+    Values that don't fit the model (say, "time" as a number) are kept
+    as-is in extra, so a recipe always round-trips exactly.
+    """
+
+    __slots__ = ("id", "name", "type", "ingredients", "legacy_ingredients", "steps",
+                 "times", "servings", "materials", "image", "combos", "layout", "extra")
+
+    def __init__(self):
+        self.id = self.name = self.type = self.servings = self.image = None
+        self.ingredients = self.steps = self.times = self.materials = self.combos = ()
+        self.legacy_ingredients = False
+        self.layout = ()   # the recipe's keys, in order
+        self.extra = None  # key -> value for keys not held in slots
+
+    @classmethod
+    def from_dict(cls, data):
+        recipe = cls()
+        extra = {}
+        for key, value in data.items():
+            if not recipe._set(key, value):
+                extra[key] = value
+        recipe.layout = _layout(data)
+        recipe.extra = extra or None
+        return recipe
+
+    def _set(self, key, value):
+        """Store one key in its slot; False if it belongs in extra."""
+        if key == "id":
+            self.id = value
+        elif key == "name" and isinstance(value, str):
+            self.name = value
+        elif key == "type" and isinstance(value, str):
+            self.type = intern_value(value)
+        elif key == "servings":
+            self.servings = value
+        elif key == "image" and isinstance(value, str):
+            self.image = value
+        elif key == "ingredients":
+            if isinstance(value, dict) and all(isinstance(details, dict)
+                                               for details in value.values()):
+                self.ingredients = tuple(Ingredient.from_details(name, details)
+                                         for name, details in value.items())
+            elif _string_list(value):
+                self.ingredients = tuple(Ingredient(intern_value(name)) for name in value)
+                self.legacy_ingredients = True
+            else:
+                return False
+        elif key == "time":
+            if isinstance(value, str):
+                self.times = intern_value(value)
+            elif isinstance(value, list):
+                self.times = tuple(intern_value(time) for time in value)
+            else:
+                return False
+        elif key == "steps" and isinstance(value, list):
+            self.steps = tuple(value)
+        elif key == "materials" and isinstance(value, list):
+            self.materials = tuple(intern_value(material) for material in value)
+        elif key == "combos" and isinstance(value, list):
+            self.combos = tuple(intern_value(combo) for combo in value)
+        else:
+            return False
+        return True
+
+    def _value(self, key):
+        """The JSON value of a key the recipe has."""
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        if key == "ingredients":
+            if self.legacy_ingredients:
+                return [ingredient.name for ingredient in self.ingredients]
+            return {ingredient.name: ingredient.details() for ingredient in self.ingredients}
+        if key == "time":
+            return self.times if isinstance(self.times, str) else list(self.times)
+        value = getattr(self, key)
+        return list(value) if isinstance(value, tuple) else value
+
+    def get(self, key, default=None):
+        if key not in self.layout:
+            return default
+        return self._value(key)
+
+    def __contains__(self, key):
+        return key in self.layout
+
+    def to_dict(self):
+        """The recipe as the JSON dict it was loaded from."""
+        return {key: self._value(key) for key in self.layout}
+
+    @property
+    def prep_time(self):
+        """The prep time of a [prep, total] "time", else None."""
+        return self.times[0] if isinstance(self.times, tuple) and self.times else None
+
+    @property
+    def total_time(self):
+        """
+        The total time: the second of [prep, total], or a single "time"
+        (as given, so possibly a number).
+        """
+        if self.extra is not None and "time" in self.extra:
+            return self.extra["time"]
+        if isinstance(self.times, str):
+            return self.times
+        return self.times[1] if len(self.times) > 1 else None
+
+    def ingredient_names(self):
+        """Normalized ingredient names (see ingredient_index.recipe_ingredient_names)."""
+        if self.extra is not None and "ingredients" in self.extra:
+            # Not modeled: read names the way a plain dict's would be
+            value = self.extra["ingredients"]
+            names = value if isinstance(value, (dict, list)) else ()
+            return {canonical_ingredient(name) for name in names if isinstance(name, str)}
+        return {canonical_ingredient(ingredient.name) for ingredient in self.ingredients}
+
+    def __repr__(self):
+        return f"Recipe({self.id!r}, {self.name!r})"
+
+
+def compact_recipe(recipe):
+    """A Recipe for a plain recipe dict; anything else is returned unchanged."""
+    if isinstance(recipe, dict):
+        return Recipe.from_dict(recipe)
+    return recipe
@@ -0,0 +1,325 @@
+"""
+Recipe Store
+Keeps every recipe parsed in memory and only re-reads recipes that were
+added, changed or deleted in storage (see storage.py).
+
+When a packed catalog (see catalog_pack.py) is available, unchanged files
+are taken from it at startup and only decoded when first accessed.
+"""
+
+import hashlib
+import json
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from pathlib import Path
+
+import metrics
+from catalog_pack import PackedRecord, open_pack, resolve
+from recipe_model import compact_recipe
+from storage import JsonDirectoryBackend
+
+# One store per recipes directory, shared by every module in the process
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(recipes_dir, pack_path=None, backend=None, pack_cache_size=None):
+    """
+    Return the shared RecipeStore for recipes_dir, creating it once.
+    The other arguments only matter for the call that creates the store.
+    """
+    key = Path(recipes_dir).resolve()
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = RecipeStore(recipes_dir, pack_path=pack_path,
+                                                   backend=backend,
+                                                   pack_cache_size=pack_cache_size)
+        return store
+
+
+def id_key(recipe_id):
+    """Lookup key for a recipe id; 1 and "1" refer to the same recipe."""
+    return str(recipe_id)
+
+
+class RecipeStore:
+    """
+    Process-wide, in-memory copy of a recipes directory (or of another
+    storage backend; the JSON directory is the default).
+
+    Files are tracked by their backend signature, (mtime, size) for JSON
+    files. A refresh lists the backend and only parses files whose signature
+    changed, so repeated reads cost a listing at most once per
+    check_interval seconds.
+
+    With pack_path set, a file whose signature matches its packed record is
+    loaded from the pack instead of being parsed. The JSON file stays the
+    source of truth: any file changed since the pack was compiled is read
+    from disk as usual. pack_cache_size bounds how many decoded packed
+    recipes are kept (default: all of them).
+
+    Recipes are kept and returned as slotted recipe_model.Recipe objects
+    rather than nested dicts; callers turn them into JSON only when they
+    send them (Recipe.to_dict()). Listeners get a Recipe or, for recipes
+    still in the pack, a PackedRecord; both have get(), and
+    catalog_pack.resolve() gives the Recipe for either.
+    """
+
+    def __init__(self, recipes_dir, check_interval=1.0, pack_path=None, backend=None,
+                 pack_cache_size=None):
+        self.recipes_dir = Path(recipes_dir)
+        self.backend = backend or JsonDirectoryBackend(recipes_dir)
+        self.check_interval = check_interval
+        self.version = 0
+        # Distinguishes version N of this process from version N of another
+        self.epoch = uuid.uuid4().hex[:12]
+        self._signatures = {}  # filename -> backend signature
+        self._recipes = {}     # filename -> Recipe or PackedRecord
+        self._by_id = {}       # id_key -> [filename, ...]
+        self._hashes = {}      # filename -> content hash, computed lazily
+        self._sorted_files = []  # filenames in sort order, for pagination
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._last_check = None
+        self._last_listing = None  # a backend may return it again when unchanged
+        self._pack_path = pack_path
+        self._pack_cache_size = pack_cache_size
+        self._pack = open_pack(pack_path, pack_cache_size) if pack_path else None
+
+    def subscribe(self, listener, batch_listener=None):
+        """
+        Register a callback for recipe changes.
+
+        The listener is called as listener(filename, old_recipe, new_recipe);
+        old_recipe is None for additions and new_recipe is None for deletions.
+        When many recipes change at once (a refresh or put_many), a
+        batch_listener, if given, is called once with the list of
+        (filename, old_recipe, new_recipe) tuples instead.
+        """
+        with self._lock:
+            self._listeners.append((listener, batch_listener))
+
+    def _notify(self, filename, old_recipe, new_recipe):
+        self._record(filename, old_recipe, new_recipe)
+        for listener, _ in self._listeners:
+            listener(filename, old_recipe, new_recipe)
+
+    def _notify_many(self, changes):
+        for change in changes:
+            self._record(*change)
+        if not changes:
+            return
+        for listener, batch_listener in self._listeners:
+            if batch_listener is not None:
+                batch_listener(changes)
+            else:
+                for change in changes:
+                    listener(*change)
+
+    def _record(self, filename, old_recipe, new_recipe):
+        """Update the store's own bookkeeping for one changed recipe."""
+        self.version += 1
+        self._hashes.pop(filename, None)
+        if old_recipe is None:
+            insort(self._sorted_files, filename)
+        elif new_recipe is None:
+            i = bisect_left(self._sorted_files, filename)
+            if i < len(self._sorted_files) and self._sorted_files[i] == filename:
+                del self._sorted_files[i]
+        if old_recipe is not None:
+            key = id_key(old_recipe.get("id"))
+            filenames = self._by_id.get(key, [])
+            if filename in filenames:
+                filenames.remove(filename)
+            if not filenames:
+                self._by_id.pop(key, None)
+        if new_recipe is not None:
+            self._by_id.setdefault(id_key(new_recipe.get("id")), []).append(filename)
+
+    def _packed_record(self, filename, signature):
+        """Return the packed record for an unchanged file, or None."""
+        index = self._pack.find_file(filename)
+        if index is None or self._pack.signature(index) != signature:
+            return None
+        return self._pack.record(index)
+
+    def reopen_pack(self):
+        """
+        Switch to the pack recompiled at pack_path (see serve.py).
+
+        Every recipe whose file still matches its record is served from the
+        new pack. Packed records are moved over in place, so listeners
+        holding them switch too, and the old mapping is released once
+        nothing refers to it.
+        """
+        if self._pack_path is None:
+            return
+        pack = open_pack(self._pack_path, self._pack_cache_size)
+        if pack is None:
+            return
+        with self._lock:
+            for filename, recipe in self._recipes.items():
+                index = pack.find_file(filename)
+                if index is None or pack.signature(index) != self._signatures.get(filename):
+                    continue
+                if isinstance(recipe, PackedRecord):
+                    recipe.catalog, recipe.index = pack, index
+                else:
+                    self._recipes[filename] = pack.record(index)
+            self._pack = pack
+
+    def refresh(self, force=False):
+        """Pick up files that changed on disk since the last check."""
+        with self._lock:
+            now = time.monotonic()
+            if (not force and self._last_check is not None
+                    and now - self._last_check < self.check_interval):
+                return
+            self._last_check = now
+
+            on_disk = self.backend.scan()
+            if on_disk is self._last_listing:
+                return
+            self._last_listing = on_disk
+            changes = []
+
+            # Deleted files
+            for filename in list(self._signatures):
+                if filename not in on_disk:
+                    del self._signatures[filename]
+                    old_recipe = self._recipes.pop(filename, None)
+                    if old_recipe is not None:
+                        changes.append((filename, old_recipe, None))
+
+            # New or modified files, in name order so that filling the
+            # sorted filename list on a cold start only ever appends
+            for filename, signature in sorted(on_disk.items()):
+                if self._signatures.get(filename) == signature:
+                    continue
+                self._signatures[filename] = signature
+                old_recipe = self._recipes.get(filename)
+                new_recipe = None
+                if old_recipe is None and self._pack is not None:
+                    new_recipe = self._packed_record(filename, signature)
+                if new_recipe is None:
+                    new_recipe = compact_recipe(self.backend.read(filename))
+                if new_recipe is not None:
+                    self._recipes[filename] = new_recipe
+                else:
+                    self._recipes.pop(filename, None)
+                if old_recipe is not None or new_recipe is not None:
+                    changes.append((filename, old_recipe, new_recipe))
+
+            self._notify_many(changes)
+
+    def all(self):
+        """Return a list of all recipes."""
+        self.refresh()
+        with self._lock:
+            return [resolve(recipe) for recipe in self._recipes.values()]
+
+    def get(self, filename):
+        """Return the recipe stored in filename, or None."""
+        self.refresh()
+        with self._lock:
+            recipe = self._recipes.get(filename)
+            return None if recipe is None else resolve(recipe)
+
+    def catalog_tag(self):
+        """Return a token that changes whenever any recipe changes."""
+        self.refresh()
+        with self._lock:
+            return f"{self.epoch}:{self.version}"
+
+    def page(self, after=None, limit=100):
+        """
+        Return up to limit recipes ordered by filename, starting after the
+        filename `after`, plus the filename to continue from (None at the end).
+        """
+        self.refresh()
+        with self._lock:
+            start = bisect_right(self._sorted_files, after) if after else 0
+            filenames = self._sorted_files[start:start + limit]
+            recipes = [resolve(self._recipes[filename]) for filename in filenames]
+            more = start + limit < len(self._sorted_files)
+            return recipes, (filenames[-1] if more and filenames else None)
+
+    def get_by_id(self, recipe_id):
+        """Return the recipe whose "id" matches recipe_id, or None."""
+        self.refresh()
+        with self._lock:
+            filenames = self._by_id.get(id_key(recipe_id))
+            if not filenames:
+                return None
+            return resolve(self._recipes[filenames[0]])
+
+    def get_with_hash(self, recipe_id):
+        """
+        Return (recipe, content_hash) for the recipe with this id, or
+        (None, None). The hash changes whenever the recipe's content does.
+        """
+        self.refresh()
+        with self._lock:
+            filenames = self._by_id.get(id_key(recipe_id))
+            if not filenames:
+                return None, None
+            filename = filenames[0]
+            recipe = resolve(self._recipes[filename])
+            digest = self._hashes.get(filename)
+            if digest is None:
+                canonical = json.dumps(recipe.to_dict(), sort_keys=True, ensure_ascii=False)
+                digest = hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+                self._hashes[filename] = digest
+            return recipe, digest
+
+    def filename_for_id(self, recipe_id):
+        """Return the file holding the recipe with this id, or None."""
+        self.refresh()
+        with self._lock:
+            filenames = self._by_id.get(id_key(recipe_id))
+            return filenames[0] if filenames else None
+
+    def _apply_write(self, filename, recipe):
+        """Record one write (recipe None = deleted); returns the change or None."""
+        if recipe is None:
+            self._signatures.pop(filename, None)
+            old_recipe = self._recipes.pop(filename, None)
+            return None if old_recipe is None else (filename, old_recipe, None)
+        signature = self.backend.signature(filename)
+        if signature is not None:
+            self._signatures[filename] = signature
+        else:
+            self._signatures.pop(filename, None)
+        recipe = compact_recipe(recipe)
+        old_recipe = self._recipes.get(filename)
+        self._recipes[filename] = recipe
+        return (filename, old_recipe, recipe)
+
+    def put(self, filename, recipe):
+        """Record a recipe that was just written to filename."""
+        with self._lock:
+            self._notify(*self._apply_write(filename, recipe))
+
+    def remove(self, filename):
+        """Forget a recipe whose file was just deleted."""
+        with self._lock:
+            change = self._apply_write(filename, None)
+            if change is not None:
+                self._notify(*change)
+
+    def put_many(self, writes):
+        """
+        Record many (filename, recipe) writes at once, recipe None meaning
+        deleted. Batch listeners are called once for the whole batch.
+        """
+        with self._lock:
+            changes = [self._apply_write(filename, recipe) for filename, recipe in writes]
+            self._notify_many([change for change in changes if change is not None])
+
+    def __len__(self):
+        self.refresh()
+        with self._lock:
+            return len(self._recipes)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Production server for the Recipe Kitchen API.
+
+A supervisor process compiles the catalog into a packed snapshot
+(catalog_pack.py), loads app.app on it and builds every index, then forks
+several worker processes that serve it from one shared listening socket.
+The workers start with the supervisor's catalog and indexes and share those
+pages copy-on-write, while recipe data stays once in the page cache through
+the memory-mapped snapshot. A worker's own memory is then only what it
+touches: decoded recipes (at most --decoded-cache) and recipes written since
+it started.
+
+Writes go to storage as usual and every worker picks them up within a
+second. When enough recipes have changed since the snapshot was compiled,
+the supervisor compiles a new one, brings its own catalog and indexes up to
+date and replaces the workers one at a time, so only one process ever does
+the rebuild. SIGHUP forces a reload.
+
+POSIX only (uses fork); on Windows run app.py. Each worker serves with
+werkzeug's threaded development server (make_server), which is not a
+hardened production HTTP server: keep it behind a reverse proxy such as
+nginx that handles TLS, slow clients and request limits.
+
+Run with:
+    python serve.py --workers 4 --port 5000
+"""
+
+import argparse
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+from catalog_pack import DEFAULT_PACK_PATH, compile_catalog, open_pack
+from storage import JsonDirectoryBackend
+
+RECIPES_DIR = Path(os.environ.get("RECIPES_DIR", Path(__file__).parent / "recipes"))
+
+
+def count_stale(recipes_dir, snapshot_path):
+    """Recipe files added, changed or deleted since the snapshot was compiled."""
+    pack = open_pack(snapshot_path)
+    if pack is None:
+        return None
+    try:
+        on_disk = JsonDirectoryBackend(recipes_dir, journal=False).scan()
+        stale = 0
+        for filename, signature in on_disk.items():
+            index = pack.find_file(filename)
+            if index is None or pack.signature(index) != signature:
+                stale += 1
+        stale += sum(1 for filename in pack.filenames() if filename not in on_disk)
+        return stale
+    finally:
+        pack.close()
+
+
+def load_app():
+    """
+    Import app (once) and bring its catalog and every index up to date, so
+    that forked workers inherit them instead of building their own.
+    """
+    import app as recipe_app
+
+    recipe_app.build_indexes()
+    # Keep the collector from writing to (and so copying) the inherited objects
+    gc.freeze()
+    return recipe_app
+
+
+def run_worker(recipe_app, listener, ready_fd):
+    """Worker process body: serve the preloaded app until SIGTERM."""
+    from werkzeug.serving import make_server
+
+    host, port = listener.getsockname()[:2]
+    server = make_server(host, port, recipe_app.app, threaded=True, fd=listener.fileno())
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever, so it can't run in this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor handles ^C
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    os.write(ready_fd, b"1")
+    os.close(ready_fd)
+    server.serve_forever()
+
+
+class Supervisor:
+    """Starts, watches and reloads the worker processes."""
+
+    def __init__(self, args):
+        self.args = args
+        self.snapshot = Path(args.snapshot) if args.snapshot else None
+        self.workers = set()
+        self.reload_requested = False
+        self.stopping = False
+
+    def compile_snapshot(self):
+        if self.snapshot is None:
+            return
+        # Flush written recipes to disk before they are packed into the snapshot
+        self.storage.checkpoint()
+        start = time.perf_counter()
+        count = compile_catalog(RECIPES_DIR, self.snapshot)
+        print(f"Compiled snapshot of {count} recipes in "
+              f"{time.perf_counter() - start:.1f}s: {self.snapshot}")
+
+    def spawn(self):
+        """Fork one worker and wait until it is serving."""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                run_worker(self.app, self.listener, write_fd)
+            except BaseException as e:
+                print(f"Worker {os.getpid()} failed: {e}")
+                os._exit(1)
+            os._exit(0)
+
+        os.close(write_fd)
+        ready, _, _ = select.select([read_fd], [], [], self.args.start_timeout)
+        started = bool(ready) and os.read(read_fd, 1) == b"1"
+        os.close(read_fd)
+        if not started:
+            print(f"Worker {pid} did not start")
+        self.workers.add(pid)
+        return pid
+
+    def stop_worker(self, pid):
+        try:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+        self.workers.discard(pid)
+
+    def reload(self):
+        """Compile a fresh snapshot, catch up with storage, then replace the
+        workers one at a time."""
+        self.compile_snapshot()
+        load_app()
+        # The workers forked below serve from the new snapshot
+        self.app.recipe_store.reopen_pack()
+        for old_pid in list(self.workers):
+            self.spawn()
+            self.stop_worker(old_pid)
+        print(f"Reloaded {len(self.workers)} workers")
+
+    def reap(self):
+        """Replace workers that exited unexpectedly."""
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.workers:
+                self.workers.discard(pid)
+                if not self.stopping:
+                    print(f"Worker {pid} exited with status {status}; restarting")
+                    self.spawn()
+
+    def run(self):
+        # Replays any journal left by a crash once, before the workers start
+        self.storage = JsonDirectoryBackend(RECIPES_DIR)
+        self.compile_snapshot()
+        if self.snapshot is not None:
+            os.environ["RECIPE_PACK"] = str(self.snapshot)
+            os.environ.setdefault("RECIPE_PACK_CACHE", str(self.args.decoded_cache))
+
+        start = time.perf_counter()
+        self.app = load_app()
+        print(f"Loaded {len(self.app.recipe_store)} recipes in "
+              f"{time.perf_counter() - start:.1f}s")
+
+        self.listener = socket.create_server((self.args.host, self.args.port), backlog=1024)
+
+        signal.signal(signal.SIGHUP, lambda signum, frame: setattr(self, "reload_requested", True))
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, "stopping", True))
+        signal.signal(signal.SIGINT, lambda signum, frame: setattr(self, "stopping", True))
+
+        for _ in range(self.args.workers):
+            self.spawn()
+        print(f"Serving on http://{self.args.host}:{self.args.port} "
+              f"with {len(self.workers)} workers")
+
+        last_check = time.monotonic()
+        while not self.stopping:
+            time.sleep(0.5)
+            self.reap()
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload()
+            elif (self.snapshot is not None
+                  and time.monotonic() - last_check >= self.args.check_interval):
+                last_check = time.monotonic()
+                stale = count_stale(RECIPES_DIR, self.snapshot)
+                if stale is not None and stale >= self.args.reload_threshold:
+                    print(f"{stale} recipes changed since the snapshot; reloading")
+                    self.reload()
+
+        for pid in list(self.workers):
+            self.stop_worker(pid)
+        self.listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process Recipe Kitchen API server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--snapshot", default=os.environ.get("RECIPE_PACK", DEFAULT_PACK_PATH),
+                        help="packed catalog the workers share (compiled at startup)")
+    parser.add_argument("--decoded-cache", type=int, default=10000,
+                        help="decoded recipes each worker keeps from the snapshot")
+    parser.add_argument("--reload-threshold", type=int, default=1000,
+                        help="recompile the snapshot once this many recipes changed")
+    parser.add_argument("--check-interval", type=float, default=30.0,
+                        help="seconds between snapshot staleness checks")
+    parser.add_argument("--start-timeout", type=float, default=300.0,
+                        help="seconds to wait for a worker to start serving")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs os.fork; run app.py instead")
+    if os.environ.get("RECIPE_STORAGE", "json") != "json":
+        # Snapshots are compiled from the JSON directory
+        args.snapshot = None
+    Supervisor(args).run()
+
+
+if __name__ == "__main__":
+    main()
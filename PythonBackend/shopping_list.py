@@ -0,0 +1,347 @@
+"""
+Shopping List
+Scales recipes to target servings and sums their ingredients per unit.
+
+Ingredient amounts are kept in flat NumPy columns (one row per recipe
+ingredient, already converted to a base unit), so a meal plan of thousands
+of recipes is aggregated with a few array operations instead of a Python
+loop over recipes.
+"""
+
+import threading
+from operator import itemgetter
+from fractions import Fraction
+
+import numpy as np
+
+from catalog_pack import resolve
+from ingredient_index import normalize_ingredient
+from recipe_store import id_key
+
+# Unit kinds. Amounts of one kind can be added once converted to its base unit.
+VOLUME, MASS, COUNT, OTHER, UNMEASURED = range(5)
+
+# unit -> (kind, size in the kind's base unit: ml, g or one item)
+UNITS = {
+    "tsp": (VOLUME, 4.92892),
+    "tbsp": (VOLUME, 14.7868),
+    "fl oz": (VOLUME, 29.5735),
+    "cup": (VOLUME, 236.588),
+    "pint": (VOLUME, 473.176),
+    "quart": (VOLUME, 946.353),
+    "gallon": (VOLUME, 3785.41),
+    "ml": (VOLUME, 1.0),
+    "l": (VOLUME, 1000.0),
+    "mg": (MASS, 0.001),
+    "g": (MASS, 1.0),
+    "kg": (MASS, 1000.0),
+    "oz": (MASS, 28.3495),
+    "lb": (MASS, 453.592),
+    "whole": (COUNT, 1.0),
+    "dozen": (COUNT, 12.0),
+}
+
+# Recipes write a tablespoon "T" and a teaspoon "t", so these are read
+# before the unit is lowercased
+CASED_UNIT_ALIASES = {"T": "tbsp", "t": "tsp"}
+
+UNIT_ALIASES = {
+    "teaspoon": "tsp", "teaspoons": "tsp",
+    "tablespoon": "tbsp", "tablespoons": "tbsp", "tbs": "tbsp", "tbl": "tbsp",
+    "cups": "cup", "c": "cup",
+    "fluid ounce": "fl oz", "fluid ounces": "fl oz", "floz": "fl oz",
+    "pints": "pint", "pt": "pint", "quarts": "quart", "qt": "quart",
+    "gallons": "gallon", "gal": "gallon",
+    "milliliter": "ml", "milliliters": "ml", "millilitre": "ml", "millilitres": "ml",
+    "liter": "l", "liters": "l", "litre": "l", "litres": "l",
+    "milligram": "mg", "milligrams": "mg",
+    "gram": "g", "grams": "g", "gr": "g",
+    "kilogram": "kg", "kilograms": "kg", "kgs": "kg",
+    "ounce": "oz", "ounces": "oz",
+    "pound": "lb", "pounds": "lb", "lbs": "lb",
+    "": "whole", "each": "whole", "piece": "whole", "pieces": "whole", "pc": "whole",
+    "pcs": "whole", "item": "whole", "items": "whole",
+    "small": "whole", "medium": "whole", "large": "whole",
+    "dozens": "dozen",
+    # Plurals of units that aren't converted
+    "slices": "slice", "leaves": "leaf", "cloves": "clove", "heads": "head",
+    "pinches": "pinch", "buns": "bun", "cans": "can", "sprigs": "sprig",
+    "stalks": "stalk", "bunches": "bunch", "splashes": "splash", "dashes": "dash",
+}
+
+# Units a total is reported in: (smallest total in base units, unit, size)
+DISPLAY_UNITS = {
+    "us": {
+        VOLUME: [(0.0, "tsp", 4.92892), (14.7868, "tbsp", 14.7868), (59.147, "cup", 236.588)],
+        MASS: [(0.0, "oz", 28.3495), (453.592, "lb", 453.592)],
+    },
+    "metric": {
+        VOLUME: [(0.0, "ml", 1.0), (1000.0, "l", 1000.0)],
+        MASS: [(0.0, "g", 1.0), (1000.0, "kg", 1000.0)],
+    },
+}
+
+
+def normalize_unit(unit):
+    """Return the canonical spelling of a unit ("Tablespoons" -> "tbsp")."""
+    unit = str(unit or "").strip().rstrip(".")
+    if unit in CASED_UNIT_ALIASES:
+        return CASED_UNIT_ALIASES[unit]
+    unit = unit.lower()
+    return UNIT_ALIASES.get(unit, unit)
+
+
+def parse_amount(amount):
+    """Return amount as a float ("1 1/2" -> 1.5), or None if it isn't one."""
+    if isinstance(amount, bool):
+        return None
+    if isinstance(amount, (int, float)):
+        return float(amount)
+    if isinstance(amount, str):
+        try:
+            return float(sum(Fraction(part) for part in amount.split()))
+        except (ValueError, ZeroDivisionError):
+            return None
+    return None
+
+
+def recipe_servings(recipe):
+    """The recipe's servings count; 1 when missing or unusable."""
+    servings = parse_amount(recipe.get("servings"))
+    return servings if servings and servings > 0 else 1.0
+
+
+class _Column:
+    """A NumPy array that grows by doubling, like a list."""
+
+    def __init__(self, dtype, fill=0):
+        self._data = np.full(1024, fill, dtype=dtype)
+        self._fill = fill
+        self.size = 0
+
+    def _reserve(self, size):
+        if size > len(self._data):
+            grown = np.full(max(size, 2 * len(self._data)), self._fill, dtype=self._data.dtype)
+            grown[:self.size] = self._data[:self.size]
+            self._data = grown
+
+    def extend(self, values):
+        start = self.size
+        self._reserve(start + len(values))
+        self._data[start:start + len(values)] = values
+        self.size = start + len(values)
+        return start
+
+    def __setitem__(self, index, value):
+        self._reserve(index + 1)
+        self._data[index] = value
+        self.size = max(self.size, index + 1)
+
+    def replace(self, values):
+        self.size = 0
+        self.extend(values)
+
+    @property
+    def values(self):
+        return self._data[:self.size]
+
+
+class ShoppingListPlanner:
+    """
+    Aggregates ingredient amounts over a meal plan.
+
+    Kept up to date through RecipeStore.subscribe(). Changes are only
+    queued when they arrive and applied by the next plan(), so a server
+    that never builds a shopping list never decodes recipes for one.
+    """
+
+    def __init__(self):
+        self._pending = {}      # filename -> recipe (None = deleted)
+        self._slots = {}        # filename -> slot
+        self._slot_ids = {}     # slot -> id_key
+        self._by_id = {}        # id_key -> slot
+        self._free_slots = []
+        self._next_slot = 0
+        self._items = {}        # (ingredient, kind, unit) -> item id
+        self._item_keys = []
+        self._item_kinds = _Column(np.int8)
+        # Per slot: servings and the slot's range of entry rows
+        self._servings = _Column(np.float64, 1.0)
+        self._starts = _Column(np.int64)
+        self._lengths = _Column(np.int64)
+        # Per entry: item id and amount in the item's base unit (NaN if unmeasured)
+        self._entry_items = _Column(np.int32)
+        self._entry_amounts = _Column(np.float64)
+        self._dead_entries = 0
+        self._lock = threading.RLock()
+
+    def on_change(self, filename, old_recipe, new_recipe):
+        """RecipeStore listener."""
+        with self._lock:
+            self._pending[filename] = new_recipe
+
+    def on_changes(self, changes):
+        """RecipeStore batch listener."""
+        with self._lock:
+            for filename, old_recipe, new_recipe in changes:
+                self._pending[filename] = new_recipe
+
+    def _item_id(self, name, kind, unit):
+        key = (name, kind, unit)
+        item = self._items.get(key)
+        if item is None:
+            item = self._items[key] = len(self._item_keys)
+            self._item_keys.append(key)
+            self._item_kinds[item] = kind
+        return item
+
+    def _entries(self, recipe):
+        """(item ids, base amounts) for one Recipe's ingredients."""
+        items, amounts = [], []
+        # Legacy ingredients are names only, so their amount is None too
+        for ingredient in recipe.ingredients:
+            name = normalize_ingredient(ingredient.name)
+            amount = parse_amount(ingredient.amount)
+            unit = normalize_unit(ingredient.unit)
+            if amount is None:
+                items.append(self._item_id(name, UNMEASURED, None))
+                amounts.append(np.nan)
+            elif unit in UNITS:
+                kind, size = UNITS[unit]
+                items.append(self._item_id(name, kind, None))
+                amounts.append(amount * size)
+            else:
+                items.append(self._item_id(name, OTHER, unit))
+                amounts.append(amount)
+        return items, amounts
+
+    def _remove(self, filename):
+        slot = self._slots.pop(filename, None)
+        if slot is None:
+            return
+        recipe_key = self._slot_ids.pop(slot)
+        if self._by_id.get(recipe_key) == slot:
+            del self._by_id[recipe_key]
+        self._dead_entries += int(self._lengths.values[slot])
+        self._lengths[slot] = 0
+        self._free_slots.append(slot)
+
+    def _add(self, filename, recipe):
+        self._remove(filename)
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = self._next_slot
+            self._next_slot += 1
+        items, amounts = self._entries(recipe)
+        self._starts[slot] = self._entry_items.extend(items)
+        self._entry_amounts.extend(amounts)
+        self._lengths[slot] = len(items)
+        self._servings[slot] = recipe_servings(recipe)
+        self._slots[filename] = slot
+        recipe_key = id_key(recipe.get("id"))
+        self._slot_ids[slot] = recipe_key
+        self._by_id[recipe_key] = slot
+
+    def _gather(self, slots):
+        """Entry row numbers of the given slots, concatenated."""
+        lengths = self._lengths.values[slots]
+        ends = np.cumsum(lengths)
+        offsets = np.repeat(self._starts.values[slots] - (ends - lengths), lengths)
+        return offsets + np.arange(ends[-1] if len(ends) else 0), lengths
+
+    def _compact(self):
+        """Drop entry rows left behind by updated and deleted recipes."""
+        slots = np.fromiter(self._slots.values(), dtype=np.int64, count=len(self._slots))
+        rows, lengths = self._gather(slots)
+        self._entry_items.replace(self._entry_items.values[rows])
+        self._entry_amounts.replace(self._entry_amounts.values[rows])
+        starts = self._starts.values
+        starts[slots] = np.cumsum(lengths) - lengths
+        self._dead_entries = 0
+
+    def _apply_pending(self):
+        if not self._pending:
+            return
+        for filename, recipe in self._pending.items():
+            if recipe is None:
+                self._remove(filename)
+            else:
+                self._add(filename, resolve(recipe))
+        self._pending.clear()
+        if self._dead_entries > max(self._entry_items.size // 2, 65536):
+            self._compact()
+
+    def flush(self):
+        """Apply queued changes now instead of on the next lookup."""
+        with self._lock:
+            self._apply_pending()
+
+    def plan(self, meals, units="us"):
+        """
+        Build a shopping list.
+
+        meals is a list of (recipe_id, servings) pairs; servings None means
+        the recipe's own servings. Returns (items, missing_ids), where items
+        are {"ingredient", "amount", "unit", "recipes"} dicts sorted by
+        ingredient. Amounts are None for ingredients listed without one.
+        """
+        display_units = DISPLAY_UNITS[units]
+        with self._lock:
+            self._apply_pending()
+            recipe_ids = list(map(itemgetter(0), meals))
+            servings = list(map(itemgetter(1), meals))
+            get = self._by_id.get
+            slots = np.array([get(key, -1) for key in map(id_key, recipe_ids)], dtype=np.int64)
+            # None (the recipe's own servings) becomes NaN
+            targets = np.array(servings, dtype=np.float64)
+            missing = [recipe_ids[i] for i in np.flatnonzero(slots < 0)]
+            found = slots >= 0
+            slots, targets = slots[found], targets[found]
+
+            scale = np.where(np.isnan(targets), 1.0, targets / self._servings.values[slots])
+            rows, lengths = self._gather(slots)
+            items = self._entry_items.values[rows]
+            amounts = self._entry_amounts.values[rows] * np.repeat(scale, lengths)
+            item_count = len(self._item_keys)
+            item_keys = self._item_keys
+            kinds = self._item_kinds.values
+
+        measured = ~np.isnan(amounts)
+        totals = np.bincount(items[measured], weights=amounts[measured],
+                             minlength=item_count).astype(np.float64, copy=False)
+        uses = np.bincount(items, minlength=item_count)
+        used = np.flatnonzero(uses)
+        totals, uses, used_kinds = totals[used], uses[used], kinds[used]
+
+        # Pick a readable unit per total, then convert into it
+        unit_names = np.empty(len(used), dtype=object)
+        for kind, ladder in display_units.items():
+            in_kind = used_kinds == kind
+            step = np.searchsorted([low for low, _, _ in ladder], totals[in_kind], side="right") - 1
+            step = np.maximum(step, 0)
+            sizes = np.array([size for _, _, size in ladder])[step]
+            totals[in_kind] /= sizes
+            unit_names[in_kind] = np.array([name for _, name, _ in ladder], dtype=object)[step]
+        totals = np.round(totals, 3)
+
+        result = []
+        for i, item in enumerate(used.tolist()):
+            name, kind, unit = item_keys[item]
+            if kind == UNMEASURED:
+                amount, unit = None, None
+            else:
+                amount = float(totals[i])
+                if kind == COUNT:
+                    unit = "whole"
+                elif kind != OTHER:
+                    unit = unit_names[i]
+            result.append({"ingredient": name, "amount": amount, "unit": unit,
+                           "recipes": int(uses[i])})
+        result.sort(key=lambda entry: (entry["ingredient"], entry["unit"] or ""))
+        return result, missing
+
+    def __len__(self):
+        with self._lock:
+            self._apply_pending()
+            return len(self._slots)
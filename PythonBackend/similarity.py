@@ -0,0 +1,413 @@
+"""
+Recipe Similarity
+"Goes well with" neighbours for every recipe: the recipes whose
+ingredients and materials overlap most, found with MinHash and LSH so the
+catalog is never compared pairwise.
+
+Usage: python similarity.py build [recipes_dir] [table]
+"""
+
+import hashlib
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from ingredient_index import recipe_ingredient_names
+from recipe_store import id_key
+
+# MinHash signature length; signatures agree on about this share of
+# positions as the recipes' feature sets (their Jaccard similarity)
+BANDS = 32
+ROWS = 3
+NUM_HASHES = BANDS * ROWS
+
+# Neighbours kept per recipe, and the least similarity worth listing
+TOP_K = 10
+MIN_SIMILARITY = 0.25
+
+# Recipes compared from one LSH bucket; common ingredient combinations
+# fill buckets with thousands of near-identical recipes, of which the most
+# similar are kept
+MAX_BUCKET_CANDIDATES = 64
+
+# Fixed so saved tables stay valid; change it and every signature changes
+HASH_SEED = 20240601
+
+_rng = np.random.default_rng(HASH_SEED)
+# Multiply-shift hash functions: h(x) = (a * x + b) >> 32 on 64-bit words
+_HASH_A = _rng.integers(1, 2 ** 63, NUM_HASHES, dtype=np.uint64) | np.uint64(1)
+_HASH_B = _rng.integers(0, 2 ** 63, NUM_HASHES, dtype=np.uint64)
+# Mixes the ROWS values of a band into one bucket key
+_BAND_MIX = _rng.integers(1, 2 ** 63, ROWS, dtype=np.uint64) | np.uint64(1)
+_EMPTY = np.iinfo(np.uint32).max
+
+
+def recipe_features(recipe):
+    """The set compared between recipes: ingredients and materials."""
+    features = set(recipe_ingredient_names(recipe))
+    materials = recipe.get("materials")
+    if isinstance(materials, list):
+        features.update(f"material:{str(material).lower()}" for material in materials)
+    return features
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=4).digest(),
+                          "little")
+
+
+def minhash(features):
+    """The NUM_HASHES-value MinHash signature of a set of strings."""
+    if not features:
+        return np.full(NUM_HASHES, _EMPTY, dtype=np.uint32)
+    values = np.array([_feature_hash(feature) for feature in features], dtype=np.uint64)
+    hashed = (_HASH_A[:, None] * values[None, :] + _HASH_B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def band_keys(signatures):
+    """One bucket key per band for each signature row."""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    return (bands * _BAND_MIX).sum(axis=2)
+
+
+def _digest(features):
+    joined = "\0".join(sorted(features)).encode("utf-8")
+    return hashlib.blake2b(joined, digest_size=8).hexdigest()
+
+
+class SimilarityIndex:
+    """
+    Top-K most similar recipes per recipe, as rows of a neighbour table.
+
+    Each recipe has a MinHash signature; recipes sharing all ROWS values of
+    any of the BANDS bands land in a common bucket and become candidates,
+    and candidates are scored by how many signature values they share.
+    Like AttributeIndex, changes from the store are queued and applied by
+    the next lookup. Only recipes whose features changed are re-hashed; the
+    rows listing them are recomputed and their new neighbours updated.
+    """
+
+    def __init__(self):
+        self._pending = {}     # filename -> recipe (None = deleted)
+        self._slots = {}       # filename -> slot
+        self._filenames = []   # slot -> filename (None = free)
+        self._slot_ids = []    # slot -> id_key
+        self._by_id = {}       # id_key -> slot
+        self._digests = []     # slot -> digest of the recipe's features
+        self._free_slots = []
+        self._signatures = np.zeros((0, NUM_HASHES), dtype=np.uint32)
+        self._band_keys = np.zeros((0, BANDS), dtype=np.uint64)
+        self._buckets = [{} for _ in range(BANDS)]  # band key -> set of slots
+        # Crowded buckets as arrays, dropped whenever the bucket changes
+        self._crowded = [{} for _ in range(BANDS)]  # band key -> array of slots
+        self._neighbours = np.zeros((0, TOP_K), dtype=np.int32)  # -1 = empty
+        self._scores = np.zeros((0, TOP_K), dtype=np.float32)
+        self._saved = {}       # filename -> (digest, signature, neighbours, scores)
+        self.recomputed = 0
+        self._lock = threading.RLock()
+
+    def on_change(self, filename, old_recipe, new_recipe):
+        """RecipeStore listener."""
+        with self._lock:
+            self._pending[filename] = new_recipe
+
+    def on_changes(self, changes):
+        """RecipeStore batch listener."""
+        with self._lock:
+            for filename, old_recipe, new_recipe in changes:
+                self._pending[filename] = new_recipe
+
+    def _grow(self, size):
+        if size <= len(self._signatures):
+            return
+        extra = max(size, 2 * len(self._signatures), 1024) - len(self._signatures)
+        self._signatures = np.concatenate(
+            [self._signatures, np.full((extra, NUM_HASHES), _EMPTY, dtype=np.uint32)])
+        self._band_keys = np.concatenate(
+            [self._band_keys, np.zeros((extra, BANDS), dtype=np.uint64)])
+        self._neighbours = np.concatenate(
+            [self._neighbours, np.full((extra, TOP_K), -1, dtype=np.int32)])
+        self._scores = np.concatenate([self._scores, np.zeros((extra, TOP_K), dtype=np.float32)])
+
+    def _unbucket(self, slot):
+        if self._signatures[slot, 0] == _EMPTY:
+            return
+        for band, key in enumerate(self._band_keys[slot].tolist()):
+            members = self._buckets[band].get(key)
+            self._crowded[band].pop(key, None)
+            if members is not None:
+                members.discard(slot)
+                if not members:
+                    del self._buckets[band][key]
+
+    def _bucket(self, slot, signature):
+        self._signatures[slot] = signature
+        if signature[0] == _EMPTY:
+            return
+        self._band_keys[slot] = band_keys(signature[None, :])[0]
+        for band, key in enumerate(self._band_keys[slot].tolist()):
+            self._buckets[band].setdefault(key, set()).add(slot)
+            self._crowded[band].pop(key, None)
+
+    def _apply_pending(self):
+        if not self._pending:
+            return
+        changed, restored = [], []
+        for filename, recipe in self._pending.items():
+            slot = self._slots.get(filename)
+            if recipe is None:
+                if slot is not None:
+                    del self._slots[filename]
+                    self._forget_id(slot)
+                    self._unbucket(slot)
+                    self._signatures[slot] = _EMPTY
+                    self._neighbours[slot] = -1
+                    self._filenames[slot] = None
+                    self._digests[slot] = None
+                    self._free_slots.append(slot)
+                    changed.append(slot)
+                continue
+
+            features = recipe_features(recipe)
+            digest = _digest(features)
+            if slot is None:
+                if self._free_slots:
+                    slot = self._free_slots.pop()
+                else:
+                    slot = len(self._filenames)
+                    self._filenames.append(None)
+                    self._slot_ids.append(None)
+                    self._digests.append(None)
+                    self._grow(slot + 1)
+                self._slots[filename] = slot
+                self._filenames[slot] = filename
+            self._forget_id(slot)
+            self._slot_ids[slot] = id_key(recipe.get("id"))
+            self._by_id[self._slot_ids[slot]] = slot
+            if self._digests[slot] == digest:
+                continue  # same ingredients and materials: nothing to redo
+
+            self._unbucket(slot)
+            saved = self._saved.pop(filename, None)
+            if saved is not None and saved[0] == digest:
+                self._bucket(slot, saved[1])
+                restored.append((slot, saved[2], saved[3]))
+            else:
+                self._bucket(slot, minhash(features))
+                changed.append(slot)
+            self._digests[slot] = digest
+        self._pending.clear()
+        self._saved.clear()
+        self._restore(restored, changed)
+        self._update(changed)
+
+    def _forget_id(self, slot):
+        recipe_key = self._slot_ids[slot]
+        if recipe_key is not None and self._by_id.get(recipe_key) == slot:
+            del self._by_id[recipe_key]
+        self._slot_ids[slot] = None
+
+    def _restore(self, restored, changed):
+        """Fill rows from a saved table; rows naming recipes that are gone
+        are recomputed instead."""
+        for slot, neighbour_files, scores in restored:
+            neighbours = [self._slots.get(filename, -1) for filename in neighbour_files]
+            if -1 in neighbours:
+                changed.append(slot)
+                continue
+            self._neighbours[slot] = -1
+            self._neighbours[slot, :len(neighbours)] = neighbours
+            self._scores[slot] = 0
+            self._scores[slot, :len(scores)] = scores
+
+    def _candidates(self, slot):
+        if self._signatures[slot, 0] == _EMPTY:
+            return np.zeros(0, dtype=np.int64)
+        candidates, crowded = set(), []
+        for band, key in enumerate(self._band_keys[slot].tolist()):
+            members = self._buckets[band].get(key, ())
+            if len(members) <= MAX_BUCKET_CANDIDATES:
+                candidates.update(members)
+                continue
+            array = self._crowded[band].get(key)
+            if array is None:
+                array = self._crowded[band][key] = np.fromiter(
+                    members, dtype=np.int64, count=len(members))
+            crowded.append(array)
+        if crowded:
+            candidates.update(self._closest(slot, crowded))
+        candidates.discard(slot)
+        return np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+
+    def _closest(self, slot, buckets):
+        """
+        The MAX_BUCKET_CANDIDATES members of each bucket (an array of slots)
+        most similar to slot, ties broken by slot, so the cut doesn't depend
+        on set order.
+        """
+        members = np.concatenate(buckets)
+        # Crowded buckets mostly hold the same recipes; score each once
+        unique, positions = np.unique(members, return_inverse=True)
+        matches = (self._signatures[unique] == self._signatures[slot]).sum(axis=1)[positions]
+        # Most matches first, then lowest slot, as one sortable integer
+        order = (NUM_HASHES - matches).astype(np.int64) << 32 | members
+        closest, start = [], 0
+        for bucket in buckets:
+            keys = order[start:start + len(bucket)]
+            start += len(bucket)
+            smallest = np.partition(keys, MAX_BUCKET_CANDIDATES - 1)[:MAX_BUCKET_CANDIDATES]
+            closest.extend((smallest & 0xFFFFFFFF).tolist())
+        return closest
+
+    def _similarities(self, slot, candidates):
+        """Estimated Jaccard similarity of slot to each candidate, as the
+        float32 the table stores, so fresh and stored scores compare equal."""
+        matches = self._signatures[candidates] == self._signatures[slot]
+        return matches.mean(axis=1).astype(np.float32)
+
+    def _compute_row(self, slot):
+        """
+        Fill slot's row with its TOP_K neighbours, by descending score and
+        then by slot. Returns every candidate scoring at least
+        MIN_SIMILARITY, with its score, not just the TOP_K kept.
+        """
+        candidates = self._candidates(slot)
+        scores = self._similarities(slot, candidates)
+        keep = scores >= MIN_SIMILARITY
+        candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((candidates, -scores))[:TOP_K]
+        self._neighbours[slot] = -1
+        self._neighbours[slot, :len(order)] = candidates[order]
+        self._scores[slot] = 0
+        self._scores[slot, :len(order)] = scores[order]
+        self.recomputed += 1
+        return candidates, scores
+
+    def _offer(self, slot, neighbour, score):
+        """Put neighbour into slot's row if it is among its TOP_K, in the
+        order _compute_row would have given it."""
+        row, row_scores = self._neighbours[slot], self._scores[slot]
+        if neighbour in row:
+            return
+        filled = int((row != -1).sum())
+        after = ((row_scores[:filled] < score)
+                 | ((row_scores[:filled] == score) & (row[:filled] > neighbour)))
+        position = int(after.argmax()) if after.any() else filled
+        if position == TOP_K:
+            return
+        row[position + 1:] = row[position:-1].copy()
+        row_scores[position + 1:] = row_scores[position:-1].copy()
+        row[position], row_scores[position] = neighbour, score
+
+    def _update(self, changed):
+        if not changed:
+            return
+        live = np.array(sorted(self._slots.values()), dtype=np.int64)
+        if len(changed) * 4 > len(live):
+            # Most of the catalog changed (e.g. the first load): redo every row
+            for slot in live.tolist():
+                self._compute_row(slot)
+            return
+
+        changed_slots = np.unique(np.array(changed, dtype=np.int64))
+        # Rows that listed a changed recipe may have lost a neighbour
+        stale = live[np.isin(self._neighbours[live], changed_slots).any(axis=1)]
+        for slot in np.union1d(stale, changed_slots).tolist():
+            if self._filenames[slot] is None:
+                continue
+            candidates, scores = self._compute_row(slot)
+            if slot in changed_slots:
+                # A changed recipe may now belong in the row of any recipe
+                # similar enough to it, including ones outside its own TOP_K
+                for candidate, score in zip(candidates.tolist(), scores.tolist()):
+                    self._offer(candidate, slot, score)
+
+    def flush(self):
+        """Apply queued changes now instead of on the next lookup."""
+        with self._lock:
+            self._apply_pending()
+
+    def similar(self, recipe_id, limit=TOP_K):
+        """
+        Return [(filename, score), ...] for the recipes most like recipe_id,
+        most similar first, or None if the recipe isn't indexed.
+        """
+        with self._lock:
+            self._apply_pending()
+            slot = self._by_id.get(id_key(recipe_id))
+            if slot is None:
+                return None
+            row = self._neighbours[slot, :limit].tolist()
+            scores = self._scores[slot, :limit].tolist()
+            return [(self._filenames[n], round(s, 3)) for n, s in zip(row, scores) if n != -1]
+
+    def save(self, path):
+        """Write the signatures and neighbour table for load()."""
+        with self._lock:
+            self._apply_pending()
+            slots = np.array(sorted(self._slots.values()), dtype=np.int64)
+            filenames = [self._filenames[slot] for slot in slots.tolist()]
+            position = np.full(len(self._filenames) + 1, -1, dtype=np.int32)
+            position[slots] = np.arange(len(slots))
+            np.savez(path, filenames=np.array(filenames, dtype=str),
+                     digests=np.array([self._digests[slot] for slot in slots.tolist()], dtype=str),
+                     signatures=self._signatures[slots],
+                     neighbours=position[self._neighbours[slots]],
+                     scores=self._scores[slots],
+                     params=np.array([BANDS, ROWS, TOP_K, HASH_SEED], dtype=np.int64))
+
+    def load(self, path):
+        """
+        Use a table written by save() for recipes whose features haven't
+        changed since; must be called before the store's first notification.
+        """
+        with np.load(path) as table:
+            if table["params"].tolist() != [BANDS, ROWS, TOP_K, HASH_SEED]:
+                print(f"Ignoring {path}: built with different parameters")
+                return 0
+            # Each table[...] reads the whole array from the file
+            filenames = table["filenames"].tolist()
+            digests = table["digests"].tolist()
+            signatures = table["signatures"]
+            neighbours, scores = table["neighbours"].tolist(), table["scores"]
+        with self._lock:
+            for i, (filename, digest) in enumerate(zip(filenames, digests)):
+                row = [filenames[n] for n in neighbours[i] if n != -1]
+                self._saved[filename] = (digest, signatures[i], row, scores[i, :len(row)])
+        return len(filenames)
+
+    def __len__(self):
+        with self._lock:
+            self._apply_pending()
+            return len(self._slots)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+
+    if command == "build":
+        import time
+
+        from recipe_store import RecipeStore
+
+        here = Path(__file__).parent
+        recipes_dir = Path(sys.argv[2]) if len(sys.argv) > 2 else here / "recipes"
+        table_path = Path(sys.argv[3]) if len(sys.argv) > 3 else here / "data" / "similarity.npz"
+
+        start = time.perf_counter()
+        index = SimilarityIndex()
+        if table_path.exists():
+            index.load(table_path)
+        store = RecipeStore(recipes_dir)
+        store.subscribe(index.on_change, index.on_changes)
+        store.refresh()
+        count = len(index)
+        table_path.parent.mkdir(parents=True, exist_ok=True)
+        index.save(table_path)
+        print(f"Wrote neighbours of {count} recipes to {table_path} "
+              f"({index.recomputed} rows recomputed, {time.perf_counter() - start:.1f} s)")
+    else:
+        print("Usage: python similarity.py build [recipes_dir] [table]")
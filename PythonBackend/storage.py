@@ -0,0 +1,573 @@
+"""
+Recipe Storage
+Backends the recipe store reads from and the API writes to.
+
+    JsonDirectoryBackend  one <id>.json file per recipe (the default)
+    SQLiteBackend         a single SQLite database in WAL mode, with the
+                          recipe/ingredient join table indexed for searches
+
+Both address recipes by filename ("<id>.json") and report a signature per
+recipe that changes whenever it is rewritten, which is how RecipeStore
+notices changes made by other processes.
+
+Writes go through create/update/delete, which check for the recipe and
+change it under one lock, or write_many() for bulk changes. A change is a
+(filename, recipe) pair, with recipe None for a deletion.
+
+Usage:
+    python storage.py import [recipes_dir] [database]
+    python storage.py export [database] [recipes_dir]
+    python storage.py search database item [item ...]
+    python storage.py bulk source_dir [recipes_dir]
+    python storage.py replay journal recipes_dir
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: writers are only serialized within one process
+    fcntl = None
+
+import metrics
+from ingredient_index import normalize_ingredient, recipe_ingredient_names
+from ingredient_vocab import NORMALIZATION_VERSION
+
+DEFAULT_DB_PATH = Path(__file__).parent / "data" / "recipes.db"
+
+# Changes journaled before the JSON backend flushes files and checkpoints
+CHECKPOINT_EVERY = 1000
+
+
+def _read_journal(journal_path):
+    """
+    Yield ("changes", entry id, [[filename, recipe], ...]),
+    ("applied", entry id, None) and ("checkpoint", None, None) entries.
+    A torn last line (a crash mid-append) is skipped: that write was never
+    acknowledged.
+    """
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("checkpoint"):
+                yield "checkpoint", None, None
+            elif "applied" in entry:
+                yield "applied", entry["applied"], None
+            else:
+                yield "changes", entry.get("entry"), entry["changes"]
+
+
+def _truncate_torn_line(journal_path):
+    """Cut off a torn last line so later appends start on a fresh line."""
+    with open(journal_path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 4096)
+            f.seek(start)
+            chunk = f.read(position - start)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            f.truncate(position)
+
+
+class JsonDirectoryBackend:
+    """
+    Recipes stored as individual JSON files in one directory.
+
+    Files are written to a temporary file and moved into place with
+    os.replace, so readers never see a half-written recipe. Writers hold an
+    exclusive lock on recipes_dir/.lock, so check-then-write sequences are
+    safe across threads and processes.
+
+    With journal=True every commit is first appended to
+    recipes_dir/.journal.ndjson and fsynced. Its files are then written and
+    fsynced, the directory is fsynced once for the renames and deletions,
+    and only then is an "applied" marker appended, so a marker never
+    reaches disk ahead of the changes it vouches for. On startup only
+    entries without a marker (a crash between the two) are replayed, so
+    edits made to the files since are never overwritten. Every
+    CHECKPOINT_EVERY changes the journal is rotated to .journal.ndjson.1,
+    so it never grows without bound.
+    """
+
+    kind = "json"
+
+    def __init__(self, recipes_dir, journal=True):
+        self.recipes_dir = Path(recipes_dir)
+        self.journal_path = self.recipes_dir / ".journal.ndjson" if journal else None
+        self.lock_path = self.recipes_dir / ".lock"
+        self._thread_lock = threading.Lock()
+        self._since_checkpoint = 0
+        if self.journal_path is not None and self.journal_path.exists():
+            self.recover()
+
+    @metrics.timed("directory_scan")
+    def scan(self):
+        """Return {filename: (mtime_ns, size)} for every JSON file on disk."""
+        signatures = {}
+        if not self.recipes_dir.exists():
+            return signatures
+        with os.scandir(self.recipes_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json") and entry.is_file():
+                    st = entry.stat()
+                    signatures[entry.name] = (st.st_mtime_ns, st.st_size)
+        return signatures
+
+    def signature(self, filename):
+        """Current signature of one file, or None if it doesn't exist."""
+        try:
+            st = os.stat(self.recipes_dir / filename)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    @metrics.timed("json_parse")
+    def read(self, filename):
+        recipe_file = self.recipes_dir / filename
+        metrics.record_file_parsed()
+        try:
+            with open(recipe_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            # Printed once per change instead of once per request
+            print(f"Error loading {recipe_file}: {e}")
+            return None
+
+    def exists(self, filename):
+        return (self.recipes_dir / filename).exists()
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            self.recipes_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _replace_file(self, filename, recipe, fsync):
+        recipe_file = self.recipes_dir / filename
+        # Not *.json, so a leftover temp file is never loaded as a recipe
+        tmp_file = self.recipes_dir / f".{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        # One write() call; json.dump would issue one per token
+        data = json.dumps(recipe, indent=2, ensure_ascii=False)
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(data)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_file, recipe_file)
+        except BaseException:
+            tmp_file.unlink(missing_ok=True)
+            raise
+
+    def _fsync_dir(self):
+        """Make renames and deletions in recipes_dir durable."""
+        if os.name == "nt":
+            # Directories can't be opened (or fsynced) on Windows
+            return
+        fd = os.open(self.recipes_dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _apply(self, changes, fsync):
+        for filename, recipe in changes:
+            if recipe is None:
+                (self.recipes_dir / filename).unlink(missing_ok=True)
+            else:
+                self._replace_file(filename, recipe, fsync)
+        if fsync:
+            self._fsync_dir()
+
+    def _mark_applied(self, entry_id):
+        # Not fsynced: a lost marker only means the entry is replayed
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"applied": entry_id}) + "\n")
+
+    def _commit(self, changes):
+        """Journal and apply changes; the caller holds the write lock."""
+        if self.journal_path is None:
+            self._apply(changes, fsync=True)
+            return
+        entry_id = uuid.uuid4().hex
+        entry = json.dumps({"entry": entry_id, "time": time.time(), "changes": changes},
+                           ensure_ascii=False)
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(entry + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        # The files must be on disk before the marker that says they are
+        self._apply(changes, fsync=True)
+        self._mark_applied(entry_id)
+        self._since_checkpoint += len(changes)
+        if self._since_checkpoint >= CHECKPOINT_EVERY:
+            self._checkpoint()
+
+    def _checkpoint(self):
+        """Start a new journal; every applied change is already on disk."""
+        if self.journal_path.exists():
+            os.replace(self.journal_path, self.journal_path.with_name(
+                self.journal_path.name + ".1"))
+            self._fsync_dir()
+        self._since_checkpoint = 0
+
+    def checkpoint(self):
+        """Rotate the journal so its entries are never replayed."""
+        if self.journal_path is not None:
+            with self._locked():
+                self._checkpoint()
+
+    def recover(self):
+        """Re-apply journaled changes that were never marked applied."""
+        with self._locked():
+            if not self.journal_path.exists():
+                return
+            _truncate_torn_line(self.journal_path)
+
+            entries = {}  # entry id -> changes, in journal order
+            for kind, entry_id, changes in _read_journal(self.journal_path):
+                if kind == "checkpoint":
+                    # Written by older versions: everything before is on disk
+                    entries = {}
+                elif kind == "applied":
+                    entries.pop(entry_id, None)
+                else:
+                    entries[entry_id if entry_id is not None else len(entries)] = changes
+            pending = [change for changes in entries.values() for change in changes]
+            if pending:
+                print(f"Replaying {len(pending)} journaled recipe changes "
+                      f"from {self.journal_path}")
+                self._apply(pending, fsync=True)
+            self._checkpoint()
+
+    def create(self, filename, recipe):
+        """Write a new recipe; raises FileExistsError if it already exists."""
+        with self._locked():
+            if self.exists(filename):
+                raise FileExistsError(filename)
+            self._commit([(filename, recipe)])
+
+    def update(self, filename, recipe):
+        """Overwrite a recipe; raises FileNotFoundError if it doesn't exist."""
+        with self._locked():
+            if not self.exists(filename):
+                raise FileNotFoundError(filename)
+            self._commit([(filename, recipe)])
+
+    def write(self, filename, recipe):
+        """Create or overwrite a recipe."""
+        self.write_many([(filename, recipe)])
+
+    def delete(self, filename):
+        """Delete a recipe; raises FileNotFoundError if it doesn't exist."""
+        with self._locked():
+            if not self.exists(filename):
+                raise FileNotFoundError(filename)
+            self._commit([(filename, None)])
+
+    def write_many(self, changes):
+        """Commit many changes under one lock, one journal entry and one
+        directory fsync."""
+        changes = [(filename, recipe) for filename, recipe in changes]
+        if changes:
+            with self._locked():
+                self._commit(changes)
+        return len(changes)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipes (
+    rowid INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL UNIQUE,
+    recipe_id TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recipes_by_id ON recipes (recipe_id);
+CREATE TABLE IF NOT EXISTS ingredients (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS recipe_ingredient (
+    ingredient_id INTEGER NOT NULL,
+    recipe_rowid INTEGER NOT NULL,
+    PRIMARY KEY (ingredient_id, recipe_rowid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS recipe_ingredient_by_recipe
+    ON recipe_ingredient (recipe_rowid);
+"""
+
+
+class SQLiteBackend:
+    """
+    Recipes stored in a SQLite database.
+
+    WAL mode lets readers keep going while a write commits. Every write
+    replaces the recipe's row, and AUTOINCREMENT never reuses a rowid, so
+    (rowid, body length) works as the change signature. scan() only reads
+    the table again once PRAGMA data_version (commits by other connections)
+    or the count of this backend's own writes has moved.
+    """
+
+    kind = "sqlite"
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()  # one connection per thread
+        self._writes = 0  # own commits, which data_version doesn't count
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self._renormalize_ingredients()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _renormalize_ingredients(self):
+        """
+        Rebuild the ingredient tables if they were written under another
+        ingredient_vocab.NORMALIZATION_VERSION (kept in PRAGMA user_version).
+        """
+        conn = self._connect()
+        if conn.execute("PRAGMA user_version").fetchone()[0] == NORMALIZATION_VERSION:
+            return
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM recipe_ingredient")
+            conn.execute("DELETE FROM ingredients")
+            for rowid, body in conn.execute("SELECT rowid, body FROM recipes").fetchall():
+                self._insert_ingredients(conn, rowid, json.loads(body))
+            conn.execute(f"PRAGMA user_version = {int(NORMALIZATION_VERSION)}")
+
+    @metrics.timed("sqlite_scan")
+    def scan(self):
+        """
+        Return {filename: (rowid, body length)} for every recipe.
+
+        The same dict is returned again while nothing has been committed.
+        """
+        conn = self._connect()
+        version = (conn.execute("PRAGMA data_version").fetchone()[0], self._writes)
+        cached = getattr(self._local, "scan", None)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        rows = conn.execute("SELECT filename, rowid, length(body) FROM recipes")
+        listing = {filename: (rowid, size) for filename, rowid, size in rows}
+        self._local.scan = (version, listing)
+        return listing
+
+    def signature(self, filename):
+        row = self._connect().execute(
+            "SELECT rowid, length(body) FROM recipes WHERE filename = ?",
+            (filename,)).fetchone()
+        return tuple(row) if row else None
+
+    @metrics.timed("json_parse")
+    def read(self, filename):
+        row = self._connect().execute(
+            "SELECT body FROM recipes WHERE filename = ?", (filename,)).fetchone()
+        if row is None:
+            return None
+        metrics.record_file_parsed()
+        try:
+            return json.loads(row[0])
+        except ValueError as e:
+            print(f"Error loading {filename} from {self.db_path}: {e}")
+            return None
+
+    def exists(self, filename):
+        return self._connect().execute(
+            "SELECT 1 FROM recipes WHERE filename = ?", (filename,)).fetchone() is not None
+
+    def _delete_row(self, conn, filename):
+        row = conn.execute("SELECT rowid FROM recipes WHERE filename = ?",
+                           (filename,)).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM recipe_ingredient WHERE recipe_rowid = ?", row)
+            conn.execute("DELETE FROM recipes WHERE rowid = ?", row)
+        return row is not None
+
+    def _insert_row(self, conn, filename, recipe):
+        body = json.dumps(recipe, ensure_ascii=False)
+        rowid = conn.execute(
+            "INSERT INTO recipes (filename, recipe_id, body) VALUES (?, ?, ?)",
+            (filename, str(recipe.get("id")), body)).lastrowid
+        self._insert_ingredients(conn, rowid, recipe)
+
+    def _insert_ingredients(self, conn, rowid, recipe):
+        for name in recipe_ingredient_names(recipe):
+            conn.execute("INSERT OR IGNORE INTO ingredients (name) VALUES (?)", (name,))
+            conn.execute(
+                "INSERT INTO recipe_ingredient (ingredient_id, recipe_rowid) "
+                "SELECT id, ? FROM ingredients WHERE name = ?", (rowid, name))
+
+    def create(self, filename, recipe):
+        conn = self._connect()
+        with conn:
+            # BEGIN IMMEDIATE takes the write lock before the existence check
+            conn.execute("BEGIN IMMEDIATE")
+            if self.exists(filename):
+                raise FileExistsError(filename)
+            self._insert_row(conn, filename, recipe)
+        self._writes += 1
+
+    def update(self, filename, recipe):
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if not self._delete_row(conn, filename):
+                raise FileNotFoundError(filename)
+            self._insert_row(conn, filename, recipe)
+        self._writes += 1
+
+    def write(self, filename, recipe):
+        self.write_many([(filename, recipe)])
+
+    def delete(self, filename):
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if not self._delete_row(conn, filename):
+                raise FileNotFoundError(filename)
+        self._writes += 1
+
+    def write_many(self, changes):
+        """Commit many changes in a single transaction."""
+        conn = self._connect()
+        count = 0
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for filename, recipe in changes:
+                self._delete_row(conn, filename)
+                if recipe is not None:
+                    self._insert_row(conn, filename, recipe)
+                count += 1
+        self._writes += 1
+        return count
+
+    def match(self, all_of, none_of=()):
+        """
+        Recipes containing every ingredient in all_of and none in none_of,
+        answered from the recipe_ingredient index without loading the rest.
+        """
+        all_names = sorted({normalize_ingredient(item) for item in all_of})
+        none_names = sorted({normalize_ingredient(item) for item in none_of})
+        sql = "SELECT body FROM recipes r WHERE 1"
+        params = []
+        if all_names:
+            sql += (" AND r.rowid IN (SELECT ri.recipe_rowid FROM recipe_ingredient ri"
+                    " JOIN ingredients i ON i.id = ri.ingredient_id"
+                    f" WHERE i.name IN ({','.join('?' * len(all_names))})"
+                    " GROUP BY ri.recipe_rowid HAVING COUNT(*) = ?)")
+            params += all_names + [len(all_names)]
+        if none_names:
+            sql += (" AND r.rowid NOT IN (SELECT ri.recipe_rowid FROM recipe_ingredient ri"
+                    " JOIN ingredients i ON i.id = ri.ingredient_id"
+                    f" WHERE i.name IN ({','.join('?' * len(none_names))}))")
+            params += none_names
+        rows = self._connect().execute(sql + " ORDER BY r.filename", params)
+        return [json.loads(body) for body, in rows]
+
+    def import_dir(self, recipes_dir):
+        """Copy every recipes_dir/*.json file into the database."""
+        return self.write_many(iter_dir(recipes_dir))
+
+    def export_dir(self, recipes_dir):
+        """Write every recipe in the database out as recipes_dir/<filename>."""
+        target = JsonDirectoryBackend(recipes_dir)
+        target.recipes_dir.mkdir(parents=True, exist_ok=True)
+        rows = self._connect().execute("SELECT filename, body FROM recipes ORDER BY filename")
+        return target.write_many((filename, json.loads(body)) for filename, body in rows)
+
+
+def iter_dir(recipes_dir):
+    """Yield (filename, recipe) for every readable recipes_dir/*.json file."""
+    source = JsonDirectoryBackend(recipes_dir, journal=False)
+    for filename in sorted(source.scan()):
+        recipe = source.read(filename)
+        if recipe is not None:
+            yield filename, recipe
+
+
+def replay_journal(journal_path, recipes_dir):
+    """Apply every change in a journal, in order, to recipes_dir."""
+    target = JsonDirectoryBackend(recipes_dir, journal=False)
+    target.recipes_dir.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for kind, _, changes in _read_journal(journal_path):
+        if kind == "changes":
+            count += target.write_many(changes)
+    return count
+
+
+def open_backend(kind, recipes_dir, db_path=DEFAULT_DB_PATH):
+    """Return the backend named kind ("json" or "sqlite")."""
+    if kind == "json":
+        return JsonDirectoryBackend(recipes_dir)
+    if kind == "sqlite":
+        return SQLiteBackend(db_path)
+    raise ValueError(f"Unknown recipe storage backend: {kind}")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    recipes_default = Path(__file__).parent / "recipes"
+
+    if command == "import":
+        recipes_dir = sys.argv[2] if len(sys.argv) > 2 else recipes_default
+        db_path = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_DB_PATH
+        count = SQLiteBackend(db_path).import_dir(recipes_dir)
+        print(f"Imported {count} recipes into {db_path}")
+    elif command == "export":
+        db_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DB_PATH
+        recipes_dir = sys.argv[3] if len(sys.argv) > 3 else recipes_default
+        count = SQLiteBackend(db_path).export_dir(recipes_dir)
+        print(f"Exported {count} recipes to {recipes_dir}")
+    elif command == "search" and len(sys.argv) > 3:
+        for recipe in SQLiteBackend(sys.argv[2]).match(sys.argv[3:]):
+            print(f"{recipe.get('id')}: {recipe.get('name')}")
+    elif command == "bulk" and len(sys.argv) > 2:
+        # Nightly imports: the whole batch is committed as one journal entry
+        recipes_dir = sys.argv[3] if len(sys.argv) > 3 else recipes_default
+        count = JsonDirectoryBackend(recipes_dir).write_many(iter_dir(sys.argv[2]))
+        print(f"Wrote {count} recipes to {recipes_dir}")
+    elif command == "replay" and len(sys.argv) > 3:
+        count = replay_journal(sys.argv[2], sys.argv[3])
+        print(f"Replayed {count} changes into {sys.argv[3]}")
+    else:
+        print("Usage: python storage.py import [recipes_dir] [database]")
+        print("       python storage.py export [database] [recipes_dir]")
+        print("       python storage.py search database item [item ...]")
+        print("       python storage.py bulk source_dir [recipes_dir]")
+        print("       python storage.py replay journal recipes_dir")
@@ -0,0 +1,495 @@
+"""
+Tests for the Flask API in app.py, run against a generated catalog.
+Run with: python -m pytest test_app.py
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+
+import pytest
+
+from benchmarks.catalog import write_catalog
+from recipe_model import Recipe
+
+RECIPE_COUNT = 30
+
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("app")
+    write_catalog(tmp / "recipes", RECIPE_COUNT)
+    settings = {
+        "RECIPES_DIR": tmp / "recipes",
+        "RECIPE_PACK": tmp / "catalog.pack",
+        "RECIPE_SIMILARITY": tmp / "similarity.npz",
+        "RECIPE_IMAGES_DIR": tmp / "images",
+        "RECIPE_IMAGE_CACHE": tmp / "image_cache",
+    }
+    saved = {name: os.environ.get(name) for name in settings}
+    os.environ.update({name: str(value) for name, value in settings.items()})
+    try:
+        import app
+        yield app
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def stored_recipes(app_module):
+    """id -> recipe as written in the catalog's JSON files."""
+    recipes = (json.loads(path.read_text()) for path in app_module.RECIPES_DIR.glob("*.json"))
+    return {recipe["id"]: recipe for recipe in recipes}
+
+
+def test_recipes_are_sent_as_their_json(app_module, client):
+    assert all(isinstance(recipe, Recipe) for recipe in app_module.recipe_store.all())
+    stored = stored_recipes(app_module)
+
+    listed = client.get("/api/recipes").get_json()
+    assert {recipe["id"]: recipe for recipe in listed} == stored
+    exported = ndjson(client.get("/api/recipes/export"))
+    assert {recipe["id"]: recipe for recipe in exported} == stored
+    assert client.get("/api/recipes/recipe_3").get_json() == stored["recipe_3"]
+
+    found = client.post("/api/recipes/search", json={"items": ["salt"]}).get_json()
+    assert found["count"] > 0
+    assert all(recipe == stored[recipe["id"]] for recipe in found["recipes"])
+    fields = client.get("/api/recipes?fields=id,time&limit=2").get_json()["recipes"]
+    assert fields == [{"id": recipe["id"], "time": stored[recipe["id"]]["time"]}
+                      for recipe in fields]
+
+
+def test_display_batch_with_no_ids_renders_nothing(client):
+    response = client.post("/api/recipes/display/batch", json={"ids": [], "formats": ["card"]})
+    assert response.status_code == 200
+    assert ndjson(response) == []
+
+
+def test_display_batch_without_ids_renders_every_recipe(client):
+    response = client.post("/api/recipes/display/batch", json={"formats": ["card"]})
+    assert len(ndjson(response)) == RECIPE_COUNT
+
+
+@pytest.mark.parametrize("body", [{"formats": [["card"]]}, {"formats": ["nope"]},
+                                  {"formats": "card"}, ["card"]])
+def test_display_batch_rejects_malformed_bodies(client, body):
+    response = client.post("/api/recipes/display/batch", json=body)
+    assert response.status_code == 400
+
+
+def test_display_batch_reports_missing_ids(client):
+    body = {"ids": ["recipe_1", "nope"], "formats": ["card"]}
+    lines = ndjson(client.post("/api/recipes/display/batch", json=body))
+    assert lines[-1] == {"missing": ["nope"]}
+    text = client.post("/api/recipes/display/batch", json=dict(body, output="text"))
+    assert text.get_data(as_text=True).endswith("\nNot found: nope\n")
+
+
+def test_display_all_formats_renders_once_and_caches(app_module, client, monkeypatch):
+    from recipe_display import render_formats
+
+    calls = []
+    monkeypatch.setattr(app_module, "render_formats",
+                        lambda recipe, formats: calls.append(formats) or render_formats(recipe, formats))
+    app_module.display_cache.invalidate("recipe_4")
+    first = client.get("/api/recipes/recipe_4/display").get_json()
+    assert first["formats"] == render_formats(app_module.recipe_store.get_by_id("recipe_4"))
+    assert len(calls) == 1
+    # Each format went into the display cache the single-format endpoints use
+    recipe, content_hash = app_module.recipe_store.get_with_hash("recipe_4")
+    cached = app_module.display_cache.get_or_render_formats(recipe, content_hash, ["card", "full"],
+                                                            None)
+    assert cached == {name: first["formats"][name] for name in ("card", "full")}
+
+
+def test_search_batch(client):
+    response = client.post("/api/recipes/search/batch",
+                           json={"queries": [["salt"], {"items": ["salt"], "exclude": ["egg"]}]})
+    assert response.status_code == 200
+    everything, without_egg = response.get_json()["results"]
+    assert 0 < without_egg["count"] <= everything["count"]
+
+
+@pytest.mark.parametrize("query", ["flour", 3, None, {"items": "flour"}, [["salt"]],
+                                   {"items": ["salt"], "exclude": [{"egg": 1}]}])
+def test_search_batch_rejects_malformed_queries(client, query):
+    response = client.post("/api/recipes/search/batch", json={"queries": [["salt"], query]})
+    assert response.status_code == 400
+    assert "queries[1]" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("path", ["/api/recipes/search", "/api/recipes/search/batch"])
+@pytest.mark.parametrize("body", [["salt"], "salt", 3])
+def test_search_rejects_bodies_that_are_not_objects(client, path, body):
+    response = client.post(path, json=body)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Request body must be a JSON object"
+
+
+@pytest.mark.parametrize("body", [{"items": [["salt"]]}, {"items": "salt"},
+                                  {"items": ["salt"], "exclude": [None]},
+                                  {"items": [["salt"]], "mode": "ranked"},
+                                  {"items": ["salt"], "sort": ["total"]}])
+def test_search_rejects_malformed_items(client, body):
+    response = client.post("/api/recipes/search", json=body)
+    assert response.status_code == 400
+
+
+def test_ranked_search(client):
+    response = client.post("/api/recipes/search",
+                           json={"items": ["salt", "egg"], "mode": "ranked", "limit": "3"})
+    assert response.status_code == 200
+    assert response.get_json()["count"] == 3
+
+
+@pytest.mark.parametrize("limit", [0, -1, "abc", 2.5, True, None, [3]])
+def test_ranked_search_rejects_bad_limits(client, limit):
+    response = client.post("/api/recipes/search",
+                           json={"items": ["salt"], "mode": "ranked", "limit": limit})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "limit must be a positive integer"
+
+
+def walk_pages(client, query):
+    """Follow next_cursor from the first page; returns every page's body."""
+    pages = [client.get(f"/api/recipes?{query}").get_json()]
+    while pages[-1]["next_cursor"] is not None:
+        pages.append(client.get(
+            f"/api/recipes?{query}&cursor={pages[-1]['next_cursor']}").get_json())
+    return pages
+
+
+def test_cursor_pagination_visits_every_recipe_once(app_module, client):
+    pages = walk_pages(client, "limit=7")
+    assert [page["count"] for page in pages] == [7, 7, 7, 7, 2]
+    ids = [recipe["id"] for page in pages for recipe in page["recipes"]]
+    expected = sorted(stored_recipes(app_module).items(), key=lambda item: f"{item[0]}.json")
+    assert ids == [recipe_id for recipe_id, _ in expected]
+
+
+def test_cursor_pagination_with_filters_and_fields(client):
+    everything = client.get("/api/recipes?sort=-servings&max_total=90").get_json()
+    assert 0 < len(everything) < RECIPE_COUNT
+    pages = walk_pages(client, "sort=-servings&max_total=90&limit=4&fields=id,servings")
+    recipes = [recipe for page in pages for recipe in page["recipes"]]
+    assert recipes == [{"id": recipe["id"], "servings": recipe["servings"]}
+                       for recipe in everything]
+
+    streamed = ndjson(client.get("/api/recipes?format=ndjson&sort=-servings&max_total=90"
+                                 f"&cursor={pages[0]['next_cursor']}"))
+    assert streamed == everything[4:]
+
+
+def test_cursor_of_a_missing_recipe_continues_after_its_name(app_module, client):
+    # A cursor stays usable after its recipe is deleted
+    cursor = app_module.encode_cursor("recipe_10.json~")
+    page = client.get(f"/api/recipes?limit=2&cursor={cursor}").get_json()
+    assert [recipe["id"] for recipe in page["recipes"]] == ["recipe_11", "recipe_12"]
+
+
+@pytest.mark.parametrize("query", ["cursor=!!!", "cursor=cmVj%3Fw", "cursor=%3D%3D%3D%3D",
+                                   "limit=5&sort=prep&cursor=bm90LWEtZmlsZQ==",
+                                   "sort=name", "min_prep=soon"])
+def test_bad_cursors_and_filters_are_rejected(client, query):
+    response = client.get(f"/api/recipes?{query}")
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+@pytest.mark.parametrize("query", ["limit=abc", "limit=0", "limit=-3", "limit=2.5",
+                                   "limit=&fields=id"])
+def test_bad_limits_are_rejected_by_both_servers(app_module, client, query):
+    response = client.get(f"/api/recipes?{query}")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "limit must be a positive integer"}
+    status, _, body = asgi_get(app_module, f"/api/recipes?{query}")
+    assert status == 400 and json.loads(body) == response.get_json()
+
+
+def test_suggest(client):
+    response = client.get("/api/ingredients/suggest?q=Eggs&limit=1")
+    assert [suggestion["name"] for suggestion in response.get_json()["suggestions"]] == ["egg"]
+    for query in ("q=to&limit=abc", "q=to&limit=0", "limit=3"):
+        assert client.get(f"/api/ingredients/suggest?{query}").status_code == 400
+
+
+def test_similar_is_built_before_the_first_request(app_module, client):
+    app_module.build_indexes()
+    recomputed = app_module.similarity_index.recomputed
+    response = client.get("/api/recipes/recipe_2/similar?limit=3")
+    assert response.status_code == 200 and response.get_json()["count"] <= 3
+    assert app_module.similarity_index.recomputed == recomputed
+    assert client.get("/api/recipes/recipe_2/similar?limit=x").status_code == 400
+    assert client.get("/api/recipes/nope/similar").status_code == 404
+
+
+def test_recipe_etag_answers_304_until_the_recipe_changes(app_module, client):
+    original = stored_recipes(app_module)["recipe_5"]
+    first = client.get("/api/recipes/recipe_5")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "no-cache"
+
+    again = client.get("/api/recipes/recipe_5", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.get_data() == b""
+    assert again.headers["ETag"] == etag
+
+    list_etag = client.get("/api/recipes").headers["ETag"]
+    client.put("/api/recipes/recipe_5", json=dict(original, name="Renamed"))
+    try:
+        changed = client.get("/api/recipes/recipe_5", headers={"If-None-Match": etag})
+        assert changed.status_code == 200 and changed.get_json()["name"] == "Renamed"
+        assert changed.headers["ETag"] != etag
+        assert client.get("/api/recipes", headers={"If-None-Match": list_etag}).status_code == 200
+    finally:
+        client.put("/api/recipes/recipe_5", json=original)
+    # The ETag is a hash of the content, so the same content gets it back
+    assert client.get("/api/recipes/recipe_5").headers["ETag"] == etag
+
+
+@pytest.mark.parametrize("encoding", ["identity", "gzip"])
+def test_weak_if_none_match_answers_304(app_module, client, encoding):
+    headers = {"Accept-Encoding": encoding}
+    etag = client.get("/api/recipes", headers=headers).headers["ETag"]
+    for if_none_match in (f"W/{etag}", f'"other", W/{etag}', "*"):
+        response = client.get("/api/recipes",
+                              headers=dict(headers, **{"If-None-Match": if_none_match}))
+        assert response.status_code == 304, if_none_match
+        status, _, _ = asgi_get(app_module, "/api/recipes",
+                                headers=[("Accept-Encoding", encoding),
+                                         ("If-None-Match", if_none_match)])
+        assert status == 304, if_none_match
+
+
+def test_display_etag(client):
+    first = client.get("/api/recipes/recipe_2/display/card")
+    again = client.get("/api/recipes/recipe_2/display/card",
+                       headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    other = client.get("/api/recipes/recipe_2/display/full",
+                       headers={"If-None-Match": first.headers["ETag"]})
+    assert other.status_code == 200
+
+
+def test_gzip_responses_have_their_own_etag(client):
+    plain = client.get("/api/recipes")
+    zipped = client.get("/api/recipes", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert zipped.headers["ETag"] == plain.headers["ETag"][:-1] + '-gz"'
+    assert "Accept-Encoding" in zipped.headers["Vary"]
+    assert json.loads(gzip.decompress(zipped.get_data())) == plain.get_json()
+
+    # Either validator is enough for a 304, which names the variant the client accepts
+    for etag in (plain.headers["ETag"], zipped.headers["ETag"]):
+        revalidated = client.get("/api/recipes", headers={"Accept-Encoding": "gzip",
+                                                          "If-None-Match": etag})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["ETag"] == zipped.headers["ETag"]
+
+    # Small bodies aren't worth compressing
+    small = client.get("/api/recipes?fields=id&limit=1", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+    assert not small.headers["ETag"].endswith('-gz"')
+
+
+def asgi_request(app_module, method, path, headers=(), body=b""):
+    """(status, headers, body messages) of a request sent straight to asgi_app.app."""
+    import asgi_app
+    path, _, query = path.partition("?")
+    scope = {"type": "http", "method": method, "path": path, "query_string": query.encode(),
+             "headers": [(name.lower().encode(), value.encode()) for name, value in headers]}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app.app(scope, receive, send))
+    start = sent[0]
+    return (start["status"], {k.decode(): v.decode() for k, v in start["headers"]},
+            [message.get("body", b"") for message in sent[1:]])
+
+
+def asgi_get(app_module, path, headers=()):
+    """(status, headers, body) of a GET sent straight to asgi_app.app."""
+    status, headers, chunks = asgi_request(app_module, "GET", path, headers)
+    return status, headers, b"".join(chunks)
+
+
+def test_asgi_app_sends_the_same_etags_and_bytes(app_module, client):
+    for path in ("/api/recipes/recipe_7", "/api/recipes?limit=3", "/api/recipes",
+                 "/api/recipes/recipe_7/display", "/api/recipes/recipe_7/display/card",
+                 "/api/recipes?type=main&sort=-total&fields=id,time"):
+        flask_response = client.get(path)
+        status, headers, body = asgi_get(app_module, path)
+        assert status == 200 and headers["etag"] == flask_response.headers["ETag"]
+        assert body == flask_response.get_data()
+        status, headers, body = asgi_get(app_module, path, [("If-None-Match", headers["etag"])])
+        assert status == 304 and body == b""
+
+
+def test_asgi_app_compresses_like_flask(app_module, client):
+    gzip_headers = [("Accept-Encoding", "gzip")]
+    for path in ("/api/recipes", "/api/recipes?fields=id&limit=1"):
+        flask_response = client.get(path, headers=dict(gzip_headers))
+        status, headers, body = asgi_get(app_module, path, gzip_headers)
+        assert headers["etag"] == flask_response.headers["ETag"]
+        assert headers.get("content-encoding") == flask_response.headers.get("Content-Encoding")
+        assert body == flask_response.get_data()
+        status, _, _ = asgi_get(app_module, path, gzip_headers + [("If-None-Match", headers["etag"])])
+        assert status == 304
+
+
+def test_asgi_app_streams_ndjson_a_page_at_a_time(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "MAX_PAGE_SIZE", 7)
+    expected = ndjson(client.get("/api/recipes?format=ndjson"))
+    status, headers, chunks = asgi_request(app_module, "GET", "/api/recipes?format=ndjson")
+    assert status == 200 and headers["content-type"] == "application/x-ndjson"
+    # One chunk per page of 7, then the end of the body
+    assert len(chunks) == -(-RECIPE_COUNT // 7) + 1 and chunks[-1] == b""
+    assert [json.loads(line) for line in b"".join(chunks).splitlines()] == expected
+
+
+@pytest.mark.parametrize("body", [b"[1, 2]", b'"salt"', b"{not json"])
+def test_asgi_search_rejects_malformed_bodies(app_module, body):
+    status, _, chunks = asgi_request(app_module, "POST", "/api/recipes/search", body=body)
+    assert status == 400 and "error" in json.loads(b"".join(chunks))
+
+
+def test_asgi_app_reports_unexpected_errors_as_json(app_module, monkeypatch):
+    import asgi_app
+
+    def fail(req):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(asgi_app, "list_recipes", fail)
+    status, _, body = asgi_get(app_module, "/api/recipes")
+    assert status == 500 and json.loads(body) == {"error": "Internal server error"}
+
+
+def test_search_coalescer_shares_concurrent_identical_runs():
+    import threading
+
+    from asgi_app import SearchCoalescer
+
+    coalescer = SearchCoalescer()
+    release = threading.Event()
+    calls = []
+
+    def work(value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    async def scenario():
+        first = asyncio.ensure_future(coalescer.run("key", work, 21))
+        second = asyncio.ensure_future(coalescer.run("key", work, 21))
+        other = asyncio.ensure_future(coalescer.run("other", work, 1))
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(first, second, other)
+        # Nothing is kept once a run finishes
+        again = await coalescer.run("key", work, 21)
+        return results, again
+
+    results, again = asyncio.run(scenario())
+    assert results == [42, 42, 2] and again == 42
+    assert sorted(calls) == [1, 21, 21]
+    assert (coalescer.started, coalescer.coalesced) == (3, 1)
+
+
+def test_bulk_import_reports_bad_lines_and_writes_the_rest(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "BULK_BATCH_SIZE", 2)
+    lines = [
+        json.dumps({"id": "bulk_1", "ingredients": ["egg"]}),
+        "",
+        "{not json",
+        json.dumps(["a", "list"]),
+        json.dumps({"name": "no id"}),
+        json.dumps({"id": True}),
+        json.dumps({"id": "../escape"}),
+        json.dumps({"id": "bulk_2", "ingredients": "egg"}),
+        json.dumps({"id": "bulk_2", "ingredients": {"egg": {"amount": 1, "unit": None}}}),
+        json.dumps({"id": 3001}),
+    ]
+    body = "\n".join(lines).encode() + b"\n\xff\xfe\n"
+    try:
+        result = client.post("/api/recipes/bulk", data=body,
+                             content_type="application/x-ndjson").get_json()
+        assert result["written"] == 3 and result["batches"] == 2
+        assert result["error_count"] == 7
+        assert [error["line"] for error in result["errors"]] == [3, 4, 5, 6, 7, 8, 11]
+        errors = {error["line"]: error["error"] for error in result["errors"]}
+        assert errors[3].startswith("Invalid JSON")
+        assert errors[4] == "Record is not a JSON object"
+        assert errors[5] == errors[6] == "Recipe ID is required"
+        assert "path separators" in errors[7]
+        assert errors[8] == "ingredients must be an object or a list"
+        assert errors[11].startswith("Invalid JSON")
+
+        assert client.get("/api/recipes/bulk_2").get_json()["ingredients"] == {
+            "egg": {"amount": 1, "unit": None}}
+        found = client.post("/api/recipes/search", json={"items": ["egg"]}).get_json()
+        assert {"bulk_1", "bulk_2"} <= {recipe["id"] for recipe in found["recipes"]}
+    finally:
+        for recipe_id in ("bulk_1", "bulk_2", 3001):
+            client.delete(f"/api/recipes/{recipe_id}")
+    assert client.get("/api/recipes/bulk_1").status_code == 404
+
+
+def test_bulk_import_caps_the_errors_it_lists(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "MAX_BULK_ERRORS", 2)
+    result = client.post("/api/recipes/bulk", data=b"[]\n" * 5).get_json()
+    assert result["written"] == 0 and result["error_count"] == 5
+    assert [error["line"] for error in result["errors"]] == [1, 2]
+
+
+def test_export_imports_back_unchanged(app_module, client):
+    before = client.get("/api/recipes").get_json()
+    exported = client.get("/api/recipes/export")
+    assert "attachment" in exported.headers["Content-Disposition"]
+    result = client.post("/api/recipes/bulk", data=exported.get_data()).get_json()
+    assert result["written"] == RECIPE_COUNT and result["error_count"] == 0
+    assert client.get("/api/recipes").get_json() == before
+
+
+def test_reload_serves_from_the_new_snapshot(app_module, client, monkeypatch):
+    import serve
+    from catalog_pack import PackedRecord
+
+    monkeypatch.setattr(serve, "RECIPES_DIR", app_module.RECIPES_DIR)
+    supervisor = serve.Supervisor(argparse.Namespace(snapshot=app_module.PACK_PATH))
+    supervisor.storage, supervisor.app = app_module.storage, app_module
+    store = app_module.recipe_store
+    original = stored_recipes(app_module)["recipe_5"]
+    filename = store.filename_for_id("recipe_5")
+    try:
+        supervisor.reload()
+        first_pack = store._pack
+        unchanged = store._recipes[store.filename_for_id("recipe_6")]
+        assert isinstance(unchanged, PackedRecord) and unchanged.catalog is first_pack
+
+        client.put("/api/recipes/recipe_5", json=dict(original, name="Edited"))
+        supervisor.reload()
+        assert store._pack is not first_pack
+        edited = store._recipes[filename]
+        assert isinstance(edited, PackedRecord) and edited.catalog is store._pack
+        assert unchanged.catalog is store._pack
+        assert client.get("/api/recipes/recipe_5").get_json()["name"] == "Edited"
+    finally:
+        client.put("/api/recipes/recipe_5", json=original)
@@ -0,0 +1,49 @@
+"""
+Tests for the benchmarks package: synthetic catalogs and the suite.
+Run with: python -m pytest test_benchmarks.py
+"""
+
+import json
+
+from benchmarks.catalog import INGREDIENTS, generate_catalog, write_catalog
+from benchmarks.suite import compare, run_size, summarize
+from recipe_model import Recipe
+
+
+def test_same_seed_gives_the_same_catalog():
+    first = list(generate_catalog(50, seed=7))
+    assert first == list(generate_catalog(50, seed=7))
+    assert first != list(generate_catalog(50, seed=8))
+    assert [recipe["id"] for recipe in first] == [f"recipe_{i}" for i in range(50)]
+
+
+def test_recipes_use_both_schemas_and_round_trip():
+    recipes = list(generate_catalog(200))
+    legacy = [recipe for recipe in recipes if isinstance(recipe["ingredients"], list)]
+    assert 0 < len(legacy) < len(recipes)
+    assert all(set(recipe["ingredients"]) <= set(INGREDIENTS) for recipe in recipes)
+    assert all(Recipe.from_dict(recipe).to_dict() == recipe for recipe in recipes)
+
+
+def test_write_catalog(tmp_path):
+    write_catalog(tmp_path / "recipes", 5)
+    files = sorted(path.name for path in (tmp_path / "recipes").glob("*.json"))
+    assert files == [f"recipe_{i}.json" for i in range(5)]
+    written = json.loads((tmp_path / "recipes" / "recipe_3.json").read_text())
+    assert written == list(generate_catalog(5))[3]
+
+
+def test_summarize_and_compare():
+    summary = summarize([0.001 * i for i in range(1, 101)], 2.0)
+    assert (summary["n"], summary["p50_ms"], summary["max_ms"]) == (100, 51.0, 100.0)
+    assert summary["ops_per_sec"] == 50.0
+
+    baseline = {"runs": [{"size": 10, "results": {"a": {"p50_ms": 1.0}, "b": {"p50_ms": 1.0}}}]}
+    report = {"runs": [{"size": 10, "results": {"a": {"p50_ms": 1.1}, "b": {"p50_ms": 1.5}}}]}
+    assert compare(report, baseline, threshold=0.2) == 1
+
+
+def test_suite_runs_end_to_end():
+    results = run_size(20, iterations=2)
+    assert {"store.cold_load", "api.search", "api.create", "api.delete"} <= set(results)
+    assert all(result["n"] >= 1 for result in results.values())
@@ -0,0 +1,51 @@
+"""
+Tests for catalog_pack.py: compiling and reading packed catalogs.
+Run with: python -m pytest test_catalog_pack.py
+"""
+
+import json
+
+import pytest
+
+from catalog_pack import compile_catalog, open_pack
+
+
+@pytest.fixture
+def pack(tmp_path):
+    recipes_dir = tmp_path / "recipes"
+    recipes_dir.mkdir()
+    recipes = {
+        "text.json": {"id": "pasta", "ingredients": {"Tomatoes": {}, "basil": {}}},
+        "int.json": {"id": 7, "ingredients": ["tomato", "egg"]},
+        "bool.json": {"id": True, "ingredients": ["egg"]},
+        "float.json": {"id": 1.5, "ingredients": []},
+        "null.json": {"id": None, "ingredients": []},
+        "list.json": ["not", "a", "recipe"],
+    }
+    for filename, recipe in recipes.items():
+        (recipes_dir / filename).write_text(json.dumps(recipe))
+    compile_catalog(recipes_dir, tmp_path / "catalog.pack")
+    pack = open_pack(tmp_path / "catalog.pack")
+    yield pack
+    pack.close()
+
+
+@pytest.mark.parametrize("filename, recipe_id", [
+    ("text.json", "pasta"), ("int.json", 7), ("bool.json", True),
+    ("float.json", 1.5), ("null.json", None),
+])
+def test_ids_keep_their_json_type(pack, filename, recipe_id):
+    record = pack.record(pack.find_file(filename))
+    assert record.get("id") == recipe_id
+    assert type(record.get("id")) is type(recipe_id)
+    assert record.recipe().id == recipe_id
+
+
+def test_ingredient_names_are_canonical(pack):
+    assert pack.ingredient_names(pack.find_file("text.json")) == {"tomato", "basil"}
+    assert pack.ingredient_names(pack.find_file("int.json")) == {"tomato", "egg"}
+
+
+def test_files_that_are_not_recipes_are_skipped(pack):
+    assert pack.find_file("list.json") is None
+    assert len(pack) == 5
@@ -0,0 +1,67 @@
+"""
+Tests for display_cache.py: content-hash keys, invalidation and eviction.
+Run with: python -m pytest test_display_cache.py
+"""
+
+from display_cache import DisplayCache
+from recipe_display import render_formats
+
+RECIPE = {"id": "pasta", "name": "Pasta", "ingredients": {"tomato": {"amount": 2, "unit": "cups"}}}
+
+
+class Renderer:
+    """A render function that counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, recipe):
+        self.calls += 1
+        return f"{recipe['name']} #{self.calls}"
+
+
+def test_renders_once_per_content_hash():
+    cache, render = DisplayCache(), Renderer()
+    assert cache.get_or_render(RECIPE, "h1", "card", render) == "Pasta #1"
+    assert cache.get_or_render(RECIPE, "h1", "card", render) == "Pasta #1"
+    # An edited recipe has a new hash, so it can't get the stale text
+    assert cache.get_or_render(RECIPE, "h2", "card", render) == "Pasta #2"
+    assert cache.get_or_render(RECIPE, "h1", "full", render) == "Pasta #3"
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_store_changes_drop_every_format_of_the_recipe():
+    cache, render = DisplayCache(), Renderer()
+    cache.get_or_render(RECIPE, "h1", "card", render)
+    cache.get_or_render(RECIPE, "h1", "full", render)
+    cache.get_or_render({"id": "other", "name": "Other"}, "h1", "card", render)
+
+    cache.on_change("pasta.json", RECIPE, None)
+    assert cache.stats()["size"] == 1
+    assert cache.get_or_render(RECIPE, "h1", "card", render) == "Pasta #4"
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache, render = DisplayCache(maxsize=2), Renderer()
+    for display_format in ("card", "full", "card", "simple"):
+        cache.get_or_render(RECIPE, "h1", display_format, render)
+    # "full" was the least recently used when "simple" came in
+    assert cache.evictions == 1
+    assert cache.get_or_render(RECIPE, "h1", "card", render) == "Pasta #1"
+    assert cache.get_or_render(RECIPE, "h1", "full", render) == "Pasta #4"
+
+
+def test_formats_are_rendered_together_and_cached_one_by_one():
+    cache, calls = DisplayCache(), []
+
+    def render_many(recipe, formats):
+        calls.append(list(formats))
+        return render_formats(recipe, formats)
+
+    cache.get_or_render(RECIPE, "h1", "card", lambda recipe: "cached card")
+    texts = cache.get_or_render_formats(RECIPE, "h1", ["card", "full", "simple"], render_many)
+    assert calls == [["full", "simple"]]
+    assert texts == dict(render_formats(RECIPE, ["full", "simple"]), card="cached card")
+    assert list(texts) == ["card", "full", "simple"]
+    cache.get_or_render_formats(RECIPE, "h1", ["full", "simple"], render_many)
+    assert len(calls) == 1
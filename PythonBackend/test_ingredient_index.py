@@ -0,0 +1,71 @@
+"""
+Tests for ingredient_index.py: incremental updates and basket queries.
+Run with: python -m pytest test_ingredient_index.py
+"""
+
+import pytest
+
+from ingredient_index import IngredientIndex
+from recipe_model import compact_recipe
+
+RECIPES = {
+    "pizza.json": {"id": "pizza", "ingredients": {"Tomatoes": {}, "cheese": {}, "dough": {}}},
+    "salad.json": {"id": "salad", "ingredients": ["tomato", "lettuce"]},
+    "toast.json": {"id": "toast", "ingredients": {"bread": {}, "cheese": {}}},
+    "cake.json": {"id": "cake", "ingredients": {"flour": {}, "eggs": {}, "sugar": {}, "milk": {}}},
+}
+
+
+@pytest.fixture
+def index():
+    index = IngredientIndex()
+    index.on_changes([(filename, None, compact_recipe(recipe))
+                      for filename, recipe in RECIPES.items()])
+    return index
+
+
+def ids(recipes):
+    return sorted(recipe.get("id") for recipe in recipes)
+
+
+def test_match_uses_canonical_names(index):
+    assert ids(index.match(["tomato"])) == ["pizza", "salad"]
+    assert ids(index.match(["TOMATOES", "cheese"])) == ["pizza"]
+    assert ids(index.match(["egg"])) == ["cake"]
+    assert index.match(["tomato", "flour"]) == []
+    assert index.match(["caviar"]) == []
+
+
+def test_any_of_and_none_of(index):
+    assert ids(index.match([], any_of=["bread", "dough"])) == ["pizza", "toast"]
+    assert ids(index.match(["cheese"], none_of=["tomato"])) == ["toast"]
+    assert ids(index.match([], none_of=["cheese", "caviar"])) == ["cake", "salad"]
+    assert index.match([], any_of=["caviar"]) == []
+
+
+def test_updates_only_move_the_recipes_postings(index):
+    index.on_change("salad.json", None, compact_recipe({"id": "salad", "ingredients": ["lettuce"]}))
+    assert ids(index.match(["tomato"])) == ["pizza"]
+    assert ids(index.match(["lettuce"])) == ["salad"]
+
+    index.on_change("pizza.json", None, None)
+    assert index.match(["tomato"]) == [] and index.match(["dough"]) == []
+    assert len(index) == 3
+    # The freed doc id is reused by the next recipe
+    index.add("soup.json", compact_recipe({"id": "soup", "ingredients": ["tomato"]}))
+    assert ids(index.match(["tomato"])) == ["soup"] and len(index) == 4
+
+
+def test_match_many_answers_like_match(index):
+    queries = [(["cheese"], []), (["cheese"], ["bread"]), (["tomato", "cheese"], []), ([], [])]
+    assert [ids(found) for found in index.match_many(queries)] == [
+        ids(index.match(all_of, none_of=none_of)) for all_of, none_of in queries]
+
+
+def test_rank_by_coverage(index):
+    ranked = index.rank_by_coverage(["cheese", "bread", "tomato"], limit=3)
+    assert [(result["recipe"].get("id"), result["coverage"]) for result in ranked] == [
+        ("toast", 1.0), ("pizza", 0.6667), ("salad", 0.5)]
+    assert ranked[1]["matched"] == ["cheese", "tomato"] and ranked[1]["missing"] == ["dough"]
+    assert index.rank_by_coverage(["caviar"]) == []
+    assert index.rank_by_coverage(["cheese"], limit=0) == []
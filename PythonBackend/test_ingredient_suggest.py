@@ -0,0 +1,65 @@
+"""
+Tests for ingredient_suggest.py: prefix, word and typo-tolerant suggestions.
+Run with: python -m pytest test_ingredient_suggest.py
+"""
+
+import pytest
+
+from ingredient_suggest import IngredientSuggester
+from recipe_model import compact_recipe
+
+RECIPES = [
+    {"id": "pizza", "ingredients": {"Tomatoes": {}, "mozzarella": {}, "olive_oil": {}}},
+    {"id": "salad", "ingredients": ["tomato", "lettuce", "olive oil"]},
+    {"id": "soup", "ingredients": ["tomato", "onion", "scallions"]},
+    {"id": "stir fry", "ingredients": ["tofu", "soy sauce"]},
+]
+
+
+@pytest.fixture
+def suggester():
+    suggester = IngredientSuggester()
+    suggester.on_changes([(f"{recipe['id']}.json", None, compact_recipe(recipe))
+                          for recipe in RECIPES])
+    return suggester
+
+
+def names(suggestions):
+    return [suggestion["name"] for suggestion in suggestions]
+
+
+def test_prefix_matches_most_used_first(suggester):
+    assert suggester.suggest("TO", fuzzy=False) == [
+        {"name": "tomato", "count": 3, "distance": 0},
+        {"name": "tofu", "count": 1, "distance": 0}]
+    assert names(suggester.suggest("o", fuzzy=False)) == ["olive oil", "green onion", "onion"]
+
+
+def test_later_words_and_separators(suggester):
+    assert names(suggester.suggest("oil")) == ["olive oil"]
+    assert names(suggester.suggest("olive_o")) == ["olive oil"]
+    assert names(suggester.suggest("sauce")) == ["soy sauce"]
+
+
+def test_query_is_canonicalized(suggester):
+    assert names(suggester.suggest("tomatoes", fuzzy=False)) == ["tomato"]
+    assert names(suggester.suggest("Scallions", fuzzy=False)) == ["green onion"]
+
+
+def test_typos(suggester):
+    assert suggester.suggest("tmato") == [{"name": "tomato", "count": 3, "distance": 1}]
+    assert suggester.suggest("tmato", fuzzy=False) == []
+    # Too short for typo matches
+    assert suggester.suggest("xo") == []
+
+
+def test_limit_and_updates(suggester):
+    assert names(suggester.suggest("to", limit=1)) == ["tomato"]
+    assert suggester.suggest("to", limit=0) == [] and suggester.suggest("  ") == []
+    suggester.on_change("soup.json", compact_recipe(RECIPES[2]), None)
+    suggester.on_change("tofu.json", None, compact_recipe({"ingredients": ["tofu", "tofu skin"]}))
+    assert suggester.suggest("to", fuzzy=False) == [
+        {"name": "tofu", "count": 2, "distance": 0},
+        {"name": "tomato", "count": 2, "distance": 0},
+        {"name": "tofu skin", "count": 1, "distance": 0}]
+    assert len(suggester) == 7
@@ -0,0 +1,42 @@
+"""
+Tests for ingredient_vocab.py: canonical names and interned ids.
+Run with: python -m pytest test_ingredient_vocab.py
+"""
+
+import pytest
+
+from ingredient_vocab import IngredientVocabulary, canonical_ingredient
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Tomatoes", "tomato"), ("eggs", "egg"), ("cherries", "cherry"), ("peaches", "peach"),
+    ("radishes", "radish"), ("cheeses", "cheese"), ("bay leaves", "bay leaf"),
+    ("cookies", "cookie"), ("smoothies", "smoothie"), ("pies", "pie"),
+    ("quiches", "quiche"), ("brioches", "brioche"),
+    # Not plurals
+    ("French Fries", "french fries"), ("hummus", "hummus"), ("oats", "oats"),
+    ("watercress", "watercress"), ("gas", "gas"), ("Swiss", "swiss"),
+    # Only the last word is made singular
+    ("peas and carrots", "peas and carrot"),
+])
+def test_plurals(name, expected):
+    assert canonical_ingredient(name) == expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("olive_oil", "olive oil"), ("  Olive   Oil ", "olive oil"), ("OLIVE__OIL", "olive oil"),
+    # Aliases are matched after the plural is folded
+    ("Scallions", "green onion"), ("garbanzo_beans", "chickpea"), ("prawns", "shrimp"),
+    ("All-Purpose Flour", "flour"), ("green onions", "green onion"),
+    ("", ""), (7, "7"),
+])
+def test_separators_and_aliases(name, expected):
+    assert canonical_ingredient(name) == expected
+
+
+def test_vocabulary_interns_canonical_names():
+    vocabulary = IngredientVocabulary()
+    tomato = vocabulary.intern("Tomatoes")
+    assert vocabulary.intern("tomato") == tomato and vocabulary.intern("egg") == tomato + 1
+    assert vocabulary.lookup("TOMATO") == tomato and vocabulary.lookup("caviar") is None
+    assert vocabulary.name(tomato) == "tomato" and len(vocabulary) == 2
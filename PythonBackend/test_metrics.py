@@ -0,0 +1,56 @@
+"""
+Tests for metrics.py: sampled request profiling.
+Run with: python -m pytest test_metrics.py
+"""
+
+import cProfile
+
+from flask import Flask
+
+import metrics
+from metrics import SlowRequestProfiler
+
+
+def test_one_profile_at_a_time():
+    profiler = SlowRequestProfiler(sample_rate=1.0)
+    first = profiler.start()
+    assert first is not None
+    assert profiler.start() is None  # another request is being profiled
+    profiler.stop(first)
+
+    second = profiler.start()
+    assert second is not None
+    profiler.stop(second)
+
+
+def test_skips_profiling_when_another_profiler_is_active(monkeypatch):
+    class ActiveElsewhere(cProfile.Profile):
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(metrics.cProfile, "Profile", ActiveElsewhere)
+    profiler = SlowRequestProfiler(sample_rate=1.0)
+    assert profiler.start() is None
+    monkeypatch.undo()
+    profile = profiler.start()
+    assert profile is not None  # the failed attempt didn't keep the slot
+    profiler.stop(profile)
+
+
+def test_failed_requests_release_the_profiler():
+    app = Flask(__name__)
+    profiler = SlowRequestProfiler(sample_rate=1.0)
+    metrics.init_app(app, profiler)
+
+    @app.route("/ok")
+    def ok():
+        return "ok"
+
+    @app.route("/fail")
+    def fail():
+        raise RuntimeError("boom")
+
+    client = app.test_client()
+    assert client.get("/fail").status_code == 500
+    assert client.get("/ok").status_code == 200
+    assert any(entry["path"].startswith("/ok") for entry in profiler.slowest())
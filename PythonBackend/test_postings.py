@@ -0,0 +1,101 @@
+"""
+Tests for postings.py: array and bitmap postings must give the same answers.
+Run with: python -m pytest test_postings.py
+"""
+
+import itertools
+import random
+
+import pytest
+
+import postings
+from benchmarks.catalog import generate_catalog
+from ingredient_index import IngredientIndex, recipe_ingredient_names
+from postings import ArrayPosting, BitmapPosting, count_matches, evaluate, optimize
+
+KINDS = (ArrayPosting, BitmapPosting)
+
+
+def random_ids(rng, universe):
+    return rng.sample(range(universe), rng.randint(0, universe // 2))
+
+
+def test_both_kinds_hold_the_same_set():
+    rng = random.Random(1)
+    ids = random_ids(rng, 500)
+    array_posting, bitmap_posting = ArrayPosting(ids), BitmapPosting(ids)
+    for _ in range(300):
+        doc_id = rng.randrange(600)
+        if rng.random() < 0.5:
+            array_posting.add(doc_id)
+            bitmap_posting.add(doc_id)
+        else:
+            array_posting.discard(doc_id)
+            bitmap_posting.discard(doc_id)
+        assert len(array_posting) == len(bitmap_posting)
+    assert list(array_posting) == list(bitmap_posting)
+    assert all((doc_id in array_posting) == (doc_id in bitmap_posting) for doc_id in range(700))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_evaluate_agrees_for_every_mix_of_kinds(seed):
+    rng = random.Random(seed)
+    # Different universes give bitmaps of different lengths
+    sets = [set(random_ids(rng, rng.choice([64, 300, 1000]))) for _ in range(5)]
+    all_of, any_of, none_of = sets[:2], sets[2:4], sets[4:]
+    expected = set.intersection(*all_of) & set.union(*any_of) - none_of[0]
+
+    for kinds in itertools.product(KINDS, repeat=len(sets)):
+        made = [kind(sorted(ids)) for kind, ids in zip(kinds, sets)]
+        assert evaluate(made[:2], made[2:4], made[4:]) == sorted(expected), kinds
+        assert evaluate(made[:2]) == sorted(set.intersection(*all_of)), kinds
+        doc_ids, counts = count_matches(made)
+        assert dict(zip(doc_ids.tolist(), counts.tolist())) == {
+            doc_id: sum(doc_id in ids for ids in sets) for doc_id in set.union(*sets)}
+
+
+def test_optimize_switches_with_hysteresis():
+    universe = 32 * 100
+    dense = optimize(ArrayPosting(range(101)), universe)
+    assert isinstance(dense, BitmapPosting) and list(dense) == list(range(101))
+    # Between half and full density a bitmap stays a bitmap...
+    for doc_id in range(60, 101):
+        dense.discard(doc_id)
+    assert isinstance(optimize(dense, universe), BitmapPosting)
+    # ...and only turns back into an array below half
+    for doc_id in range(40, 60):
+        dense.discard(doc_id)
+    sparse = optimize(dense, universe)
+    assert isinstance(sparse, ArrayPosting) and list(sparse) == list(range(40))
+
+
+def build_index(recipes):
+    index = IngredientIndex()
+    index.on_changes([(f"{recipe['id']}.json", None, recipe) for recipe in recipes])
+    return index
+
+
+@pytest.mark.parametrize("density, kind", [(10 ** 9, BitmapPosting), (0, ArrayPosting)])
+def test_index_answers_the_same_with_either_kind(monkeypatch, density, kind):
+    recipes = list(generate_catalog(500, seed=3))
+    names = {recipe["id"]: recipe_ingredient_names(recipe) for recipe in recipes}
+    monkeypatch.setattr(postings, "BITMAP_DENSITY", density)
+    index = build_index(recipes)
+    # Deletions leave holes in the doc ids
+    rng = random.Random(4)
+    for recipe in rng.sample(recipes, 50):
+        index.remove(f"{recipe['id']}.json")
+        recipes.remove(recipe)
+        del names[recipe["id"]]
+    assert all(isinstance(posting, kind) for posting in index._postings.values())
+
+    ingredients = sorted(set().union(*names.values()))
+    for _ in range(50):
+        all_of = rng.sample(ingredients, rng.randint(1, 2))
+        none_of = rng.sample(ingredients, rng.randint(0, 2))
+        expected = sorted(recipe_id for recipe_id, used in names.items()
+                          if used.issuperset(all_of) and not used & set(none_of))
+        found = index.match(all_of, none_of=none_of)
+        assert sorted(recipe["id"] for recipe in found) == expected
+        batch, = index.match_many([(all_of, none_of)])
+        assert sorted(recipe["id"] for recipe in batch) == expected
@@ -0,0 +1,54 @@
+"""
+Tests for recipe_attributes.py: parsing recipe times.
+Run with: python -m pytest test_recipe_attributes.py
+"""
+
+import pytest
+
+from recipe_attributes import parse_minutes, recipe_times
+
+
+@pytest.mark.parametrize("text, minutes", [
+    ("45 minutes", 45),
+    ("1 hour 15 minutes", 75),
+    ("1.5 hours", 90),
+    ("1 hr 30 mins", 90),
+    ("2h", 120),
+    ("90", 90),
+    (25, 25),
+])
+def test_plain_durations(text, minutes):
+    assert parse_minutes(text) == minutes
+
+
+@pytest.mark.parametrize("text, minutes", [
+    ("1/2 hour", 30),
+    ("1 1/2 hours", 90),
+    ("1-1/2 hours", 90),
+    ("2 3/4 hours", 165),
+])
+def test_fractions_and_mixed_numbers(text, minutes):
+    assert parse_minutes(text) == minutes
+
+
+@pytest.mark.parametrize("text, minutes", [
+    ("30-45 minutes", 45),
+    ("30 - 45 minutes", 45),
+    ("30–45 min", 45),
+    ("2 to 3 hours", 180),
+    ("30 minutes to 1 hour", 60),
+    ("1-2 hours 30 minutes", 150),
+])
+def test_ranges_count_as_their_upper_bound(text, minutes):
+    assert parse_minutes(text) == minutes
+
+
+@pytest.mark.parametrize("text", ["soon", "", None, True, ["10 minutes"]])
+def test_unparseable(text):
+    assert parse_minutes(text) is None
+
+
+def test_recipe_times():
+    assert recipe_times({"time": ["10 minutes", "1 1/2 hours"]}) == (10, 90)
+    assert recipe_times({"time": "2 to 3 hours"}) == (None, 180)
+    assert recipe_times({}) == (None, None)
@@ -0,0 +1,108 @@
+"""
+Tests for recipe_images.py: the derivative cache and its eviction.
+Run with: python -m pytest test_recipe_images.py
+"""
+
+import os
+import time
+
+import pytest
+
+from recipe_images import ImageCache
+
+Image = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def images_dir(tmp_path):
+    images_dir = tmp_path / "images"
+    images_dir.mkdir()
+    for i, color in enumerate(["red", "green", "blue"]):
+        Image.new("RGB", (400, 300), color).save(images_dir / f"{i}.png")
+    return images_dir
+
+
+def wait_for(condition):
+    """Eviction runs in a render's done callback, just after get() returns."""
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def make_cache(images_dir, tmp_path, grace_seconds):
+    # Room for a single derivative, so every new one pushes the last one out
+    return ImageCache(images_dir, tmp_path / "cache", max_bytes=1, workers=1,
+                      grace_seconds=grace_seconds)
+
+
+def test_recently_used_derivatives_are_kept(images_dir, tmp_path):
+    cache = make_cache(images_dir, tmp_path, grace_seconds=300)
+    try:
+        names = [cache.get(images_dir / f"{i}.png", "thumb", "jpeg") for i in range(3)]
+        wait_for(lambda: cache.stats()["files"] == 3)
+        # Over max_bytes, but every name was just handed out
+        assert all(cache.path_for(name) is not None for name in names)
+        assert cache.evictions == 0
+    finally:
+        cache.close()
+
+
+def test_derivatives_past_the_grace_period_are_evicted(images_dir, tmp_path):
+    cache = make_cache(images_dir, tmp_path, grace_seconds=300)
+    try:
+        old = cache.get(images_dir / "0.png", "thumb", "jpeg")
+        # Last used an hour ago (use is kept in the file's mtime)
+        hour_ago = time.time() - 3600
+        os.utime(cache.path_for(old), (hour_ago, hour_ago))
+    finally:
+        cache.close()
+
+    restarted = make_cache(images_dir, tmp_path, grace_seconds=300)
+    try:
+        new = restarted.get(images_dir / "1.png", "thumb", "jpeg")
+        wait_for(lambda: restarted.evictions > 0)
+        assert restarted.path_for(old) is None
+        assert restarted.path_for(new) is not None
+        assert restarted.evictions == 1
+    finally:
+        restarted.close()
+
+
+def test_derivatives_deleted_by_another_process_are_rendered_again(images_dir, tmp_path):
+    cache = make_cache(images_dir, tmp_path, grace_seconds=300)
+    other = make_cache(images_dir, tmp_path, grace_seconds=300)
+    try:
+        name = cache.get(images_dir / "0.png", "thumb", "jpeg")
+        wait_for(lambda: cache.stats()["files"] == 1)
+        # Another worker evicts it behind this one's back
+        other.path_for(name).unlink()
+
+        assert cache.get(images_dir / "0.png", "thumb", "jpeg") == name
+        assert cache.path_for(name) is not None
+        assert cache.misses == 2
+    finally:
+        cache.close()
+        other.close()
+
+
+def test_eviction_sees_uses_through_another_process(images_dir, tmp_path):
+    cache = make_cache(images_dir, tmp_path, grace_seconds=300)
+    try:
+        old = cache.get(images_dir / "0.png", "thumb", "jpeg")
+        hour_ago = time.time() - 3600
+        os.utime(cache.path_for(old), (hour_ago, hour_ago))
+    finally:
+        cache.close()
+
+    restarted = make_cache(images_dir, tmp_path, grace_seconds=300)
+    other = make_cache(images_dir, tmp_path, grace_seconds=300)
+    try:
+        restarted.stats()  # indexes old as used an hour ago
+        assert other.path_for(old) is not None  # ...then another worker uses it
+        restarted.get(images_dir / "1.png", "thumb", "jpeg")
+        wait_for(lambda: restarted.stats()["files"] == 2)
+        assert restarted.path_for(old) is not None
+        assert restarted.evictions == 0
+    finally:
+        restarted.close()
+        other.close()
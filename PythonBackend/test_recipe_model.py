@@ -0,0 +1,61 @@
+"""
+Tests for recipe_model.py: normalized accessors and exact round trips.
+Run with: python -m pytest test_recipe_model.py
+"""
+
+import json
+
+import pytest
+
+from recipe_display import render_formats
+from recipe_model import Recipe, compact_recipe
+
+RECIPES = [
+    {"id": "pasta", "name": "Pasta", "type": "main",
+     "ingredients": {"tomato": {"amount": "2", "unit": "cups"}, "salt": {"unit": "pinch"},
+                     "basil": {"amount": 3, "unit": None, "note": "fresh"}},
+     "steps": ["1. Boil", "Serve"], "time": ["10 minutes", "30 minutes"], "servings": 2,
+     "materials": ["pot"], "combos": ["salad"]},
+    {"id": 7, "ingredients": ["egg", "flour"], "time": "1 hour"},
+    {"id": "odd", "time": 45, "ingredients": {"salt": 2}, "steps": "stir"},
+    {"id": "numbers", "time": [5, 20], "servings": None},
+]
+
+
+@pytest.mark.parametrize("data", RECIPES)
+def test_to_dict_round_trips(data):
+    recipe = Recipe.from_dict(json.loads(json.dumps(data)))
+    assert recipe.to_dict() == data
+    assert list(recipe.to_dict()) == list(data)
+    assert json.dumps(recipe.to_dict()) == json.dumps(data)
+
+
+def test_times():
+    pasta, legacy, odd, numbers = (compact_recipe(data) for data in RECIPES)
+    assert (pasta.prep_time, pasta.total_time) == ("10 minutes", "30 minutes")
+    assert (legacy.prep_time, legacy.total_time) == (None, "1 hour")
+    assert (odd.prep_time, odd.total_time) == (None, 45)
+    assert (numbers.prep_time, numbers.total_time) == (5, 20)
+    assert Recipe.from_dict({"id": "x"}).total_time is None
+
+
+def test_ingredients():
+    pasta, legacy = compact_recipe(RECIPES[0]), compact_recipe(RECIPES[1])
+    tomato, salt, basil = pasta.ingredients
+    assert not pasta.legacy_ingredients
+    assert (tomato.name, tomato.get("amount"), tomato.get("unit")) == ("tomato", "2", "cups")
+    # A missing detail is missing, not None
+    assert salt.get("amount", "") == "" and salt.amount is None
+    assert basil.get("note") == "fresh" and basil.get("unit", "") is None
+    assert legacy.legacy_ingredients
+    assert [ingredient.get("amount", "") for ingredient in legacy.ingredients] == ["", ""]
+
+
+def test_renderers_take_recipes_or_dicts():
+    for data in RECIPES[:2]:
+        assert render_formats(compact_recipe(data)) == render_formats(data)
+    full = render_formats(RECIPES[0])["full"]
+    assert "Prep Time: 10 minutes" in full and "Total Time: 30 minutes" in full
+    assert "Salt:  pinch" in full and "GOES WELL WITH:" in full
+    assert "Time: 1 Hour" not in render_formats(RECIPES[1])["card"]
+    assert "│ Time: 1 hour" in render_formats(RECIPES[1])["card"]
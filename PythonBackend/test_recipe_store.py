@@ -0,0 +1,167 @@
+"""
+Tests for recipe_store.py: refreshing from disk and notifying listeners.
+Run with: python -m pytest test_recipe_store.py
+"""
+
+import json
+import os
+
+import pytest
+
+from recipe_store import RecipeStore
+
+
+def write(recipes_dir, filename, recipe, mtime=None):
+    path = recipes_dir / filename
+    path.write_text(json.dumps(recipe))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def recipes_dir(tmp_path):
+    recipes_dir = tmp_path / "recipes"
+    recipes_dir.mkdir()
+    write(recipes_dir, "a.json", {"id": "a", "name": "first"})
+    write(recipes_dir, "b.json", {"id": 1, "name": "second"})
+    return recipes_dir
+
+
+class Recorder:
+    """A listener and batch listener that keep what they were called with."""
+
+    def __init__(self):
+        self.changes = []
+        self.batches = []
+
+    def on_change(self, filename, old_recipe, new_recipe):
+        self.changes.append((filename, old_recipe, new_recipe))
+
+    def on_changes(self, changes):
+        self.batches.append(list(changes))
+
+    def summary(self):
+        return sorted((filename, old and old.get("name"), new and new.get("name"))
+                      for batch in self.batches for filename, old, new in batch)
+
+
+def test_refresh_reports_added_changed_and_deleted_files(recipes_dir):
+    store = RecipeStore(recipes_dir, check_interval=0)
+    recorder = Recorder()
+    store.subscribe(recorder.on_change, recorder.on_changes)
+
+    store.refresh()
+    assert recorder.summary() == [("a.json", None, "first"), ("b.json", None, "second")]
+    assert len(recorder.batches) == 1 and recorder.changes == []
+
+    recorder.batches.clear()
+    write(recipes_dir, "a.json", {"id": "a", "name": "edited"}, mtime=1_000_000)
+    (recipes_dir / "b.json").unlink()
+    write(recipes_dir, "c.json", {"id": "c", "name": "third"})
+    store.refresh()
+    assert recorder.summary() == [("a.json", "first", "edited"), ("b.json", "second", None),
+                                  ("c.json", None, "third")]
+    assert store.get_by_id("a").get("name") == "edited"
+    assert store.get_by_id(1) is None
+    assert [recipe.get("id") for recipe in store.all()] == ["a", "c"]
+
+
+def test_unchanged_files_are_not_read_again(recipes_dir):
+    store = RecipeStore(recipes_dir, check_interval=0)
+    recorder = Recorder()
+    store.subscribe(recorder.on_change, recorder.on_changes)
+    first = store.get("a.json")
+    version = store.version
+
+    recorder.batches.clear()
+    store.refresh()
+    assert recorder.batches == []
+    assert store.version == version
+    assert store.get("a.json") is first
+
+
+def test_checks_storage_at_most_once_per_interval(recipes_dir):
+    store = RecipeStore(recipes_dir, check_interval=3600)
+    assert len(store) == 2
+
+    write(recipes_dir, "c.json", {"id": "c"})
+    assert len(store) == 2
+    store.refresh(force=True)
+    assert len(store) == 3
+
+
+def test_writes_notify_the_single_listener(recipes_dir):
+    store = RecipeStore(recipes_dir, check_interval=0)
+    store.refresh()
+    recorder = Recorder()
+    store.subscribe(recorder.on_change)
+    tag = store.catalog_tag()
+
+    write(recipes_dir, "c.json", {"id": "c", "name": "new"})
+    store.put("c.json", {"id": "c", "name": "new"})
+    (recipes_dir / "a.json").unlink()
+    store.remove("a.json")
+
+    assert [(filename, old and old.get("name"), new and new.get("name"))
+            for filename, old, new in recorder.changes] == [("c.json", None, "new"),
+                                                            ("a.json", "first", None)]
+    assert store.catalog_tag() != tag
+    # The writes were recorded with their signatures, so a refresh finds nothing new
+    recorder.changes.clear()
+    store.refresh()
+    assert recorder.changes == []
+
+
+def test_put_many_calls_batch_listeners_once(recipes_dir):
+    store = RecipeStore(recipes_dir, check_interval=0)
+    store.refresh()
+    recorder = Recorder()
+    store.subscribe(recorder.on_change, recorder.on_changes)
+
+    store.put_many([("c.json", {"id": "c", "name": "third"}), ("a.json", None),
+                    ("missing.json", None)])
+    assert recorder.summary() == [("a.json", "first", None), ("c.json", None, "third")]
+    assert len(recorder.batches) == 1 and recorder.changes == []
+
+
+def test_ids_and_pages(recipes_dir):
+    store = RecipeStore(recipes_dir, check_interval=0)
+    for i in range(5):
+        write(recipes_dir, f"p{i}.json", {"id": f"p{i}"})
+
+    # 1 and "1" name the same recipe
+    assert store.get_by_id("1").get("name") == "second"
+    assert store.filename_for_id(1) == "b.json"
+
+    recipes, after = store.page(limit=3)
+    assert [recipe.get("id") for recipe in recipes] == ["a", 1, "p0"]
+    recipes, after = store.page(after, limit=3)
+    assert [recipe.get("id") for recipe in recipes] == ["p1", "p2", "p3"]
+    recipes, after = store.page(after, limit=3)
+    assert [recipe.get("id") for recipe in recipes] == ["p4"] and after is None
+
+
+def test_id_lookup_follows_edits_and_duplicates(recipes_dir):
+    store = RecipeStore(recipes_dir, check_interval=0)
+    write(recipes_dir, "z.json", {"id": "a", "name": "duplicate"})
+    # Two files with one id: the first by name wins, the other takes over
+    assert store.get_by_id("a").get("name") == "first"
+    (recipes_dir / "a.json").unlink()
+    assert store.get_by_id("a").get("name") == "duplicate"
+
+    # Changing the id inside a file moves the lookup
+    write(recipes_dir, "z.json", {"id": "renamed"}, mtime=1_000_000)
+    assert store.get_by_id("a") is None
+    assert store.filename_for_id("renamed") == "z.json"
+
+
+def test_content_hash_changes_with_the_content(recipes_dir):
+    store = RecipeStore(recipes_dir, check_interval=0)
+    recipe, first = store.get_with_hash("a")
+    assert recipe.get("name") == "first"
+    assert store.get_with_hash("a")[1] == first
+    assert store.get_with_hash("missing") == (None, None)
+
+    write(recipes_dir, "a.json", {"id": "a", "name": "edited"}, mtime=1_000_000)
+    recipe, edited = store.get_with_hash("a")
+    assert recipe.get("name") == "edited" and edited != first
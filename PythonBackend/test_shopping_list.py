@@ -0,0 +1,81 @@
+"""
+Tests for shopping_list.py: unit normalization, scaling and aggregation.
+Run with: python -m pytest test_shopping_list.py
+"""
+
+import pytest
+
+from recipe_model import compact_recipe
+from shopping_list import ShoppingListPlanner, normalize_unit, parse_amount
+
+RECIPES = [
+    {"id": "pancakes", "servings": 4,
+     "ingredients": {"flour": {"amount": 1, "unit": "cup"}, "sugar": {"amount": 1, "unit": "T"},
+                     "salt": {"amount": "1", "unit": "t"}}},
+    {"id": "cake", "servings": 8,
+     "ingredients": {"Flour": {"amount": 8, "unit": "Tablespoons"},
+                     "sugar": {"amount": "1", "unit": "tbsp."},
+                     "eggs": {"amount": 2, "unit": ""},
+                     "cheese": {"amount": "1 1/2", "unit": "slices"}}},
+    {"id": "salad", "ingredients": ["lettuce", "cheese"]},
+]
+
+
+@pytest.mark.parametrize("unit, expected", [
+    ("T", "tbsp"), ("t", "tsp"), ("Tbsp", "tbsp"), ("Tablespoons", "tbsp"), ("TSP.", "tsp"),
+    ("Cups", "cup"), (" lbs ", "lb"), (None, "whole"), ("", "whole"), ("Cloves", "clove"),
+])
+def test_normalize_unit(unit, expected):
+    assert normalize_unit(unit) == expected
+
+
+@pytest.mark.parametrize("amount, expected", [
+    (2, 2.0), ("1 1/2", 1.5), ("3/4", 0.75), (True, None), ("a pinch", None), ("1/0", None),
+])
+def test_parse_amount(amount, expected):
+    assert parse_amount(amount) == expected
+
+
+@pytest.fixture
+def planner():
+    planner = ShoppingListPlanner()
+    planner.on_changes([(f"{recipe['id']}.json", None, compact_recipe(recipe))
+                        for recipe in RECIPES])
+    return planner
+
+
+def by_name(items):
+    return {(item["ingredient"], item["unit"]): (item["amount"], item["recipes"]) for item in items}
+
+
+def test_plan_scales_and_merges_units(planner):
+    items, missing = planner.plan([("pancakes", 8), ("cake", None), ("salad", None), ("nope", 2)])
+    assert missing == ["nope"]
+    assert by_name(items) == {
+        # 2 cups for 8 pancake servings and 8 tablespoons of cake
+        ("flour", "cup"): (2.5, 2),
+        # T is a tablespoon: 2 T + 1 tbsp, not 2 tsp + 1 tbsp
+        ("sugar", "tbsp"): (3.0, 2),
+        ("salt", "tsp"): (2.0, 1),
+        ("egg", "whole"): (2.0, 1),
+        ("cheese", "slice"): (1.5, 1),
+        # Listed without an amount
+        ("cheese", None): (None, 1),
+        ("lettuce", None): (None, 1),
+    }
+
+
+def test_metric_units(planner):
+    items, _ = planner.plan([("pancakes", 8), ("cake", 16)], units="metric")
+    found = by_name(items)
+    assert found[("flour", "ml")] == (709.765, 2)
+    assert found[("egg", "whole")] == (4.0, 1)
+
+
+def test_updates_and_deletions_are_picked_up(planner):
+    planner.on_change("cake.json", None, compact_recipe(
+        {"id": "cake", "servings": 2, "ingredients": {"flour": {"amount": 3, "unit": "lb"}}}))
+    planner.on_change("salad.json", None, None)
+    items, missing = planner.plan([("cake", 1), ("salad", None)])
+    assert by_name(items) == {("flour", "lb"): (1.5, 1)}
+    assert missing == ["salad"]
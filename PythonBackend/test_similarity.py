@@ -0,0 +1,115 @@
+"""
+Tests for similarity.py: incremental updates of the neighbour table.
+Run with: python -m pytest test_similarity.py
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+import similarity
+from benchmarks.catalog import INGREDIENTS, generate_catalog
+from recipe_store import id_key
+from similarity import SimilarityIndex
+
+
+@pytest.fixture(autouse=True)
+def unlimited_buckets(monkeypatch):
+    # Capped buckets break ties by slot, and the indexes compared here
+    # number their slots differently
+    monkeypatch.setattr(similarity, "MAX_BUCKET_CANDIDATES", 10 ** 9)
+
+
+def build(recipes):
+    index = SimilarityIndex()
+    index.on_changes([(f"{recipe['id']}.json", None, recipe) for recipe in recipes])
+    index.flush()
+    return index
+
+
+def rows(index, recipes):
+    """
+    recipe id -> (scores, neighbours that must be listed). Neighbours tied
+    with the last score of a full row may differ, since ties are broken by
+    slot and the two indexes number their slots differently.
+    """
+    result = {}
+    for recipe in recipes:
+        row = index.similar(recipe["id"])
+        scores = [score for _, score in row]
+        full = len(row) == similarity.TOP_K
+        result[recipe["id"]] = (scores, {filename for filename, score in row
+                                         if not full or score > scores[-1]})
+    return result
+
+
+def assert_same_rows(incremental, fresh, recipes):
+    incremental_rows, fresh_rows = rows(incremental, recipes), rows(fresh, recipes)
+    for recipe in recipes:
+        incremental_scores, incremental_sure = incremental_rows[recipe["id"]]
+        fresh_scores, fresh_sure = fresh_rows[recipe["id"]]
+        assert incremental_scores == fresh_scores, recipe["id"]
+        assert incremental_sure == fresh_sure, recipe["id"]
+
+
+def test_incremental_updates_match_a_rebuild():
+    recipes = list(generate_catalog(400))
+    index = build(recipes)
+    rng = random.Random(7)
+
+    changed = rng.sample(recipes, 20)
+    changes = []
+    for recipe in changed:
+        new = dict(recipe, ingredients=rng.sample(INGREDIENTS, rng.randint(3, 8)))
+        changes.append((f"{recipe['id']}.json", recipe, new))
+        recipes[recipes.index(recipe)] = new
+    deleted = rng.sample([recipe for recipe in recipes if recipe not in changed], 5)
+    for recipe in deleted:
+        changes.append((f"{recipe['id']}.json", recipe, None))
+        recipes.remove(recipe)
+
+    # One at a time, as single writes arrive, then checked after each batch
+    for change in changes[:10]:
+        index.on_change(*change)
+        index.flush()
+    index.on_changes(changes[10:])
+    index.flush()
+
+    assert index.recomputed < 2 * 400  # incremental, not a second full build
+    assert_same_rows(index, build(recipes), recipes)
+    for recipe in deleted:
+        assert index.similar(recipe["id"]) is None
+
+
+def test_new_recipe_enters_rows_beyond_its_own_top_k():
+    shared = ["salt", "egg", "flour"]
+    recipes = [{"id": f"r{i}", "ingredients": shared + [f"spice {i}", f"herb {i}"]}
+               for i in range(similarity.TOP_K + 5)]
+    index = build(recipes)
+
+    # Closer to every recipe than they are to each other, so it belongs in
+    # all of their rows though its own row only holds TOP_K of them
+    plain = {"id": "plain", "ingredients": shared}
+    index.on_change("plain.json", None, plain)
+    recipes.append(plain)
+
+    assert_same_rows(index, build(recipes), recipes)
+    assert all(index.similar(recipe["id"])[0][0] == "plain.json" for recipe in recipes[:-1])
+
+
+def test_capped_buckets_keep_the_closest_recipes(monkeypatch):
+    monkeypatch.setattr(similarity, "MAX_BUCKET_CANDIDATES", 4)
+    shared = ["salt", "egg", "flour", "milk", "sugar", "butter"]
+    # Every bucket the target is in is full of these
+    recipes = [{"id": f"r{i}", "ingredients": shared[:5] + [f"spice {i}"]} for i in range(40)]
+    recipes.append({"id": "target", "ingredients": shared})
+    index = build(recipes)
+
+    slot = index._by_id[id_key("target")]
+    candidates = set(index._candidates(slot).tolist())
+    for band, key in enumerate(index._band_keys[slot].tolist()):
+        members = np.array(sorted(index._buckets[band][key]))
+        scores = index._similarities(slot, members)
+        closest = members[np.lexsort((members, -scores))[:4]]
+        assert set(closest.tolist()) - {slot} <= candidates
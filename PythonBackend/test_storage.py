@@ -0,0 +1,160 @@
+"""
+Tests for storage.py: journaled JSON writes, crash recovery and SQLite.
+Run with: python -m pytest test_storage.py
+"""
+
+import json
+import os
+import stat
+
+import pytest
+
+from recipe_store import RecipeStore
+from storage import JsonDirectoryBackend, SQLiteBackend, replay_journal
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_restart_keeps_hand_edits(tmp_path):
+    backend = JsonDirectoryBackend(tmp_path)
+    backend.create("a.json", {"id": "a", "name": "first"})
+    backend.update("a.json", {"id": "a", "name": "second"})
+
+    (tmp_path / "a.json").write_text(json.dumps({"id": "a", "name": "by hand"}))
+    JsonDirectoryBackend(tmp_path)  # what a restart does
+
+    assert read(tmp_path / "a.json")["name"] == "by hand"
+
+
+def test_restart_keeps_hand_deletions(tmp_path):
+    backend = JsonDirectoryBackend(tmp_path)
+    backend.create("a.json", {"id": "a"})
+    (tmp_path / "a.json").unlink()
+
+    JsonDirectoryBackend(tmp_path)
+
+    assert not (tmp_path / "a.json").exists()
+
+
+def test_unapplied_entries_are_replayed(tmp_path):
+    # A crash after the journal append but before the files were written
+    entry = {"entry": "x1", "time": 0, "changes": [["a.json", {"id": "a", "name": "lost"}]]}
+    (tmp_path / ".journal.ndjson").write_text(json.dumps(entry) + "\n" + '{"entry": "torn')
+
+    JsonDirectoryBackend(tmp_path)
+
+    assert read(tmp_path / "a.json")["name"] == "lost"
+
+
+def test_restart_rotates_the_journal(tmp_path):
+    backend = JsonDirectoryBackend(tmp_path)
+    backend.write_many([(f"r{i}.json", {"id": f"r{i}"}) for i in range(3)])
+    journal = tmp_path / ".journal.ndjson"
+    assert journal.exists()
+
+    JsonDirectoryBackend(tmp_path)
+
+    assert not journal.exists()
+    assert (tmp_path / ".journal.ndjson.1").exists()
+
+
+def test_checkpoint_rotates_the_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr("storage.CHECKPOINT_EVERY", 2)
+    backend = JsonDirectoryBackend(tmp_path)
+    backend.create("a.json", {"id": "a"})
+    backend.create("b.json", {"id": "b"})
+
+    assert not (tmp_path / ".journal.ndjson").exists()
+    backend.create("c.json", {"id": "c"})
+    assert len((tmp_path / ".journal.ndjson").read_text().splitlines()) == 2
+
+
+def test_replay_into_empty_directory(tmp_path):
+    source = tmp_path / "source"
+    backend = JsonDirectoryBackend(source)
+    backend.create("a.json", {"id": "a", "name": "one"})
+    backend.delete("a.json")
+    backend.create("b.json", {"id": "b"})
+
+    assert replay_journal(source / ".journal.ndjson", tmp_path / "rebuilt") == 3
+    assert sorted(path.name for path in (tmp_path / "rebuilt").glob("*.json")) == ["b.json"]
+
+
+def test_files_reach_disk_before_their_applied_marker(tmp_path, monkeypatch):
+    # Simulate what survives a crash: only fsynced data, and only renames and
+    # deletions followed by an fsync of the directory
+    durable = set()           # inodes whose data was fsynced
+    durable_names = {}        # name -> inode as of the last directory fsync
+    real_fsync = os.fsync
+
+    def fsync(fd):
+        st = os.fstat(fd)
+        if stat.S_ISDIR(st.st_mode):
+            durable_names.clear()
+            durable_names.update({path.name: path.stat().st_ino
+                                  for path in tmp_path.glob("*.json")})
+        else:
+            durable.add(st.st_ino)
+        real_fsync(fd)
+
+    def crash_at_marker(self, entry_id):
+        # The marker is the last step; whatever it vouches for must survive
+        for path in tmp_path.glob("*.json"):
+            assert durable_names.get(path.name) == path.stat().st_ino, path.name
+            assert path.stat().st_ino in durable, path.name
+        assert set(durable_names) == {path.name for path in tmp_path.glob("*.json")}
+        raise SystemExit("crash")
+
+    backend = JsonDirectoryBackend(tmp_path)
+    backend.write_many([("a.json", {"id": "a"}), ("b.json", {"id": "b"})])
+    monkeypatch.setattr("storage.os.fsync", fsync)
+    monkeypatch.setattr(JsonDirectoryBackend, "_mark_applied", crash_at_marker)
+    with pytest.raises(SystemExit):
+        backend.write_many([("a.json", {"id": "a", "name": "new"}), ("b.json", None),
+                            ("c.json", {"id": "c"})])
+
+
+SQLITE_RECIPES = [
+    ("pancakes.json", {"id": "pancakes", "ingredients": {"Eggs": {}, "flour": {}, "milk": {}}}),
+    ("omelette.json", {"id": "omelette", "ingredients": ["egg", "cheese"]}),
+    ("bread.json", {"id": "bread", "ingredients": {"flour": {}, "water": {}}}),
+]
+
+
+def test_sqlite_match_uses_canonical_names(tmp_path):
+    backend = SQLiteBackend(tmp_path / "recipes.db")
+    backend.write_many(SQLITE_RECIPES)
+    assert [recipe["id"] for recipe in backend.match(["egg"])] == ["omelette", "pancakes"]
+    assert [recipe["id"] for recipe in backend.match(["EGGS", "flour"])] == ["pancakes"]
+    assert [recipe["id"] for recipe in backend.match(["flour"], none_of=["milk"])] == ["bread"]
+    assert backend.match(["egg", "water"]) == []
+
+
+def test_sqlite_scan_is_reused_until_a_commit(tmp_path):
+    backend = SQLiteBackend(tmp_path / "recipes.db")
+    backend.write_many(SQLITE_RECIPES)
+    listing = backend.scan()
+    assert sorted(listing) == ["bread.json", "omelette.json", "pancakes.json"]
+    assert backend.scan() is listing
+
+    backend.delete("bread.json")
+    assert sorted(backend.scan()) == ["omelette.json", "pancakes.json"]
+    # Another connection (as from another process) is seen through data_version
+    SQLiteBackend(tmp_path / "recipes.db").create("toast.json", {"id": "toast"})
+    assert sorted(backend.scan()) == ["omelette.json", "pancakes.json", "toast.json"]
+
+
+def test_store_reads_through_sqlite(tmp_path):
+    backend = SQLiteBackend(tmp_path / "recipes.db")
+    backend.write_many(SQLITE_RECIPES)
+    store = RecipeStore(tmp_path, check_interval=0, backend=backend)
+    assert store.get_by_id("omelette").ingredient_names() == {"egg", "cheese"}
+
+    SQLiteBackend(tmp_path / "recipes.db").update("omelette.json",
+                                                  {"id": "omelette", "name": "new"})
+    assert store.get_by_id("omelette").name == "new"
+    backend.export_dir(tmp_path / "out")
+    assert read(tmp_path / "out" / "omelette.json") == {"id": "omelette", "name": "new"}
@@ -1,6 +1,10 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
+import gzip
+import hashlib
+import heapq
 import json
+from collections import Counter
 from pathlib import Path
 
 
@@ -10,6 +14,14 @@ CORS(app)
 # add info load_recipes and directory
 RECIPES_DIR = Path(__file__).parent / "recipes"
 
+# Last gzip-compressed /api/recipes body as (catalog ETag, bytes)
+compressed_recipes = {"entry": (None, None)}
+
+# Last ingredient postings as (catalog ETag, recipes, postings, sizes)
+catalog_postings = {"entry": (None, None, None, None)}
+
+SEARCH_MODES = ("all", "ranked")
+
 def load_recipes():
     """Load all recipes from JSON files."""
     recipes = []
@@ -21,6 +33,85 @@ def load_recipes():
     return recipes
 
 
+def catalog_etag():
+    """Strong ETag for the catalog, built from each file's name, mtime and size."""
+    digest = hashlib.sha1()
+    if RECIPES_DIR.exists():
+        for recipe_file in sorted(RECIPES_DIR.glob("*.json")):
+            stat = recipe_file.stat()
+            digest.update(f"{recipe_file.name}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+    return digest.hexdigest()
+
+
+def recipe_ingredient_set(recipe):
+    """Lowercased ingredient names of a recipe."""
+    return {ing.lower() for ing in recipe.get("ingredients", {})}
+
+
+def load_postings():
+    """
+    Return (recipes, postings, sizes): postings maps each lowercased
+    ingredient to the positions of the recipes using it, and sizes holds
+    each recipe's ingredient count. Rebuilt only when the catalog changes.
+    """
+    etag = catalog_etag()
+    cached_etag, recipes, postings, sizes = catalog_postings["entry"]
+    if cached_etag != etag:
+        recipes = load_recipes()
+        postings, sizes = {}, []
+        for position, recipe in enumerate(recipes):
+            names = recipe_ingredient_set(recipe)
+            sizes.append(len(names))
+            for name in names:
+                postings.setdefault(name, []).append(position)
+        catalog_postings["entry"] = (etag, recipes, postings, sizes)
+    return recipes, postings, sizes
+
+
+def parse_limit(value):
+    """Return value (a JSON number or numeric string) as a positive int, or None."""
+    if isinstance(value, str):
+        value = int(value) if value.strip().isdecimal() else None
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        return None
+    return value
+
+
+def rank_recipes_by_coverage(recipes, postings, sizes, selected_items, limit=10):
+    """
+    Rank recipes by the share of their ingredients that were selected.
+
+    Counts the hits of each recipe by walking the postings of the selected
+    ingredients, so only recipes sharing an ingredient with the selection
+    are touched, then keeps the best `limit` of those.
+    """
+    if limit <= 0:
+        return []
+    selected_lower = {item.lower() for item in selected_items}
+    hits = Counter()
+    for name in selected_lower:
+        hits.update(postings.get(name, ()))
+
+    # Higher coverage first, then more matches, then catalog order
+    best = heapq.nlargest(limit, hits, key=lambda position: (
+        hits[position] / sizes[position], hits[position], -position))
+
+    results = []
+    for position in best:
+        recipe = recipes[position]
+        recipe_ingredients = recipe_ingredient_set(recipe)
+        matched = recipe_ingredients & selected_lower
+        results.append({
+            "recipe": recipe,
+            "coverage": round(hits[position] / sizes[position], 4),
+            "matched": sorted(matched),
+            "missing": sorted(recipe_ingredients - matched)
+        })
+    return results
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Return a simple health check response."""
@@ -32,8 +123,31 @@ def health_check():
 @app.route('/api/recipes', methods=['GET'])
 def get_all_recipes():
     """Return all available recipes."""
-    recipes = load_recipes()
-    return jsonify(recipes)
+    etag = catalog_etag()
+    gzip_etag = etag + "-gz"
+    accepts_gzip = "gzip" in request.accept_encodings
+
+    # Client already has this version: skip loading and serializing entirely
+    if request.if_none_match.contains(etag) or request.if_none_match.contains(gzip_etag):
+        response = Response(status=304)
+        response.set_etag(gzip_etag if accepts_gzip else etag)
+    elif accepts_gzip:
+        # Compress once per catalog version
+        cached_etag, body = compressed_recipes["entry"]
+        if cached_etag != etag:
+            raw = jsonify(load_recipes()).get_data()
+            body = gzip.compress(raw, compresslevel=6, mtime=0)
+            compressed_recipes["entry"] = (etag, body)
+        response = Response(body, mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(gzip_etag)
+    else:
+        response = jsonify(load_recipes())
+        response.set_etag(etag)
+
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
 
 
 @app.route('/api/recipes/search', methods=['GET', 'POST'])
@@ -42,14 +156,36 @@ def search_recipes():
     if request.method == 'POST':
         data = request.get_json()
         selected_items = data.get("items", [])
+        mode = data.get("mode", "all")
+        limit = data.get("limit", 10)
     else:
         # GET: parse items from query param (e.g., ?items=tomato,cheese)
         items_param = request.args.get("items", "")
         selected_items = [item.strip() for item in items_param.split(",") if item.strip()]
-
+        mode = request.args.get("mode", "all")
+        limit = request.args.get("limit", 10)
+
+    if mode not in SEARCH_MODES:
+        return jsonify({"error": "Invalid mode", "available_modes": list(SEARCH_MODES)}), 400
+    # Only ranked results are limited
+    if mode == "ranked":
+        limit = parse_limit(limit)
+        if limit is None:
+            return jsonify({"error": "limit must be a positive integer"}), 400
     if not selected_items:
         return jsonify({"recipes": [], "count": 0})
 
+    # "ranked" mode: closest recipes to the basket, with what's missing
+    if mode == "ranked":
+        recipes, postings, sizes = load_postings()
+        results = rank_recipes_by_coverage(recipes, postings, sizes, selected_items, limit)
+        return jsonify({
+            "selected_items": selected_items,
+            "mode": mode,
+            "results": results,
+            "count": len(results)
+        })
+
     recipes = load_recipes()
     matching_recipes = []
 